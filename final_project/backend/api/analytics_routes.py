@@ -0,0 +1,71 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from bson import ObjectId
+from datetime import datetime
+from typing import Optional
+
+from utils.auth import get_current_user
+from services.metrics_history import RESOLUTIONS, SERIES_FIELDS
+from config.db import get_async_db
+
+# Create router
+analytics_router = APIRouter()
+
+# Upper bound on the points one series request returns
+MAX_SERIES_POINTS = 1000
+
+@analytics_router.get("/video/{video_id}/series")
+async def get_video_series(
+    video_id: str,
+    resolution: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Views, likes and subscribers of a YouTube video over time, one point per hour or day"""
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"resolution must be one of: {', '.join(RESOLUTIONS)}"
+        )
+
+    video = None
+    if ObjectId.is_valid(video_id):
+        video = await db.videos.find_one(
+            {"_id": ObjectId(video_id), "user_id": str(current_user["_id"])},
+            {"youtube_id": 1, "youtube_video_id": 1}
+        )
+    if not video:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video not found"
+        )
+    youtube_id = video.get("youtube_id") or video.get("youtube_video_id")
+    if not youtube_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video has not been published to YouTube"
+        )
+
+    collection, default_window = RESOLUTIONS[resolution]
+    end = end or datetime.utcnow()
+    start = start or end - default_window
+
+    # Rollups hold one document per bucket, so this reads at most MAX_SERIES_POINTS documents
+    buckets = await db[collection].find(
+        {"youtube_id": youtube_id, "bucket": {"$gte": start, "$lte": end}},
+        {"_id": 0, "bucket": 1, **{field: 1 for field in SERIES_FIELDS}}
+    ).sort("bucket", 1).limit(MAX_SERIES_POINTS).to_list(None)
+
+    return {
+        "video_id": video_id,
+        "youtube_id": youtube_id,
+        "resolution": resolution,
+        "start": start,
+        "end": end,
+        "points": [
+            {"ts": bucket["bucket"], **{field: bucket.get(field) for field in SERIES_FIELDS}}
+            for bucket in buckets
+        ],
+        "truncated": len(buckets) == MAX_SERIES_POINTS
+    }
@@ -0,0 +1,207 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from bson import ObjectId
+import json
+
+from utils.auth import get_current_user, get_current_user_from_header_or_query
+from services.event_bus import event_bus, job_topic, user_topic
+from services.job_queue import get_job_queue, serialize_job, queue_stats, ACTIVE_STATES, SUCCEEDED, FAILED
+from services.fair_scheduler import INTERACTIVE, BULK, PRIORITY_CLASSES
+from config.db import get_db, get_async_db
+# Importing the pipeline registers its job handlers
+import services.seo_pipeline  # noqa: F401
+
+# Create router
+jobs_router = APIRouter()
+
+async def _find_user_video(db, video_id, current_user):
+    video = None
+    if ObjectId.is_valid(video_id):
+        video = await db.videos.find_one(
+            {"_id": ObjectId(video_id), "user_id": str(current_user["_id"])},
+            {"has_audio": 1}
+        )
+    if not video:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video not found"
+        )
+    # Reject files probed without an audio stream before queuing any work
+    if video.get("has_audio") is False:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Video has no audio track to extract text from"
+        )
+    return video
+
+async def _find_user_job(db, job_id, current_user):
+    if not ObjectId.is_valid(job_id):
+        return None
+    return await db.jobs.find_one({"_id": ObjectId(job_id), "user_id": str(current_user["_id"])})
+
+def _check_priority(priority):
+    if priority not in PRIORITY_CLASSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"priority must be one of: {', '.join(PRIORITY_CLASSES)}"
+        )
+
+@jobs_router.post("/extract/{video_id}", status_code=status.HTTP_202_ACCEPTED)
+async def submit_extract_job(
+    video_id: str,
+    force: bool = False,
+    priority: str = INTERACTIVE,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Queue text extraction for a video and return the job ID; force=true ignores a cached transcript"""
+    _check_priority(priority)
+    await _find_user_video(db, video_id, current_user)
+    
+    job = await run_in_threadpool(
+        get_job_queue().submit, "extract", str(current_user["_id"]), video_id, {"force": force}, priority
+    )
+    return serialize_job(job)
+
+@jobs_router.post("/pipeline/{video_id}", status_code=status.HTTP_202_ACCEPTED)
+async def submit_pipeline_job(
+    video_id: str,
+    top_n: int = 10,
+    priority: str = INTERACTIVE,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Queue extraction, keyword generation and ranking for a video"""
+    _check_priority(priority)
+    await _find_user_video(db, video_id, current_user)
+    
+    job = await run_in_threadpool(
+        get_job_queue().submit, "pipeline", str(current_user["_id"]), video_id, {"top_n": top_n}, priority
+    )
+    return serialize_job(job)
+
+@jobs_router.post("/backfill", status_code=status.HTTP_202_ACCEPTED)
+async def submit_backfill_jobs(
+    top_n: int = 10,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Queue bulk pipeline jobs for all of the user's videos that have no keywords yet"""
+    user_id = str(current_user["_id"])
+    
+    # Skip videos that already have a job waiting or running
+    active = await db.jobs.distinct("video_id", {"user_id": user_id, "state": {"$in": ACTIVE_STATES}})
+    videos = await db.videos.find(
+        {"user_id": user_id, "keywords_id": {"$exists": False}, "has_audio": {"$ne": False}},
+        {"_id": 1}
+    ).to_list(None)
+    
+    job_queue = get_job_queue()
+    video_ids = [str(video["_id"]) for video in videos if str(video["_id"]) not in active]
+    jobs = await run_in_threadpool(
+        lambda: [job_queue.submit("pipeline", user_id, video_id, {"top_n": top_n}, BULK) for video_id in video_ids]
+    )
+    return {"jobs": [serialize_job(job) for job in jobs]}
+
+@jobs_router.get("/scheduler")
+async def scheduler_stats(current_user: dict = Depends(get_current_user)):
+    """Queue depth, running jobs and recent queue wait time per priority class, across all nodes"""
+    return await run_in_threadpool(queue_stats, get_db())
+
+# Seconds between keep-alive comments on idle event streams
+SSE_HEARTBEAT_SECONDS = 15
+
+def _format_sse(event):
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+async def _event_stream(request, subscription, first_event=None, stop_when_finished=False):
+    try:
+        if first_event:
+            yield _format_sse(first_event)
+            if stop_when_finished and first_event.get("state") in (SUCCEEDED, FAILED):
+                return
+        while not await request.is_disconnected():
+            event = await subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield _format_sse(event)
+            if stop_when_finished and event["event"] == "state" and event.get("state") in (SUCCEEDED, FAILED):
+                return
+    finally:
+        subscription.close()
+
+def _sse_response(generator):
+    return StreamingResponse(
+        generator,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@jobs_router.get("/events")
+async def user_job_events(
+    request: Request,
+    current_user: dict = Depends(get_current_user_from_header_or_query)
+):
+    """Stream events for all of the current user's jobs as Server-Sent Events"""
+    subscription = event_bus.subscribe(user_topic(str(current_user["_id"])))
+    return _sse_response(_event_stream(request, subscription))
+
+@jobs_router.get("/{job_id}/events")
+async def job_events(
+    job_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user_from_header_or_query),
+    db = Depends(get_async_db)
+):
+    """Stream a job's stage transitions, progress and completion as Server-Sent Events"""
+    # Subscribe before reading the job so no transition is missed in between
+    subscription = event_bus.subscribe(job_topic(job_id))
+    job = await _find_user_job(db, job_id, current_user)
+    if not job:
+        subscription.close()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    snapshot = serialize_job(job)
+    first_event = {
+        "event": "snapshot",
+        "job_id": snapshot["id"],
+        "type": snapshot["type"],
+        "video_id": snapshot["video_id"],
+        "state": snapshot["state"],
+        "stage": snapshot["stage"],
+        "progress": snapshot["progress"],
+        "stage_progress": snapshot["stage_progress"],
+        "result": snapshot["result"],
+        "error": snapshot["error"]
+    }
+    return _sse_response(_event_stream(request, subscription, first_event, stop_when_finished=True))
+
+@jobs_router.get("/")
+async def list_jobs(
+    limit: int = 20,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """List the current user's most recent jobs"""
+    jobs = await db.jobs.find({"user_id": str(current_user["_id"])}).sort("created_at", -1).limit(min(limit, 100)).to_list(None)
+    return {"jobs": [serialize_job(job) for job in jobs]}
+
+@jobs_router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Get the state, stage, progress and timings of a job"""
+    job = await _find_user_job(db, job_id, current_user)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return serialize_job(job)
@@ -1,38 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Body
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Body, Request, Header
+from fastapi.responses import Response, RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 import os
-import shutil
 from datetime import datetime, timedelta
 from bson import ObjectId
 
 from models.user import UserCreate, UserResponse, UserLogin
-from models.video import VideoModel, KeywordModel, RankingModel, VideoUploadResponse
-from utils.auth import get_password_hash, verify_password, create_access_token, get_current_user
-from utils.video_processor import extract_text_from_video, generate_keywords, get_keyword_rankings
-from config.db import get_db
+from models.video import VideoModel, KeywordModel, RankingModel, VideoUploadResponse, ResumableUploadCreate, HashedUploadCreate
+from utils.auth import get_password_hash, verify_password, create_access_token, get_current_user, get_current_user_from_header_or_query
+from utils.media_response import RangeFileResponse, make_etag, guess_media_type
+from utils.admission import admission_pool
+from utils.pagination import KEYSET_SORT, decode_cursor, keyset_filter, page_of
+from services.blob_store import BlobStore
+from services.seo_pipeline import (
+    generate_video_keywords, rank_keywords, PipelineError, RANKINGS_TTL, RANKINGS_STALE_TTL
+)
+from services.job_queue import get_job_queue, serialize_job
+from services.fair_scheduler import INTERACTIVE, BULK
+from services.storage import verify_media_signature, get_storage, StorageError
+from services.ranking_snapshots import latest_rows_async, snapshot_rows
+from services.transcript_store import TranscriptStore, load_transcripts
+from services.video_summaries import summary_document
+from services.upload_sessions import UploadSessionManager, UploadSessionError, parse_content_range, RECOMMENDED_CHUNK_SIZE
+from config.db import get_db, get_async_db
 
 # Create routers
 auth_router = APIRouter()
 video_router = APIRouter()
 seo_router = APIRouter()
 history_router = APIRouter()
+media_router = APIRouter()
 
 # Authentication routes
 @auth_router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def signup(user: UserCreate):
-    db = get_db()
-    
+async def signup(user: UserCreate, db = Depends(get_async_db)):
     # Check if user already exists
-    existing_user = db.users.find_one({"email": user.email})
+    existing_user = await db.users.find_one({"email": user.email})
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Hash the password
-    hashed_password = get_password_hash(user.password)
+    # Hash the password; bcrypt is deliberately slow, so keep it off the event loop
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
     
     # Create new user
     new_user = {
@@ -44,10 +57,10 @@ async def signup(user: UserCreate):
     }
     
     # Insert user into database
-    result = db.users.insert_one(new_user)
+    result = await db.users.insert_one(new_user)
     
     # Get the created user
-    created_user = db.users.find_one({"_id": result.inserted_id})
+    created_user = await db.users.find_one({"_id": result.inserted_id})
     
     # Create user response
     user_response = {
@@ -60,14 +73,12 @@ async def signup(user: UserCreate):
     return user_response
 
 @auth_router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    db = get_db()
-    
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_async_db)):
     try:
         print(f"Login attempt with username: {form_data.username}")
         
         # Find user by email
-        user = db.users.find_one({"email": form_data.username})
+        user = await db.users.find_one({"email": form_data.username})
         if not user:
             print(f"User not found with email: {form_data.username}")
             raise HTTPException(
@@ -77,7 +88,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
             )
         
         # Verify password
-        if not verify_password(form_data.password, user["password"]):
+        if not await run_in_threadpool(verify_password, form_data.password, user["password"]):
             print(f"Invalid password for user: {form_data.username}")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -123,302 +134,361 @@ async def verify_token(current_user: dict = Depends(get_current_user)):
 async def upload_video(
     file: UploadFile = File(...),
     title: str = Form(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
 ):
-    db = get_db()
-    
-    # Create uploads directory if it doesn't exist
-    upload_dir = os.path.join(os.getcwd(), "uploads")
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
-    
-    # Save the uploaded file
-    file_path = os.path.join(upload_dir, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Hashing, storing and probing the file block, so they run in the thread pool
+    blob_store = BlobStore(get_db())
+    blob = await run_in_threadpool(blob_store.store_stream, file.file, str(current_user["_id"]))
+    try:
+        video_fields = await run_in_threadpool(blob_store.video_fields, blob)
+        
+        # Create video document
+        video = {
+            "user_id": str(current_user["_id"]),
+            "title": title,
+            "filename": file.filename,
+            **video_fields,
+            "processed": False,
+            "created_at": datetime.now(),
+            "updated_at": datetime.now()
+        }
+        
+        # Insert video into database
+        result = await db.videos.insert_one(video)
+    except Exception:
+        # No video holds the reference, so it is dropped again
+        await run_in_threadpool(blob_store.release, blob["_id"])
+        raise
     
-    # Create video document
-    video = {
-        "user_id": str(current_user["_id"]),
+    return {
+        "id": str(result.inserted_id),
         "title": title,
         "filename": file.filename,
-        "file_path": file_path,
-        "processed": False,
-        "created_at": datetime.now(),
-        "updated_at": datetime.now()
+        "duration": video["duration"],
+        "has_audio": video["has_audio"],
+        "message": "Video uploaded successfully"
     }
+
+@video_router.post("/video/by-hash", response_model=VideoUploadResponse)
+async def upload_video_by_hash(
+    upload: HashedUploadCreate,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Create a video from an already stored file without transferring it again"""
+    blob_store = BlobStore(get_db())
+    # Only files this user uploaded can be reused, so a hash alone does not expose other users' videos
+    blob = await run_in_threadpool(blob_store.acquire, upload.sha256.lower(), str(current_user["_id"]))
+    if not blob:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No stored file matches this hash, upload the file instead"
+        )
     
-    # Insert video into database
-    result = db.videos.insert_one(video)
+    try:
+        video_fields = await run_in_threadpool(blob_store.video_fields, blob)
+        video = {
+            "user_id": str(current_user["_id"]),
+            "title": upload.title,
+            "filename": os.path.basename(upload.filename),
+            **video_fields,
+            "processed": False,
+            "created_at": datetime.now(),
+            "updated_at": datetime.now()
+        }
+        result = await db.videos.insert_one(video)
+    except Exception:
+        await run_in_threadpool(blob_store.release, blob["_id"])
+        raise
     
     return {
         "id": str(result.inserted_id),
-        "title": title,
-        "filename": file.filename,
+        "title": video["title"],
+        "filename": video["filename"],
+        "duration": video["duration"],
+        "has_audio": video["has_audio"],
+        "message": "Video already stored, upload skipped"
+    }
+
+# Resumable upload routes
+async def _get_upload_session(db, upload_id, current_user):
+    session = None
+    if ObjectId.is_valid(upload_id):
+        session = await db.upload_sessions.find_one({"_id": ObjectId(upload_id), "user_id": str(current_user["_id"])})
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found"
+        )
+    return session
+
+@video_router.post("/video/resumable", status_code=status.HTTP_201_CREATED)
+async def create_resumable_upload(
+    upload: ResumableUploadCreate,
+    current_user: dict = Depends(get_current_user)
+):
+    """Start a resumable upload and return its ID"""
+    try:
+        # Preallocating the partial file blocks, so it runs in the thread pool
+        session = await run_in_threadpool(
+            UploadSessionManager(get_db()).create_session,
+            str(current_user["_id"]), upload.filename, upload.title, upload.size
+        )
+    except UploadSessionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return {
+        "upload_id": str(session["_id"]),
+        "offset": session["offset"],
+        "size": session["size"],
+        "chunk_size": RECOMMENDED_CHUNK_SIZE
+    }
+
+@video_router.head("/video/resumable/{upload_id}")
+async def head_resumable_upload(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Report the committed offset of a resumable upload in headers"""
+    session = await _get_upload_session(db, upload_id, current_user)
+    
+    return Response(headers={
+        "Upload-Offset": str(session["offset"]),
+        "Upload-Length": str(session["size"]),
+        "Cache-Control": "no-store"
+    })
+
+@video_router.get("/video/resumable/{upload_id}")
+async def get_resumable_upload(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Report the committed offset of a resumable upload"""
+    session = await _get_upload_session(db, upload_id, current_user)
+    
+    return {
+        "upload_id": upload_id,
+        "offset": session["offset"],
+        "size": session["size"],
+        "status": session["status"],
+        "video_id": str(session["video_id"]) if session.get("video_id") else None
+    }
+
+@video_router.put("/video/resumable/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    content_range: str = Header(...),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Write one chunk described by its Content-Range header"""
+    session = await _get_upload_session(db, upload_id, current_user)
+    
+    try:
+        start, end, total = parse_content_range(content_range)
+        offset = await UploadSessionManager(get_db()).write_chunk(session, start, end, total, request.stream())
+    except UploadSessionError as e:
+        print(f"Rejected chunk for upload {upload_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+            headers={"Upload-Offset": str(e.offset if e.offset is not None else session["offset"])}
+        )
+    
+    return {
+        "upload_id": upload_id,
+        "offset": offset,
+        "size": session["size"]
+    }
+
+@video_router.post("/video/resumable/{upload_id}/complete", response_model=VideoUploadResponse)
+async def complete_resumable_upload(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Finalize a fully uploaded file and create its video document"""
+    session = await _get_upload_session(db, upload_id, current_user)
+    
+    try:
+        # Hashing and committing the file blocks, so it runs in the thread pool
+        video = await run_in_threadpool(UploadSessionManager(get_db()).finalize, session)
+    except UploadSessionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+            headers={"Upload-Offset": str(e.offset if e.offset is not None else session["offset"])}
+        )
+    
+    return {
+        "id": str(video["_id"]),
+        "title": video["title"],
+        "filename": video["filename"],
+        "duration": video.get("duration"),
+        "has_audio": video.get("has_audio"),
         "message": "Video uploaded successfully"
     }
 
 # Text extraction route
-@seo_router.post("/extract/text/{video_id}")
+@seo_router.post("/extract/text/{video_id}", status_code=status.HTTP_202_ACCEPTED)
 async def extract_text(
     video_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
 ):
-    db = get_db()
-    
-    # Find video by ID
-    video = db.videos.find_one({"_id": ObjectId(video_id), "user_id": str(current_user["_id"])})
+    """Queue text extraction for a video and return the job, as POST /jobs/extract does"""
+    video = None
+    if ObjectId.is_valid(video_id):
+        video = await db.videos.find_one({"_id": ObjectId(video_id), "user_id": str(current_user["_id"])}, {"has_audio": 1})
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Video not found"
         )
-    
-    try:
-        # Extract text from video
-        print(f"Starting text extraction for video: {video_id}")
-        extracted_text = extract_text_from_video(video["file_path"])
-        
-        # Check if extraction failed
-        if extracted_text.startswith("Error"):
-            print(f"Text extraction failed: {extracted_text}")
-            # Provide a placeholder text instead of failing
-            extracted_text = "This is a placeholder text for videos where text extraction failed. The system will still attempt to generate keywords based on common video SEO terms."
-        
-        # Update video document
-        db.videos.update_one(
-            {"_id": ObjectId(video_id)},
-            {"$set": {
-                "extracted_text": extracted_text,
-                "processed": True,
-                "updated_at": datetime.now()
-            }}
+    if video.get("has_audio") is False:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Video has no audio track to extract text from"
         )
-        
-        return {
-            "video_id": video_id,
-            "extracted_text": extracted_text
-        }
-    except Exception as e:
-        print(f"Error extracting text: {str(e)}")
-        # Don't fail completely, update with a placeholder
-        try:
-            placeholder_text = "This is a placeholder text for videos where text extraction failed. The system will still attempt to generate keywords based on common video SEO terms."
-            db.videos.update_one(
-                {"_id": ObjectId(video_id)},
-                {"$set": {
-                    "extracted_text": placeholder_text,
-                    "processed": True,
-                    "updated_at": datetime.now(),
-                    "extraction_error": str(e)
-                }}
-            )
-            return {
-                "video_id": video_id,
-                "extracted_text": placeholder_text,
-                "note": "Text extraction failed, using placeholder"
-            }
-        except Exception as inner_e:
-            print(f"Error updating video with placeholder: {str(inner_e)}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to extract text and update video: {str(e)}"
-            )
+    
+    # Transcription runs on a job worker; poll /jobs/{job_id} or follow its events
+    job = await run_in_threadpool(
+        get_job_queue().submit, "extract", str(current_user["_id"]), video_id, {"force": False}, INTERACTIVE
+    )
+    return {"job_id": str(job["_id"]), **serialize_job(job)}
 
 # Keyword generation route
 @seo_router.post("/generate/keywords/{video_id}")
 async def generate_keywords_route(
     video_id: str,
     top_n: int = 10,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
 ):
-    db = get_db()
-    
     # Find video by ID
-    video = db.videos.find_one({"_id": ObjectId(video_id), "user_id": str(current_user["_id"])})
+    video = await db.videos.find_one({"_id": ObjectId(video_id), "user_id": str(current_user["_id"])})
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Video not found"
         )
     
-    # Check if text has been extracted
-    if not video.get("extracted_text"):
+    try:
+        async with admission_pool("embedding").slot():
+            return await run_in_threadpool(generate_video_keywords, get_db(), video, str(current_user["_id"]), top_n)
+    except HTTPException:
+        raise
+    except PipelineError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Text has not been extracted from this video yet"
+            detail=str(e)
         )
-    
-    try:
-        # Generate keywords
-        extracted_text = video.get("extracted_text", "")
-        if not extracted_text or len(extracted_text.strip()) == 0:
-            print("Warning: Empty extracted text, using relevant SEO keywords")
-            keywords = ["content", "video", "marketing", "strategy", "audience", 
-                      "engagement", "optimization", "analytics", "performance", "reach"][:top_n]
-        else:
-            print(f"Generating keywords for text: {extracted_text[:100]}...")
-            keywords = generate_keywords(extracted_text, top_n)
-        
-        # Ensure we have valid keywords
-        if not keywords or len(keywords) == 0:
-            print("Warning: No keywords generated, using relevant SEO keywords")
-            keywords = ["content", "video", "marketing", "strategy", "audience", 
-                      "engagement", "optimization", "analytics", "performance", "reach"][:top_n]
-            
-        print(f"Generated keywords: {keywords}")
-        
-        # Create keyword document
-        keyword_doc = {
-            "video_id": video_id,
-            "user_id": str(current_user["_id"]),
-            "keywords": keywords,
-            "created_at": datetime.now()
-        }
-        
-        # Insert keywords into database
-        result = db.keywords.insert_one(keyword_doc)
-        
-        # Update video with keywords_id
-        db.videos.update_one(
-            {"_id": ObjectId(video_id)},
-            {"$set": {
-                "keywords_id": str(result.inserted_id),
-                "updated_at": datetime.now()
-            }}
-        )
-        
-        return {
-            "keyword_id": str(result.inserted_id),
-            "video_id": video_id,
-            "keywords": keywords
-        }
     except Exception as e:
         print(f"Error generating keywords: {str(e)}")
-        # Don't fail completely, provide relevant SEO keywords
-        try:
-            default_keywords = ["content", "video", "marketing", "strategy", "audience", 
-                              "engagement", "optimization", "analytics", "performance", "reach"][:top_n]
-            keyword_doc = {
-                "video_id": video_id,
-                "user_id": str(current_user["_id"]),
-                "keywords": default_keywords,
-                "created_at": datetime.now()
-            }
-            result = db.keywords.insert_one(keyword_doc)
-            db.videos.update_one(
-                {"_id": ObjectId(video_id)},
-                {"$set": {
-                    "keywords_id": str(result.inserted_id),
-                    "updated_at": datetime.now()
-                }}
-            )
-            return {
-                "keyword_id": str(result.inserted_id),
-                "video_id": video_id,
-                "keywords": default_keywords,
-                "note": "Default keywords used due to extraction error"
-            }
-        except Exception as inner_e:
-            print(f"Error saving default keywords: {str(inner_e)}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to generate keywords: {str(e)}"
-            )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate keywords: {str(e)}"
+        )
 
-# Keyword ranking route
-@seo_router.post("/ranking/{keyword_id}")
-async def get_rankings(
-    keyword_id: str,
-    current_user: dict = Depends(get_current_user)
-):
-    db = get_db()
-    
-    # Find keywords by ID
-    keyword_doc = db.keywords.find_one({"_id": ObjectId(keyword_id), "user_id": str(current_user["_id"])})
+# Keyword ranking routes
+async def _find_user_keywords(db, keyword_id, user_id):
+    keyword_doc = None
+    if ObjectId.is_valid(keyword_id):
+        keyword_doc = await db.keywords.find_one({"_id": ObjectId(keyword_id), "user_id": user_id})
     if not keyword_doc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Keywords not found"
         )
-    
+    return keyword_doc
+
+async def _rank_now(keyword_doc, user_id, force=False):
+    """Look up rankings while the caller waits; force skips cached stage output"""
     try:
-        # Get keyword rankings
-        rankings = get_keyword_rankings(keyword_doc["keywords"])
-        
-        # Store rankings in database
-        ranking_docs = []
-        for ranking in rankings:
-            ranking_doc = {
-                "keyword_id": keyword_id,
-                "video_id": keyword_doc["video_id"],
-                "user_id": str(current_user["_id"]),
-                "keyword": ranking["keyword"],
-                "rank": ranking["rank"],
-                "search_volume": ranking["search_volume"],
-                "competition": ranking["competition"],
-                "created_at": datetime.now()
-            }
-            
-            result = db.rankings.insert_one(ranking_doc)
-            # Convert ObjectId to string to make it JSON serializable
-            ranking_doc["_id"] = str(result.inserted_id)
-            ranking_docs.append(ranking_doc)
-        
-        # Make sure all fields are JSON serializable
-        response_data = {
-            "video_id": keyword_doc["video_id"],
-            "keyword_id": keyword_id,
-            "rankings": ranking_docs,
-            "keywords": keyword_doc["keywords"]
-        }
-        
-        return response_data
+        async with admission_pool("search").slot():
+            return await run_in_threadpool(rank_keywords, get_db(), keyword_doc, user_id, None, force)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error getting rankings: {str(e)}")
-        # Return mock rankings as fallback
-        try:
-            fallback_rankings = []
-            for keyword in keyword_doc["keywords"]:
-                ranking_doc = {
-                    "keyword_id": keyword_id,
-                    "video_id": keyword_doc["video_id"],
-                    "user_id": str(current_user["_id"]),
-                    "keyword": keyword,
-                    "rank": 5.0,
-                    "search_volume": 1000,
-                    "competition": 0.5,
-                    "created_at": datetime.now()
-                }
-                
-                result = db.rankings.insert_one(ranking_doc)
-                ranking_doc["_id"] = str(result.inserted_id)
-                fallback_rankings.append(ranking_doc)
-            
-            return {
-                "video_id": keyword_doc["video_id"],
-                "keyword_id": keyword_id,
-                "rankings": fallback_rankings,
-                "keywords": keyword_doc["keywords"],
-                "note": "Mock rankings used due to API error"
-            }
-        except Exception as inner_e:
-            print(f"Error creating fallback rankings: {str(inner_e)}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to get rankings: {str(e)}"
-            )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get rankings: {str(e)}"
+        )
+
+def _rankings_cache_control(age):
+    fresh_for = max(0, int(RANKINGS_TTL - age))
+    return f"private, max-age={fresh_for}, stale-while-revalidate={RANKINGS_STALE_TTL}"
+
+@seo_router.post("/ranking/{keyword_id}")
+async def get_rankings(
+    keyword_id: str,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Look up and store fresh rankings for a keyword set"""
+    user_id = str(current_user["_id"])
+    keyword_doc = await _find_user_keywords(db, keyword_id, user_id)
+    return await _rank_now(keyword_doc, user_id, force=True)
+
+@seo_router.get("/ranking/{keyword_id}")
+async def get_latest_rankings(
+    keyword_id: str,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """
+    Get the latest stored rankings of a keyword set without spending
+    search quota. Rankings older than RANKINGS_TTL are returned with
+    stale=true while a background job refreshes them. Only when there
+    are none, or they are older than RANKINGS_TTL + RANKINGS_STALE_TTL,
+    are they looked up while the caller waits.
+    """
+    user_id = str(current_user["_id"])
+    keyword_doc = await _find_user_keywords(db, keyword_id, user_id)
+    
+    snapshot = await db.ranking_snapshots.find_one({"keyword_id": keyword_id}, sort=[("created_at", -1)])
+    age = (datetime.utcnow() - snapshot["created_at"]).total_seconds() if snapshot else None
+    if snapshot is None or age > RANKINGS_TTL + RANKINGS_STALE_TTL:
+        result = await _rank_now(keyword_doc, user_id, force=snapshot is not None)
+        response.headers["Cache-Control"] = _rankings_cache_control(0)
+        return {**result, "stale": False}
+    
+    result = {
+        "video_id": keyword_doc["video_id"],
+        "keyword_id": keyword_id,
+        "rankings": snapshot_rows(snapshot),
+        "keywords": keyword_doc["keywords"],
+        "created_at": snapshot["created_at"],
+        # Mock rankings stored after an API error have no artifact key; retry those too
+        "stale": age > RANKINGS_TTL or snapshot.get("artifact_key") is None
+    }
+    if result["stale"]:
+        # Identical refreshes already queued or running are joined, not repeated
+        job = await run_in_threadpool(
+            get_job_queue().submit, "rankings", user_id, keyword_doc["video_id"], {"keyword_id": keyword_id}, BULK
+        )
+        result["refresh_job_id"] = str(job["_id"])
+    response.headers["Cache-Control"] = _rankings_cache_control(age)
+    return result
 
 # Get keywords by ID
 @seo_router.get("/keywords/{keyword_id}")
 async def get_keywords(
     keyword_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
 ):
-    db = get_db()
-    
     # Find keywords by ID
-    keyword_doc = db.keywords.find_one({"_id": ObjectId(keyword_id), "user_id": str(current_user["_id"])})
+    keyword_doc = await db.keywords.find_one({"_id": ObjectId(keyword_id), "user_id": str(current_user["_id"])})
     if not keyword_doc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -431,17 +501,42 @@ async def get_keywords(
     return keyword_doc
 
 # Video details route
+async def _build_video_summary(db, video_id, user_id):
+    """Summarize a video that has no summary yet from the source collections"""
+    video = await db.videos.find_one({"_id": video_id, "user_id": user_id}, {"artifacts": 0})
+    if not video:
+        return None
+    
+    keyword_doc = None
+    rankings = []
+    if video.get("keywords_id"):
+        keyword_doc = await db.keywords.find_one({"_id": ObjectId(video["keywords_id"])})
+        rankings = await latest_rows_async(db, video["keywords_id"])
+    
+    summary = summary_document(video, keyword_doc, rankings)
+    await db.video_summaries.replace_one({"_id": video_id}, summary, upsert=True)
+    return summary
+
 @seo_router.get("/video/{video_id}")
 async def get_video_details(
     video_id: str,
-    current_user: dict = Depends(get_current_user)
+    include_text: bool = True,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
 ):
-    db = get_db()
+    """Get a video's title, status, latest keywords and latest rankings from its summary"""
+    if not ObjectId.is_valid(video_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video not found"
+        )
     
     try:
-        # Find video by ID
-        video = db.videos.find_one({"_id": ObjectId(video_id), "user_id": str(current_user["_id"])})
-        if not video:
+        user_id = str(current_user["_id"])
+        summary = await db.video_summaries.find_one({"_id": ObjectId(video_id), "user_id": user_id})
+        if not summary:
+            summary = await _build_video_summary(db, ObjectId(video_id), user_id)
+        if not summary:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Video not found"
@@ -449,30 +544,31 @@ async def get_video_details(
         
         # Format the response
         video_details = {
-            "_id": str(video["_id"]),
-            "title": video["title"],
-            "filename": video["filename"],
-            "processed": video.get("processed", False),
-            "extracted_text": video.get("extracted_text", ""),
-            "keywords_id": video.get("keywords_id", ""),
-            "created_at": video["created_at"],
-            "updated_at": video.get("updated_at", video["created_at"])
+            "_id": str(summary["_id"]),
+            "title": summary["title"],
+            "filename": summary["filename"],
+            "processed": summary["processed"],
+            "status": summary["status"],
+            "has_text": summary["has_text"],
+            "keywords_id": summary["keywords_id"],
+            "created_at": summary["created_at"],
+            "updated_at": summary["updated_at"]
         }
+        if summary["keywords"]:
+            video_details["keywords"] = summary["keywords"]
+        if summary["rankings"]:
+            video_details["rankings"] = summary["rankings"]
         
-        # Get keywords if available
-        if "keywords_id" in video and video["keywords_id"]:
-            keywords = db.keywords.find_one({"_id": ObjectId(video["keywords_id"])})
-            if keywords:
-                video_details["keywords"] = keywords["keywords"]
-        
-        # Get rankings if available
-        if "keywords_id" in video and video["keywords_id"]:
-            rankings = list(db.rankings.find({"keyword_id": video["keywords_id"]}))
-            if rankings:
-                video_details["rankings"] = rankings
+        # The transcript is kept out of the summary; fetch it only when asked for
+        if include_text:
+            video = await db.videos.find_one({"_id": summary["_id"]}, {"extracted_text": 1})
+            texts = await load_transcripts(db, [video]) if video else {}
+            video_details["extracted_text"] = texts.get(summary["_id"], "")
         
         return video_details
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error getting video details: {str(e)}")
         raise HTTPException(
@@ -480,51 +576,234 @@ async def get_video_details(
             detail=f"Failed to get video details: {str(e)}"
         )
 
+@seo_router.delete("/video/{video_id}")
+async def delete_video(
+    video_id: str,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Delete a video with its transcript, keywords and rankings, and drop its reference to the stored file"""
+    video = None
+    if ObjectId.is_valid(video_id):
+        video = await db.videos.find_one_and_delete({"_id": ObjectId(video_id), "user_id": str(current_user["_id"])})
+    if not video:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video not found"
+        )
+    
+    try:
+        await db.video_summaries.delete_one({"_id": video["_id"]})
+        await db.keywords.delete_many({"video_id": video_id})
+        await db.ranking_snapshots.delete_many({"video_id": video_id})
+        await db.rankings.delete_many({"video_id": video_id})
+        await run_in_threadpool(TranscriptStore(get_db()).delete, video["_id"])
+        # Other videos may share the file; it is deleted with the last reference
+        if video.get("blob_sha256"):
+            await run_in_threadpool(BlobStore(get_db()).release, video["blob_sha256"])
+    except Exception as e:
+        print(f"Error deleting video data: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to delete video data: {str(e)}"
+        )
+    
+    return {"id": video_id, "message": "Video deleted successfully"}
+
+# Signed media URL route
+@seo_router.get("/video/{video_id}/url")
+async def get_video_url(
+    video_id: str,
+    expires_in: int = 3600,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """Get a signed, expiring URL for downloading a video's media file"""
+    video = await db.videos.find_one({"_id": ObjectId(video_id), "user_id": str(current_user["_id"])})
+    if not video or not video.get("storage_key"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video not found"
+        )
+    
+    expires_in = max(60, min(expires_in, 24 * 3600))
+    return {
+        "video_id": video_id,
+        "url": get_storage().presigned_url(video["storage_key"], expires_in),
+        "expires_in": expires_in
+    }
+
+# Video streaming route
+@seo_router.get("/video/{video_id}/stream")
+async def stream_video(
+    video_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user_from_header_or_query),
+    db = Depends(get_async_db)
+):
+    """Stream a video with HTTP Range support for seeking in the browser"""
+    video = None
+    if ObjectId.is_valid(video_id):
+        video = await db.videos.find_one(
+            {"_id": ObjectId(video_id), "user_id": str(current_user["_id"])},
+            {"filename": 1, "file_path": 1, "storage_key": 1, "blob_sha256": 1}
+        )
+    if not video:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video not found"
+        )
+    
+    storage = get_storage()
+    if video.get("storage_key") and storage.name != "local":
+        # The bucket serves ranges itself; send the player straight there
+        return RedirectResponse(storage.presigned_url(video["storage_key"], 3600), status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    
+    path = storage.path(video["storage_key"]) if video.get("storage_key") else video["file_path"]
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video file not found"
+        )
+    
+    return RangeFileResponse(
+        path,
+        request.headers,
+        make_etag(video, stat_result),
+        media_type=guess_media_type(video.get("filename")),
+        stat_result=stat_result
+    )
+
+@media_router.get("/{key:path}")
+async def get_media(key: str, expires: int, signature: str, request: Request):
+    """Serve a media file from local storage for a signed URL"""
+    if not verify_media_signature(key, expires, signature):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or expired media URL"
+        )
+    
+    storage = get_storage()
+    try:
+        path = storage.path(key)
+    except (AttributeError, StorageError):
+        # Only the local backend serves files itself; S3 URLs point at the bucket
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Media not found"
+        )
+    if not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Media not found"
+        )
+    
+    return RangeFileResponse(path, request.headers, make_etag({}, os.stat(path)))
+
 # History route
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 200
+# Heavy fields left out of history pages unless requested with fields=
+HISTORY_OPTIONAL_FIELDS = ("keywords", "rankings", "extracted_text")
+
+def _history_pipeline(user_id, after, limit, fields):
+    """One aggregation for a page of history, newest first, joined with its keywords and rankings"""
+    # Keyset pagination: everything strictly older than the last item of the previous page
+    match = {"user_id": user_id, **keyset_filter(after)}
+    
+    projection = {
+        "title": 1,
+        "filename": 1,
+        "processed": 1,
+        "created_at": 1,
+        "keywords_id": 1,
+        "youtube_uploaded": 1,
+        # Videos from before the transcript store keep their text inline
+        "has_text": {"$ifNull": ["$has_text", {"$gt": [{"$strLenCP": {"$ifNull": ["$extracted_text", ""]}}, 0]}]}
+    }
+    if "extracted_text" in fields:
+        projection["extracted_text"] = 1
+    
+    pipeline = [
+        {"$match": match},
+        {"$sort": dict(KEYSET_SORT)},
+        # One extra item tells whether there is a next page
+        {"$limit": limit + 1},
+        {"$project": projection}
+    ]
+    if "keywords" in fields:
+        pipeline += [
+            {"$addFields": {"keywords_oid": {"$convert": {
+                "input": "$keywords_id", "to": "objectId", "onError": None, "onNull": None
+            }}}},
+            {"$lookup": {"from": "keywords", "localField": "keywords_oid", "foreignField": "_id", "as": "keyword_docs"}},
+            {"$addFields": {"keywords": {"$map": {"input": "$keyword_docs", "in": "$$this.keywords"}}}},
+            {"$project": {"keywords_oid": 0, "keyword_docs": 0}}
+        ]
+    if "rankings" in fields:
+        pipeline.append(
+            # Snapshots unwound to one row per keyword, as older clients expect
+            {"$lookup": {"from": "ranking_rows", "localField": "keywords_id", "foreignField": "keyword_id", "as": "rankings"}}
+        )
+    return pipeline
+
 @history_router.get("/")
-async def get_history(current_user: dict = Depends(get_current_user)):
-    db = get_db()
+async def get_history(
+    limit: int = HISTORY_DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
+    """
+    Get a page of the user's videos, newest first. Pass next_cursor from
+    the response as cursor for the next page, and fields=keywords,rankings,extracted_text
+    to include any of those.
+    """
+    requested = {field.strip() for field in fields.split(",") if field.strip()} if fields else set()
+    unknown = requested - set(HISTORY_OPTIONAL_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"fields must be a comma-separated subset of: {', '.join(HISTORY_OPTIONAL_FIELDS)}"
+        )
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+    after = decode_cursor(cursor) if cursor else None
     
     try:
-        # Get all videos for the current user
-        videos = list(db.videos.find({"user_id": str(current_user["_id"])}).sort("created_at", -1))
+        pipeline = _history_pipeline(str(current_user["_id"]), after, limit, requested)
+        videos, next_cursor = page_of(await db.videos.aggregate(pipeline).to_list(None), limit)
+        texts = await load_transcripts(db, videos) if "extracted_text" in requested else {}
         
         # Format the response
         history = []
         for video in videos:
-            video_id = str(video["_id"])
-            
-            # Get keywords for the video
-            keywords = []
-            if "keywords_id" in video and video["keywords_id"]:
-                keyword_doc = db.keywords.find_one({"_id": ObjectId(video["keywords_id"])})
-                if keyword_doc and "keywords" in keyword_doc:
-                    keywords = [keyword_doc["keywords"]]
-            
-            # Get rankings for the video
-            rankings = []
-            if "keywords_id" in video and video["keywords_id"]:
-                rankings = list(db.rankings.find({"keyword_id": video["keywords_id"]}))
-                # Convert ObjectId to string
-                for ranking in rankings:
-                    if "_id" in ranking:
-                        ranking["_id"] = str(ranking["_id"])
-            
             history_item = {
-                "_id": video_id,
+                "_id": str(video["_id"]),
                 "title": video["title"],
                 "filename": video["filename"],
                 "processed": video.get("processed", False),
                 "created_at": video["created_at"],
                 "keywords_id": video.get("keywords_id", ""),
-                "keywords": keywords,
-                "rankings": rankings,
-                "extracted_text": video.get("extracted_text", "")
+                "has_text": video["has_text"],
+                "youtube_uploaded": video.get("youtube_uploaded", False)
             }
+            if "keywords" in requested:
+                history_item["keywords"] = video.get("keywords", [])
+            if "rankings" in requested:
+                rankings = video.get("rankings", [])
+                # Convert ObjectId to string
+                for ranking in rankings:
+                    ranking["_id"] = str(ranking["_id"])
+                history_item["rankings"] = rankings
+            if "extracted_text" in requested:
+                history_item["extracted_text"] = texts.get(video["_id"], "")
             
             history.append(history_item)
         
-        return {"history": history}
+        return {"history": history, "next_cursor": next_cursor}
     except Exception as e:
         print(f"Error getting history: {str(e)}")
         raise HTTPException(
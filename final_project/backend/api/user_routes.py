@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from bson.objectid import ObjectId
 from datetime import datetime
+from typing import Optional
 import logging
-from user_app import get_db
-from utils.auth_simple import get_current_user
+import os
+import time
+from config.db import get_async_db
+from utils.auth import get_current_user
+from utils.pagination import KEYSET_SORT, decode_cursor, keyset_filter, page_of
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -46,7 +50,8 @@ async def get_user_profile(current_user: dict = Depends(get_current_user)):
 @user_router.post("/profile")
 async def update_user_profile(
     request: Request,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
 ):
     """Update user profile information"""
     try:
@@ -66,8 +71,7 @@ async def update_user_profile(
         update_data["updated_at"] = datetime.now()
         
         # Update user in database
-        db = get_db()
-        result = db.users.update_one(
+        result = await db.users.update_one(
             {"_id": current_user["_id"]},
             {"$set": update_data}
         )
@@ -88,7 +92,8 @@ async def update_user_profile(
 @user_router.put("/profile")
 async def update_user_profile_put(
     request: Request,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
 ):
     """Update user profile information (PUT method)"""
     try:
@@ -108,8 +113,7 @@ async def update_user_profile_put(
         update_data["updated_at"] = datetime.now()
         
         # Update user in database
-        db = get_db()
-        result = db.users.update_one(
+        result = await db.users.update_one(
             {"_id": current_user["_id"]},
             {"$set": update_data}
         )
@@ -130,7 +134,8 @@ async def update_user_profile_put(
 @user_router.post("/notification-preferences")
 async def update_notification_preferences(
     request: Request,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
 ):
     """Update user notification preferences"""
     try:
@@ -153,8 +158,7 @@ async def update_notification_preferences(
         }
         
         # Update user in database
-        db = get_db()
-        result = db.users.update_one(
+        result = await db.users.update_one(
             {"_id": current_user["_id"]},
             {"$set": {
                 "notification_preferences": notification_preferences,
@@ -178,7 +182,8 @@ async def update_notification_preferences(
 @user_router.put("/notification-preferences")
 async def update_notification_preferences_put(
     request: Request,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
 ):
     """Update user notification preferences (PUT method)"""
     try:
@@ -201,8 +206,7 @@ async def update_notification_preferences_put(
         }
         
         # Update user in database
-        db = get_db()
-        result = db.users.update_one(
+        result = await db.users.update_one(
             {"_id": current_user["_id"]},
             {"$set": {
                 "notification_preferences": notification_preferences,
@@ -223,44 +227,88 @@ async def update_notification_preferences_put(
             detail=f"Failed to update notification preferences: {str(e)}"
         )
 
+# Seconds a user's notification count is reused before it is counted again
+NOTIFICATIONS_COUNT_TTL = int(os.getenv("NOTIFICATIONS_COUNT_TTL", 60))
+NOTIFICATIONS_MAX_LIMIT = 100
+_notification_counts = {}
+
+async def _notification_count(db, user_id):
+    """The user's notification count, cached for NOTIFICATIONS_COUNT_TTL seconds"""
+    cached = _notification_counts.get(user_id)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    count = await db.notifications.count_documents({"user_id": user_id})
+    _notification_counts[user_id] = (count, time.monotonic() + NOTIFICATIONS_COUNT_TTL)
+    return count
+
+async def _notification_video_titles(db, user_id, notifications):
+    """Titles of the notifications' videos, fetched in one query"""
+    # The monitor stores the YouTube ID; older notifications stored the video's _id
+    video_ids = {str(notification.get("video_id")) for notification in notifications if notification.get("video_id")}
+    object_ids = [ObjectId(video_id) for video_id in video_ids if ObjectId.is_valid(video_id)]
+    videos = await db.videos.find(
+        {"user_id": user_id, "$or": [
+            {"_id": {"$in": object_ids}},
+            {"youtube_id": {"$in": list(video_ids)}},
+            {"youtube_video_id": {"$in": list(video_ids)}}
+        ]},
+        {"title": 1, "youtube_id": 1, "youtube_video_id": 1}
+    ).to_list(None)
+    
+    titles = {}
+    for video in videos:
+        titles[str(video["_id"])] = video["title"]
+        for field in ("youtube_id", "youtube_video_id"):
+            if video.get(field):
+                titles[video[field]] = video["title"]
+    return titles
+
 @user_router.get("/notifications")
 async def get_user_notifications(
     current_user: dict = Depends(get_current_user),
     limit: int = 10,
-    skip: int = 0
+    cursor: Optional[str] = None,
+    db = Depends(get_async_db)
 ):
-    """Get user notifications history"""
+    """Get a page of the user's notifications, newest first; pass next_cursor as cursor for the next page"""
+    limit = max(1, min(limit, NOTIFICATIONS_MAX_LIMIT))
+    after = decode_cursor(cursor) if cursor else None
+    
     try:
         logger.info(f"Getting notifications for user: {current_user.get('email', 'unknown')}")
         
-        db = get_db()
+        # Notifications store the user ID as a string
+        user_id = str(current_user["_id"])
         
         # Get notifications for this user
-        notifications_cursor = db.notifications.find(
-            {"user_id": current_user["_id"]}
-        ).sort("sent_at", -1).skip(skip).limit(limit)
+        notifications = await db.notifications.find(
+            {"user_id": user_id, **keyset_filter(after)}
+        ).sort(KEYSET_SORT).limit(limit + 1).to_list(None)
+        notifications, next_cursor = page_of(notifications, limit)
         
-        notifications = []
-        for notification in notifications_cursor:
-            # Get video info
-            video = db.videos.find_one({"_id": notification["video_id"]})
-            
-            notifications.append({
-                "id": str(notification["_id"]),
-                "video_id": str(notification["video_id"]),
-                "video_title": video["title"] if video else "Unknown Video",
-                "metric_type": notification["metric_type"],
-                "milestone": notification["milestone"],
-                "sent_at": notification["sent_at"].isoformat()
-            })
+        titles = await _notification_video_titles(db, user_id, notifications) if notifications else {}
         
-        # Get total count
-        total_count = db.notifications.count_documents({"user_id": current_user["_id"]})
+        results = []
+        for notification in notifications:
+            # Older notifications used metric_type and sent_at
+            notification_type = notification.get("type", notification.get("metric_type"))
+            created_at = notification.get("created_at", notification.get("sent_at"))
+            video_id = str(notification.get("video_id", ""))
+            results.append({
+                "_id": str(notification["_id"]),
+                "video_id": video_id,
+                "video_title": titles.get(video_id, "Unknown Video"),
+                "type": notification_type,
+                "milestone": notification.get("milestone"),
+                "message": notification.get("message", ""),
+                "created_at": created_at.isoformat() if created_at else None
+            })
         
         logger.info(f"Notifications retrieved successfully for user: {current_user.get('email', 'unknown')}")
         return {
-            "notifications": notifications,
-            "total": total_count
+            "notifications": results,
+            "next_cursor": next_cursor,
+            "total": await _notification_count(db, user_id)
         }
     except Exception as e:
         logger.error(f"Error getting notifications: {str(e)}")
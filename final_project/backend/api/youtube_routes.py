@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File
 from fastapi.responses import RedirectResponse
+from fastapi.concurrency import run_in_threadpool
 import os
 import requests
 from urllib.parse import urlencode
@@ -7,12 +8,14 @@ from datetime import datetime
 from bson import ObjectId
 import google.oauth2.credentials
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaIoBaseUpload
 from googleapiclient.errors import HttpError
 
 from models.user import UserResponse
 from utils.auth import get_current_user
-from config.db import get_db
+from services.storage import get_storage, open_video_reader
+from utils.media_response import guess_media_type
+from config.db import get_async_db
 
 # Create router
 youtube_router = APIRouter()
@@ -23,6 +26,35 @@ CLIENT_SECRET = os.getenv("YOUTUBE_CLIENT_SECRET")
 REDIRECT_URI = "http://localhost:3000/dashboard"
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload", "https://www.googleapis.com/auth/youtube"]
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
+# Resumable upload chunk size; must be a multiple of 256KB
+YOUTUBE_UPLOAD_CHUNK_SIZE = int(os.getenv("YOUTUBE_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))  # 8MB
+
+
+def _video_file_exists(video):
+    if video.get("storage_key"):
+        return get_storage().exists(video["storage_key"])
+    return os.path.exists(video["file_path"])
+
+
+def _upload_video_file(youtube, body, video):
+    """
+    Send a video to YouTube as a resumable upload.
+
+    The file is read one chunk at a time, so a video kept in S3 is fetched
+    with ranged GETs as the upload goes instead of downloaded first.
+    """
+    with open_video_reader(video) as reader:
+        insert_request = youtube.videos().insert(
+            part=','.join(body.keys()),
+            body=body,
+            media_body=MediaIoBaseUpload(
+                reader,
+                mimetype=guess_media_type(video.get("filename")),
+                chunksize=YOUTUBE_UPLOAD_CHUNK_SIZE,
+                resumable=True
+            )
+        )
+        return insert_request.execute()
 
 @youtube_router.get("/auth")
 async def youtube_auth(current_user: dict = Depends(get_current_user)):
@@ -43,7 +75,13 @@ async def youtube_auth(current_user: dict = Depends(get_current_user)):
     return {"auth_url": auth_url}
 
 @youtube_router.get("/callback")
-async def youtube_callback(code: str = None, state: str = None, error: str = None, current_user: dict = Depends(get_current_user)):
+async def youtube_callback(
+    code: str = None,
+    state: str = None,
+    error: str = None,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
+):
     """Handle OAuth2 callback from Google"""
     if error:
         print(f"OAuth error: {error}")
@@ -56,8 +94,6 @@ async def youtube_callback(code: str = None, state: str = None, error: str = Non
     if str(current_user["_id"]) != state:
         return {"success": False, "error": "Invalid state parameter"}
     
-    db = get_db()
-    
     try:
         # Exchange authorization code for tokens
         token_url = "https://oauth2.googleapis.com/token"
@@ -69,7 +105,7 @@ async def youtube_callback(code: str = None, state: str = None, error: str = Non
             "grant_type": "authorization_code"
         }
         
-        token_response = requests.post(token_url, data=token_data)
+        token_response = await run_in_threadpool(requests.post, token_url, data=token_data)
         token_response.raise_for_status()
         token_info = token_response.json()
         
@@ -77,7 +113,7 @@ async def youtube_callback(code: str = None, state: str = None, error: str = Non
         user_id = state  # This is the user ID we passed as state
         
         # Update user with YouTube tokens
-        db.users.update_one(
+        await db.users.update_one(
             {"_id": ObjectId(user_id)},
             {"$set": {
                 "youtube_access_token": token_info["access_token"],
@@ -95,7 +131,8 @@ async def youtube_callback(code: str = None, state: str = None, error: str = Non
         }
         
         # Get channel info to verify connection
-        channel_response = requests.get(
+        channel_response = await run_in_threadpool(
+            requests.get,
             "https://www.googleapis.com/youtube/v3/channels?part=snippet&mine=true",
             headers=headers
         )
@@ -107,7 +144,7 @@ async def youtube_callback(code: str = None, state: str = None, error: str = Non
                 print(f"Successfully connected to YouTube channel: {channel_title}")
                 
                 # Store channel info
-                db.users.update_one(
+                await db.users.update_one(
                     {"_id": ObjectId(user_id)},
                     {"$set": {
                         "youtube_channel_title": channel_title,
@@ -130,7 +167,8 @@ async def youtube_callback(code: str = None, state: str = None, error: str = Non
 async def upload_to_youtube(
     video_id: str,
     request: Request,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
 ):
     """Upload a processed video to YouTube with SEO tags"""
     try:
@@ -148,8 +186,6 @@ async def upload_to_youtube(
                 detail=f"Invalid request body: {str(e)}"
             )
         
-        db = get_db()
-        
         # Check if user has YouTube tokens
         if not current_user.get("youtube_connected"):
             raise HTTPException(
@@ -159,7 +195,7 @@ async def upload_to_youtube(
         
         # Find video by ID
         try:
-            video = db.videos.find_one({"_id": ObjectId(video_id), "user_id": str(current_user["_id"])})
+            video = await db.videos.find_one({"_id": ObjectId(video_id), "user_id": str(current_user["_id"])})
             if not video:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -176,7 +212,8 @@ async def upload_to_youtube(
         if current_user.get("youtube_token_expiry", 0) < datetime.now().timestamp():
             try:
                 # Refresh token
-                refresh_response = requests.post(
+                refresh_response = await run_in_threadpool(
+                    requests.post,
                     "https://oauth2.googleapis.com/token",
                     data={
                         "client_id": CLIENT_ID,
@@ -189,7 +226,7 @@ async def upload_to_youtube(
                 refresh_data = refresh_response.json()
                 
                 # Update tokens in database
-                db.users.update_one(
+                await db.users.update_one(
                     {"_id": current_user["_id"]},
                     {"$set": {
                         "youtube_access_token": refresh_data["access_token"],
@@ -211,7 +248,7 @@ async def upload_to_youtube(
         keywords = []
         try:
             if video.get("keywords_id"):
-                keyword_doc = db.keywords.find_one({"_id": ObjectId(video["keywords_id"])})
+                keyword_doc = await db.keywords.find_one({"_id": ObjectId(video["keywords_id"])})
                 if keyword_doc and keyword_doc.get("keywords") and len(keyword_doc["keywords"]) > 0:
                     # Handle different keyword formats
                     if isinstance(keyword_doc["keywords"][0], dict) and "keyword" in keyword_doc["keywords"][0]:
@@ -232,9 +269,9 @@ async def upload_to_youtube(
         # Use provided tags or use keywords
         video_tags = tags or keywords
         
-        # Get the video file path
-        video_path = os.path.join(UPLOAD_DIR, video["filename"])
-        if not os.path.exists(video_path):
+        # Make sure the video file is still in storage
+        file_exists = await run_in_threadpool(_video_file_exists, video)
+        if not file_exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Video file not found"
@@ -267,23 +304,11 @@ async def upload_to_youtube(
 
         # Upload the video
         try:
-            # Insert the video
-            insert_request = youtube.videos().insert(
-                part=','.join(body.keys()),
-                body=body,
-                media_body=MediaFileUpload(
-                    video_path,
-                    chunksize=-1,
-                    resumable=True
-                )
-            )
-
-            # Execute the upload
-            response = insert_request.execute()
+            response = await run_in_threadpool(_upload_video_file, youtube, body, video)
             youtube_video_id = response['id']
 
             # Update video with YouTube info
-            db.videos.update_one(
+            await db.videos.update_one(
                 {"_id": ObjectId(video_id)},
                 {"$set": {
                     "youtube_uploaded": True,
@@ -328,7 +353,7 @@ async def upload_to_youtube(
         keywords = []
         try:
             if video.get("keywords_id"):
-                keyword_doc = db.keywords.find_one({"_id": ObjectId(video["keywords_id"])})
+                keyword_doc = await db.keywords.find_one({"_id": ObjectId(video["keywords_id"])})
                 if keyword_doc and keyword_doc.get("keywords") and len(keyword_doc["keywords"]) > 0:
                     # Handle different keyword formats
                     if isinstance(keyword_doc["keywords"][0], dict) and "keyword" in keyword_doc["keywords"][0]:
@@ -383,7 +408,7 @@ async def upload_to_youtube(
         
         # Update video with YouTube info
         try:
-            db.videos.update_one(
+            await db.videos.update_one(
                 {"_id": ObjectId(video_id)},
                 {"$set": {
                     "youtube_uploaded": True,
@@ -422,7 +447,8 @@ async def upload_to_youtube(
 async def get_youtube_upload_url(
     video_id: str,
     request: Request,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_async_db)
 ):
     """Get a URL to redirect users to YouTube for uploading a video"""
     try:
@@ -439,8 +465,6 @@ async def get_youtube_upload_url(
                 detail=f"Invalid request body: {str(e)}"
             )
         
-        db = get_db()
-        
         # Check if user has YouTube tokens
         if not current_user.get("youtube_connected"):
             raise HTTPException(
@@ -450,7 +474,7 @@ async def get_youtube_upload_url(
         
         # Find video by ID
         try:
-            video = db.videos.find_one({"_id": ObjectId(video_id), "user_id": str(current_user["_id"])})
+            video = await db.videos.find_one({"_id": ObjectId(video_id), "user_id": str(current_user["_id"])})
             if not video:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -467,7 +491,8 @@ async def get_youtube_upload_url(
         if current_user.get("youtube_token_expiry", 0) < datetime.now().timestamp():
             try:
                 # Refresh token
-                refresh_response = requests.post(
+                refresh_response = await run_in_threadpool(
+                    requests.post,
                     "https://oauth2.googleapis.com/token",
                     data={
                         "client_id": CLIENT_ID,
@@ -480,7 +505,7 @@ async def get_youtube_upload_url(
                 refresh_data = refresh_response.json()
                 
                 # Update tokens in database
-                db.users.update_one(
+                await db.users.update_one(
                     {"_id": current_user["_id"]},
                     {"$set": {
                         "youtube_access_token": refresh_data["access_token"],
@@ -505,7 +530,7 @@ async def get_youtube_upload_url(
         
         # Update video with YouTube info
         try:
-            db.videos.update_one(
+            await db.videos.update_one(
                 {"_id": ObjectId(video_id)},
                 {"$set": {
                     "youtube_redirect_attempted": True,
@@ -539,7 +564,7 @@ async def get_youtube_upload_url(
         )
 
 @youtube_router.get("/status")
-async def youtube_status(current_user: dict = Depends(get_current_user)):
+async def youtube_status(current_user: dict = Depends(get_current_user), db = Depends(get_async_db)):
     """Check if user has connected YouTube account"""
     try:
         connected = current_user.get("youtube_connected", False)
@@ -552,7 +577,7 @@ async def youtube_status(current_user: dict = Depends(get_current_user)):
                 # Token expired, try to refresh
                 if current_user.get("youtube_refresh_token"):
                     try:
-                        new_token = await refresh_youtube_token(current_user)
+                        new_token = await refresh_youtube_token(current_user, db)
                         if not new_token:
                             connected = False
                     except:
@@ -566,7 +591,7 @@ async def youtube_status(current_user: dict = Depends(get_current_user)):
         print(f"Error checking YouTube status: {str(e)}")
         return {"connected": False, "error": str(e)}
 
-async def refresh_youtube_token(user):
+async def refresh_youtube_token(user, db):
     """Refresh YouTube access token"""
     try:
         refresh_token = user.get("youtube_refresh_token")
@@ -581,13 +606,12 @@ async def refresh_youtube_token(user):
             "grant_type": "refresh_token"
         }
         
-        token_response = requests.post(token_url, data=token_data)
+        token_response = await run_in_threadpool(requests.post, token_url, data=token_data)
         token_response.raise_for_status()
         token_info = token_response.json()
         
         # Update user with new token
-        db = get_db()
-        db.users.update_one(
+        await db.users.update_one(
             {"_id": user["_id"]},
             {"$set": {
                 "youtube_access_token": token_info["access_token"],
@@ -10,9 +10,14 @@ logger = logging.getLogger(__name__)
 
 # Try to import the routes with error handling
 try:
-    from api.routes import auth_router, video_router, seo_router, history_router
+    from api.routes import auth_router, video_router, seo_router, history_router, media_router
     from api.youtube_routes import youtube_router
-    from config.db import initialize_db
+    from api.job_routes import jobs_router
+    from api.metrics_routes import metrics_router
+    from api.analytics_routes import analytics_router
+    from services.job_queue import get_job_queue
+    from services.event_bus import event_bus, MongoEventLog
+    from config.db import initialize_db, get_db
     routes_imported = True
 except ImportError as e:
     logger.error(f"Error importing main routes: {e}")
@@ -54,7 +59,11 @@ if routes_imported:
     fastapi_app.include_router(video_router, prefix="/upload", tags=["Video Upload"])
     fastapi_app.include_router(seo_router, prefix="", tags=["SEO Analysis"])
     fastapi_app.include_router(history_router, prefix="/history", tags=["History"])
+    fastapi_app.include_router(media_router, prefix="/media", tags=["Media"])
     fastapi_app.include_router(youtube_router, prefix="/youtube", tags=["YouTube Integration"])
+    fastapi_app.include_router(jobs_router, prefix="/jobs", tags=["Jobs"])
+    fastapi_app.include_router(metrics_router, prefix="/metrics", tags=["Metrics"])
+    fastapi_app.include_router(analytics_router, prefix="/analytics", tags=["Analytics"])
 
     # Include user router if available
     if has_user_routes:
@@ -72,6 +81,25 @@ if routes_imported:
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
+
+    # Start the background job workers
+    try:
+        get_job_queue().start()
+    except Exception as e:
+        logger.error(f"Failed to start job workers: {e}")
+
+    # Compact old rankings and archive rows before their TTL indexes delete them
+    try:
+        from tasks.retention_task import start_retention_scheduler
+        start_retention_scheduler()
+    except Exception as e:
+        logger.error(f"Failed to start retention scheduler: {e}")
+
+    # Forward job events published by standalone workers to SSE clients
+    try:
+        MongoEventLog(get_db()).start_relay(event_bus)
+    except Exception as e:
+        logger.error(f"Failed to start job event relay: {e}")
 else:
     logger.error("Main routes could not be imported. API will not function correctly.")
 
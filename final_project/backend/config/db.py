@@ -1,24 +1,28 @@
 import os
-from pymongo import MongoClient
+import threading
 from dotenv import load_dotenv
 
+from config.indexes import apply_indexes
+from config.mongo import get_client, get_async_client
+from services.metrics_history import ensure_metrics_collection
+from services.ranking_snapshots import ensure_rankings_view
+
 # Load environment variables
 load_dotenv()
 
-# MongoDB connection string
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DB_NAME = os.getenv("DB_NAME", "video_seo_db")
 
 # Global client variable
 client = None
 db = None
+_db_lock = threading.Lock()
 
 def initialize_db():
     """Initialize the database connection"""
     global client, db
     try:
-        # Connect to MongoDB
-        client = MongoClient(MONGO_URI)
+        # Connect to MongoDB through the shared, pooled client
+        client = get_client()
         db = client[DB_NAME]
         
         # Create collections if they don't exist
@@ -31,8 +35,17 @@ def initialize_db():
         if "keywords" not in db.list_collection_names():
             db.create_collection("keywords")
         
-        if "rankings" not in db.list_collection_names():
-            db.create_collection("rankings")
+        if "ranking_snapshots" not in db.list_collection_names():
+            db.create_collection("ranking_snapshots")
+        
+        # Per-keyword ranking rows for readers that predate snapshots
+        ensure_rankings_view(db)
+        
+        # YouTube monitor polls are kept in a time-series collection
+        ensure_metrics_collection(db)
+        
+        # Create any missing indexes (a no-op for existing ones)
+        apply_indexes(db)
         
         print(f"Connected to MongoDB: {DB_NAME}")
         return db
@@ -44,5 +57,19 @@ def get_db():
     """Get the database instance"""
     global db
     if db is None:
-        db = initialize_db()
+        # Concurrent first requests wait for one initialization
+        with _db_lock:
+            if db is None:
+                db = initialize_db()
     return db
+
+def async_db():
+    """
+    Get the database through the async Motor driver, for code running on
+    the event loop. Services shared with the job workers use get_db().
+    """
+    return get_async_client()[DB_NAME]
+
+async def get_async_db():
+    """FastAPI dependency providing the async database"""
+    return async_db()
@@ -0,0 +1,211 @@
+"""
+Declarative index definitions and an index audit.
+
+INDEXES lists the indexes every collection needs. initialize_db applies
+them at startup with create_index, which does nothing for indexes that
+already exist, so this is safe to run on every start and from every
+process.
+
+HOT_QUERIES lists the query shapes the API and workers run often. The
+audit runs explain() on each and flags plans that scan the whole
+collection or sort in memory:
+
+    python -m config.indexes           # apply the indexes
+    python -m config.indexes --audit   # apply, then explain every hot query
+
+TTL indexes take their expiry from config/retention.py. When a setting
+changes, apply_indexes updates the existing index with collMod instead
+of failing on the conflicting options.
+
+The audit exits with status 1 if any hot query does a collection scan.
+"""
+
+import logging
+import sys
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from config.retention import RANKINGS_COMPACTED_TTL_HOURS, NOTIFICATIONS_RETENTION_DAYS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Server error code for an index that exists with different options
+INDEX_OPTIONS_CONFLICT = 85
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True)
+    ],
+    "videos": [
+        # Serves the history pages, including the _id tie-break of the keyset cursor
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_created_id"),
+        IndexModel([("youtube_id", ASCENDING)], name="youtube_id", sparse=True),
+        IndexModel([("youtube_video_id", ASCENDING)], name="youtube_video_id", sparse=True)
+    ],
+    "rankings": [
+        # Rows from before ranking snapshots, read through the ranking_rows view
+        IndexModel([("keyword_id", ASCENDING), ("artifact_key", ASCENDING)], name="keyword_artifact")
+    ],
+    "ranking_snapshots": [
+        IndexModel([("keyword_id", ASCENDING), ("artifact_key", ASCENDING)], name="keyword_artifact"),
+        IndexModel([("keyword_id", ASCENDING), ("created_at", DESCENDING)], name="keyword_created"),
+        # Finds snapshots due for compaction (tasks/retention_task.py)
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+        IndexModel(
+            [("compacted_at", ASCENDING)], name="compacted_at_ttl",
+            expireAfterSeconds=RANKINGS_COMPACTED_TTL_HOURS * 3600
+        )
+    ],
+    # Daily ranking aggregates; $merge in compaction needs the unique key
+    "rankings_daily": [
+        IndexModel(
+            [("keyword_id", ASCENDING), ("keyword", ASCENDING), ("day", ASCENDING)],
+            name="keyword_day_unique", unique=True
+        )
+    ],
+    "notifications": [
+        # Serves the notifications feed, including the _id tie-break of the keyset cursor
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_created_id"),
+        IndexModel(
+            [("created_at", ASCENDING)], name="created_at_ttl",
+            expireAfterSeconds=NOTIFICATIONS_RETENTION_DAYS * 24 * 3600
+        )
+    ],
+    "jobs": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+        IndexModel([("state", ASCENDING), ("created_at", ASCENDING)], name="state_created"),
+        IndexModel([("state", ASCENDING), ("priority", ASCENDING), ("created_at", ASCENDING)], name="state_priority_created"),
+        # The per-user concurrency cap counts a user's running jobs on every claim
+        IndexModel([("user_id", ASCENDING), ("state", ASCENDING), ("started_at", ASCENDING)], name="user_state_started"),
+        IndexModel([("priority", ASCENDING), ("started_at", DESCENDING)], name="priority_started"),
+        IndexModel([("state", ASCENDING), ("lease_expires_at", ASCENDING)], name="state_lease"),
+        # Only one queued or running job per active_key; finished jobs drop the key
+        IndexModel(
+            [("active_key", ASCENDING)], name="active_key_unique", unique=True,
+            partialFilterExpression={"active_key": {"$exists": True}}
+        )
+    ],
+    # Metric rollups (services/metrics_history.py); $merge in rebuilds needs the unique key
+    "video_metrics_hourly": [
+        IndexModel([("youtube_id", ASCENDING), ("bucket", ASCENDING)], name="youtube_bucket_unique", unique=True)
+    ],
+    "video_metrics_daily": [
+        IndexModel([("youtube_id", ASCENDING), ("bucket", ASCENDING)], name="youtube_bucket_unique", unique=True)
+    ],
+    # Shared keyword search cache (utils/keyword_cache.py)
+    "keyword_search_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0)
+    ],
+    "locks": [
+        # Single-flight locks are removed once purge_at has passed
+        IndexModel([("purge_at", ASCENDING)], name="purge_at_ttl", expireAfterSeconds=0)
+    ]
+}
+
+_SAMPLE_ID = ObjectId()
+_SAMPLE_USER = str(ObjectId())
+
+# (name, collection, filter, sort) for queries that run on every request or poll
+HOT_QUERIES = [
+    ("login by email", "users", {"email": "user@example.com"}, None),
+    ("history page", "videos", {"user_id": _SAMPLE_USER}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("user's video", "videos", {"_id": _SAMPLE_ID, "user_id": _SAMPLE_USER}, None),
+    ("video summary", "video_summaries", {"_id": _SAMPLE_ID, "user_id": _SAMPLE_USER}, None),
+    ("video by YouTube id", "videos", {"youtube_id": "dQw4w9WgXcQ"}, None),
+    ("latest ranking snapshot", "ranking_snapshots", {"keyword_id": str(_SAMPLE_ID)}, [("created_at", DESCENDING)]),
+    ("cached rankings", "ranking_snapshots", {"keyword_id": str(_SAMPLE_ID), "artifact_key": "0" * 64}, None),
+    ("snapshots due for compaction", "ranking_snapshots", {"created_at": {"$lt": datetime(2024, 1, 1)}}, None),
+    ("old ranking rows of a keyword set", "rankings", {"keyword_id": str(_SAMPLE_ID)}, None),
+    ("notifications page", "notifications", {"user_id": _SAMPLE_USER}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("hourly metric series", "video_metrics_hourly", {"youtube_id": "dQw4w9WgXcQ", "bucket": {"$gte": datetime(2024, 1, 1)}}, [("bucket", ASCENDING)]),
+    ("daily metric series", "video_metrics_daily", {"youtube_id": "dQw4w9WgXcQ", "bucket": {"$gte": datetime(2024, 1, 1)}}, [("bucket", ASCENDING)]),
+    ("user's jobs", "jobs", {"user_id": _SAMPLE_USER}, [("created_at", DESCENDING)]),
+    ("queued jobs", "jobs", {"state": "queued"}, [("created_at", ASCENDING)]),
+    ("in-flight job", "jobs", {"active_key": "0" * 64}, None)
+]
+
+
+def apply_indexes(db):
+    """Create any missing indexes; conflicts with existing indexes are logged, not raised"""
+    for collection, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                db[collection].create_indexes([index])
+            except OperationFailure as e:
+                if e.code == INDEX_OPTIONS_CONFLICT and "expireAfterSeconds" in index.document:
+                    _update_ttl(db, collection, index.document)
+                    continue
+                logger.error(f"Could not create index {index.document['name']} on {collection}: {e}")
+
+
+def _update_ttl(db, collection, document):
+    """Change the expiry of an existing TTL index to the configured one"""
+    try:
+        db.command("collMod", collection, index={
+            "name": document["name"],
+            "expireAfterSeconds": document["expireAfterSeconds"]
+        })
+        logger.info(f"Updated expiry of {document['name']} on {collection} to {document['expireAfterSeconds']}s")
+    except OperationFailure as e:
+        logger.error(f"Could not update TTL index {document['name']} on {collection}: {e}")
+
+
+def _plan_stages(plan):
+    """All stage names in an explain() plan tree"""
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+def audit_indexes(db):
+    """
+    Explain every hot query
+
+    Returns:
+        list: (name, collection, stages, problems) per query
+    """
+    results = []
+    for name, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query).limit(20)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning_plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        # Slot-based execution nests the classic plan under queryPlan
+        stages = _plan_stages(winning_plan.get("queryPlan", winning_plan))
+
+        problems = []
+        if "COLLSCAN" in stages:
+            problems.append("collection scan")
+        if "SORT" in stages:
+            problems.append("in-memory sort")
+        results.append((name, collection, stages, problems))
+    return results
+
+
+def main(argv):
+    from config.db import initialize_db
+
+    db = initialize_db()
+    if db is None:
+        return 1
+    if "--audit" not in argv:
+        return 0
+
+    collection_scans = 0
+    for name, collection, stages, problems in audit_indexes(db):
+        status = "; ".join(problems) if problems else "ok"
+        print(f"{collection:<15} {name:<28} {status:<32} {' <- '.join(s for s in stages if s)}")
+        if "collection scan" in problems:
+            collection_scans += 1
+    return 1 if collection_scans else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
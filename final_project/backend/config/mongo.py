@@ -0,0 +1,178 @@
+"""
+Shared MongoDB client factory.
+
+Every process builds at most one PyMongo client and one Motor client, both
+with the pool, timeout, compression and read preference settings below.
+Creation is guarded by a lock, so concurrent first requests share a
+single client instead of each opening their own pool.
+
+Connection pool events are counted in the metrics registry (served at
+/metrics), which shows whether requests wait for connections and how
+large the pool actually gets under load:
+
+    mongo_pool_connections          open connections per server
+    mongo_pool_checked_out          connections currently in use
+    mongo_pool_waiting              operations waiting for a connection
+    mongo_pool_checkout_wait_seconds_total / mongo_pool_checkouts_total
+                                    average time spent waiting
+"""
+
+import os
+import threading
+import time
+from pymongo import MongoClient, monitoring
+from dotenv import load_dotenv
+
+from utils.metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000))
+# 0 means no timeout; long aggregations and GridFS reads can take a while
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 0))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 0))
+# Comma-separated; snappy and zstd need the python-snappy and zstandard packages
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zlib")
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+MONGO_APP_NAME = os.getenv("MONGO_APP_NAME", "video-seo")
+
+pool_connections = registry.gauge("mongo_pool_connections", "Open connections in the MongoDB pool")
+pool_checked_out = registry.gauge("mongo_pool_checked_out", "MongoDB connections currently checked out")
+pool_waiting = registry.gauge("mongo_pool_waiting", "Operations waiting to check out a MongoDB connection")
+pool_max_size = registry.gauge("mongo_pool_max_size", "Maximum connections per MongoDB server")
+pool_checkouts_total = registry.counter("mongo_pool_checkouts_total", "MongoDB connections checked out")
+pool_checkout_failures_total = registry.counter("mongo_pool_checkout_failures_total", "Failed MongoDB connection checkouts")
+pool_checkout_wait_seconds_total = registry.counter(
+    "mongo_pool_checkout_wait_seconds_total", "Time spent waiting to check out MongoDB connections"
+)
+pool_connections_created_total = registry.counter("mongo_pool_connections_created_total", "MongoDB connections opened")
+pool_cleared_total = registry.counter("mongo_pool_cleared_total", "Times a MongoDB pool was cleared after an error")
+
+
+def _address(address):
+    host, port = address
+    return f"{host}:{port}"
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Keeps the mongo_pool_* metrics up to date for one client"""
+
+    def __init__(self, client_name):
+        self.client_name = client_name
+        self._lock = threading.Lock()
+        self._counts = {}
+        # Checkout start and end events fire on the same thread
+        self._local = threading.local()
+
+    def _add(self, gauge, address, amount):
+        key = (gauge.name, address)
+        with self._lock:
+            value = self._counts[key] = self._counts.get(key, 0) + amount
+        gauge.set(value, client=self.client_name, address=_address(address))
+
+    def _checkout_finished(self, event):
+        self._add(pool_waiting, event.address, -1)
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            self._local.started = None
+            pool_checkout_wait_seconds_total.inc(
+                time.monotonic() - started, client=self.client_name, address=_address(event.address)
+            )
+
+    def pool_created(self, event):
+        pool_max_size.set(
+            event.options.get("maxPoolSize", MONGO_MAX_POOL_SIZE),
+            client=self.client_name, address=_address(event.address)
+        )
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pool_cleared_total.inc(client=self.client_name, address=_address(event.address))
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(pool_connections, event.address, 1)
+        pool_connections_created_total.inc(client=self.client_name, address=_address(event.address))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(pool_connections, event.address, -1)
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.monotonic()
+        self._add(pool_waiting, event.address, 1)
+
+    def connection_check_out_failed(self, event):
+        self._checkout_finished(event)
+        pool_checkout_failures_total.inc(
+            client=self.client_name, address=_address(event.address), reason=event.reason
+        )
+
+    def connection_checked_out(self, event):
+        self._checkout_finished(event)
+        self._add(pool_checked_out, event.address, 1)
+        pool_checkouts_total.inc(client=self.client_name, address=_address(event.address))
+
+    def connection_checked_in(self, event):
+        self._add(pool_checked_out, event.address, -1)
+
+
+def client_options(client_name):
+    """Keyword arguments shared by the PyMongo and Motor clients"""
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "readPreference": MONGO_READ_PREFERENCE,
+        "appname": MONGO_APP_NAME,
+        "event_listeners": [PoolMetricsListener(client_name)]
+    }
+    if MONGO_SOCKET_TIMEOUT_MS:
+        options["socketTimeoutMS"] = MONGO_SOCKET_TIMEOUT_MS
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+
+
+def get_client():
+    """The process-wide PyMongo client"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = MongoClient(MONGO_URI, **client_options("sync"))
+    return _client
+
+
+def get_async_client():
+    """The process-wide Motor client, for code running on the event loop"""
+    global _async_client
+    if _async_client is None:
+        # Imported here so processes that never touch the event loop do not need Motor
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        with _lock:
+            if _async_client is None:
+                _async_client = AsyncIOMotorClient(MONGO_URI, **client_options("async"))
+    return _async_client
@@ -0,0 +1,22 @@
+"""
+Retention settings for collections that grow with traffic.
+
+Read by config/indexes.py for the TTL indexes and by
+tasks/retention_task.py for compaction and archival.
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Ranking rows older than this are folded into per-keyword daily aggregates
+RANKINGS_COMPACT_AFTER_DAYS = int(os.getenv("RANKINGS_COMPACT_AFTER_DAYS", 7))
+# Compacted ranking rows are deleted by a TTL index this long after compaction
+RANKINGS_COMPACTED_TTL_HOURS = int(os.getenv("RANKINGS_COMPACTED_TTL_HOURS", 24))
+# Notifications are deleted by a TTL index this long after they were created
+NOTIFICATIONS_RETENTION_DAYS = int(os.getenv("NOTIFICATIONS_RETENTION_DAYS", 180))
+# Export rows to the storage backend before they are deleted
+RETENTION_ARCHIVE = os.getenv("RETENTION_ARCHIVE", "true").lower() == "true"
+RETENTION_INTERVAL_HOURS = int(os.getenv("RETENTION_INTERVAL_HOURS", 24))
@@ -24,10 +24,18 @@ class VideoModel(BaseModel):
     title: str = Field(...)
     filename: str = Field(...)
     file_path: str = Field(...)
+    storage_key: Optional[str] = None
+    blob_sha256: Optional[str] = None
     duration: Optional[float] = None
     file_size: Optional[int] = None
+    bit_rate: Optional[int] = None
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    has_audio: Optional[bool] = None
     processed: bool = False
-    extracted_text: Optional[str] = None
+    # The text itself lives in the transcript store (services/transcript_store.py)
+    has_text: bool = False
+    text_length: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
     
@@ -43,8 +51,12 @@ class VideoModel(BaseModel):
                 "file_path": "/uploads/video.mp4",
                 "duration": 120.5,
                 "file_size": 1024000,
+                "bit_rate": 2500000,
+                "video_codec": "h264",
+                "audio_codec": "aac",
+                "has_audio": True,
                 "processed": False,
-                "extracted_text": None
+                "has_text": False
             }
         }
 
@@ -98,6 +110,8 @@ class VideoUploadResponse(BaseModel):
     id: str
     title: str
     filename: str
+    duration: Optional[float] = None
+    has_audio: Optional[bool] = None
     message: str = "Video uploaded successfully"
     
     class Config:
@@ -106,6 +120,36 @@ class VideoUploadResponse(BaseModel):
                 "id": "60d5ec9af3c8e28b5c786a12",
                 "title": "My Video",
                 "filename": "video.mp4",
+                "duration": 120.5,
+                "has_audio": True,
                 "message": "Video uploaded successfully"
             }
         }
+
+class ResumableUploadCreate(BaseModel):
+    filename: str
+    title: str
+    size: int
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "filename": "video.mp4",
+                "title": "My Video",
+                "size": 2147483648
+            }
+        }
+
+class HashedUploadCreate(BaseModel):
+    sha256: str
+    filename: str
+    title: str
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "sha256": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+                "filename": "video.mp4",
+                "title": "My Video"
+            }
+        }
@@ -0,0 +1,257 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from services.storage import get_storage, StorageError, UPLOAD_DIR
+from utils.media_probe import probe_media
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Partial files are staged on local disk before they are moved into storage
+PARTIAL_DIR = os.path.join(UPLOAD_DIR, "partial")
+
+HASH_BLOCK_SIZE = 1024 * 1024  # 1MB
+# A blob being written or deleted by another process is polled this often
+BLOB_WAIT_INTERVAL = 0.2  # seconds
+# A write or delete that has not finished after this long is taken as abandoned
+BLOB_CLAIM_TIMEOUT = int(os.getenv("BLOB_CLAIM_TIMEOUT", 600))  # seconds
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_valid_sha256(value):
+    """Check that a value is a lowercase hex SHA-256 digest"""
+    return bool(value) and bool(SHA256_RE.match(value))
+
+
+def hash_file(path):
+    """Compute the SHA-256 digest of a file without loading it into memory"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed storage for uploaded media.
+
+    Files are stored once under their SHA-256 digest in a sharded key
+    layout (blobs/ab/cd/abcd...) on the configured storage backend, and the
+    `blobs` collection keeps a reference count per digest so identical
+    uploads share a single file.
+
+    A blob document is inserted before its file is written, marked with
+    writing_since, and is marked with deleting_since before its file is
+    deleted. Neither kind can be acquired; uploads of the same digest wait
+    until the write finishes or the delete has removed the document, so a
+    file is never deleted under a live reference.
+
+    Each blob lists the IDs of the users who uploaded it in `owners`. Only
+    they can reuse it by digest, so knowing a file's hash does not give
+    access to another user's upload.
+    """
+
+    def __init__(self, db, storage=None):
+        self.db = db
+        self.storage = storage or get_storage()
+        os.makedirs(PARTIAL_DIR, exist_ok=True)
+
+    @staticmethod
+    def blob_key(sha256):
+        """Get the storage key for a digest"""
+        return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    def probe(self, blob):
+        """
+        Get the media probe of a blob, running ffprobe once per blob
+
+        Returns:
+            dict: Probe results, or None if the file could not be probed
+        """
+        if blob.get("probe"):
+            return blob["probe"]
+
+        probe = probe_media(self.storage.media_source(blob["key"]))
+        if probe:
+            self.db.blobs.update_one({"_id": blob["_id"]}, {"$set": {"probe": probe}})
+            blob["probe"] = probe
+        return probe
+
+    def video_fields(self, blob):
+        """Get the storage and media fields a video document copies from its blob"""
+        probe = self.probe(blob) or {}
+        return {
+            "file_path": blob["path"],
+            "storage_key": blob["key"],
+            "blob_sha256": blob["_id"],
+            "file_size": blob["size"],
+            "duration": probe.get("duration"),
+            "bit_rate": probe.get("bit_rate"),
+            "video_codec": probe.get("video_codec"),
+            "audio_codec": probe.get("audio_codec"),
+            "has_audio": probe.get("has_audio"),
+            "probed": bool(probe)
+        }
+
+    def acquire(self, sha256, owner):
+        """
+        Add a reference to an existing blob that owner has uploaded before
+
+        Returns:
+            dict: The blob document, or None if the blob is not stored or
+            belongs only to other users
+        """
+        return self._acquire(sha256, {"owners": owner})
+
+    def _acquire(self, sha256, match=None, owner=None):
+        """Add a reference to a stored blob, recording owner as one of its uploaders"""
+        if not is_valid_sha256(sha256):
+            return None
+        update = {"$inc": {"ref_count": 1}, "$set": {"updated_at": datetime.now()}}
+        if owner is not None:
+            update["$addToSet"] = {"owners": owner}
+        return self.db.blobs.find_one_and_update(
+            {
+                "_id": sha256,
+                "ref_count": {"$gt": 0},
+                "writing_since": {"$exists": False},
+                "deleting_since": {"$exists": False},
+                **(match or {})
+            },
+            update,
+            return_document=ReturnDocument.AFTER
+        )
+
+    def store_stream(self, fileobj, owner):
+        """
+        Copy a file object uploaded by owner into the store, hashing it on the way
+
+        Returns:
+            dict: The blob document with a reference held for the caller
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=PARTIAL_DIR, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for block in iter(lambda: fileobj.read(HASH_BLOCK_SIZE), b""):
+                    digest.update(block)
+                    out.write(block)
+                    size += len(block)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+        try:
+            return self.commit_file(temp_path, digest.hexdigest(), size, owner)
+        except StorageError:
+            os.remove(temp_path)
+            raise
+
+    def _claim(self, sha256, size, owner):
+        """
+        Take the right to write a blob's file
+
+        Inserts the blob document, or takes over a write or delete that
+        was abandoned by a process that died. Returns False while another
+        writer or a release holds the digest.
+        """
+        key = self.blob_key(sha256)
+        now = datetime.now()
+        try:
+            self.db.blobs.insert_one({
+                "_id": sha256,
+                "key": key,
+                "backend": self.storage.name,
+                "path": self.storage.uri(key),
+                "size": size,
+                "ref_count": 1,
+                "owners": [owner],
+                "writing_since": now,
+                "created_at": now,
+                "updated_at": now
+            })
+            return True
+        except DuplicateKeyError:
+            pass
+
+        stale = now - timedelta(seconds=BLOB_CLAIM_TIMEOUT)
+        # The dead writer's reference is handed to this caller
+        if self.db.blobs.find_one_and_update(
+            {"_id": sha256, "writing_since": {"$lt": stale}},
+            {"$set": {"writing_since": now, "updated_at": now}, "$addToSet": {"owners": owner}}
+        ):
+            return True
+        # The file of a dead release is in an unknown state; it is written again
+        self.db.blobs.delete_one({"_id": sha256, "deleting_since": {"$lt": stale}})
+        return False
+
+    def commit_file(self, temp_path, sha256, size, owner):
+        """
+        Move a fully written file uploaded by owner into the store under its digest.
+
+        If the blob already exists the file is discarded, the reference
+        count is increased and owner is added to the blob's owners. While another upload is writing the
+        same digest, or a release is deleting it, this waits for that to
+        finish, and raises StorageError if it does not within
+        BLOB_CLAIM_TIMEOUT. The file at temp_path is then left in place.
+
+        Returns:
+            dict: The blob document with a reference held for the caller
+        """
+        deadline = time.monotonic() + BLOB_CLAIM_TIMEOUT
+        while True:
+            blob = self._acquire(sha256, owner=owner)
+            if blob:
+                os.remove(temp_path)
+                logger.info(f"Deduplicated upload against existing blob {sha256}")
+                return blob
+
+            if self._claim(sha256, size, owner):
+                break
+            if time.monotonic() > deadline:
+                raise StorageError(f"Blob {sha256} is still being written or deleted")
+            time.sleep(BLOB_WAIT_INTERVAL)
+
+        try:
+            self.storage.put_file(self.blob_key(sha256), temp_path)
+        except Exception:
+            self.db.blobs.delete_one({"_id": sha256, "writing_since": {"$exists": True}})
+            raise
+
+        logger.info(f"Stored new blob {sha256} ({size} bytes)")
+        return self.db.blobs.find_one_and_update(
+            {"_id": sha256},
+            {"$unset": {"writing_since": ""}, "$set": {"updated_at": datetime.now()}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def release(self, sha256):
+        """Drop a reference to a blob and delete the file when none remain"""
+        blob = self.db.blobs.find_one_and_update(
+            {"_id": sha256, "ref_count": {"$gt": 0}},
+            {"$inc": {"ref_count": -1}, "$set": {"updated_at": datetime.now()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not blob or blob["ref_count"] > 0:
+            return
+
+        # Marked first, so an upload of the same digest waits for the
+        # document to go instead of reusing a file about to be deleted
+        deleting = self.db.blobs.find_one_and_update(
+            {"_id": sha256, "ref_count": {"$lte": 0}, "deleting_since": {"$exists": False}},
+            {"$set": {"deleting_since": datetime.now()}}
+        )
+        if deleting:
+            self.storage.delete(deleting["key"])
+            self.db.blobs.delete_one({"_id": sha256, "deleting_since": {"$exists": True}})
+            logger.info(f"Deleted unreferenced blob {sha256}")
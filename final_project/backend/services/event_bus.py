@@ -0,0 +1,174 @@
+"""
+In-process publish/subscribe for pipeline progress events.
+
+Job workers run on threads and publish from there; subscribers are
+Server-Sent Events streams running on the asyncio event loop. Each
+subscription owns a bounded asyncio queue, and events are handed to it
+with call_soon_threadsafe so publishers never block on slow clients.
+
+Events from other processes, such as standalone workers, arrive through
+MongoEventLog.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTION_QUEUE_SIZE = 100
+# The relay retries after an error, doubling the wait up to the maximum
+RELAY_RETRY_INITIAL = 1  # seconds
+RELAY_RETRY_MAX = 30  # seconds
+
+
+def job_topic(job_id):
+    return f"job:{job_id}"
+
+
+def user_topic(user_id):
+    return f"user:{user_id}"
+
+
+class Subscription:
+    """A subscriber's queue of events for one or more topics"""
+
+    def __init__(self, bus, topics):
+        self.bus = bus
+        self.topics = topics
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def _deliver(self, event):
+        # Drop the oldest event rather than block when a client falls behind;
+        # every event carries the full job state, so the newest one wins
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """Wait for the next event, or return None after the timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """Thread-safe topic-based event bus"""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, *topics):
+        """Subscribe the current event loop to topics"""
+        subscription = Subscription(self, topics)
+        with self._lock:
+            for topic in topics:
+                self._subscriptions[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscriptions.get(topic)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[topic]
+
+    def publish(self, event, *topics):
+        """Publish an event to every subscriber of the given topics, from any thread"""
+        with self._lock:
+            subscribers = set()
+            for topic in topics:
+                subscribers.update(self._subscriptions.get(topic, ()))
+
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+            except RuntimeError:
+                # The subscriber's event loop has shut down
+                self.unsubscribe(subscription)
+
+
+event_bus = EventBus()
+
+
+class MongoEventLog:
+    """
+    Carries events between processes through a capped collection.
+
+    Standalone workers publish job events here instead of to their own
+    in-process bus. The API process tails the collection and republishes
+    each event on its bus, where the Server-Sent Events streams see it.
+    The relay keeps retrying with backoff while Mongo is unreachable, so
+    a node that starts before its database still gets job events.
+    """
+
+    COLLECTION = "job_events"
+    SIZE_BYTES = 16 * 1024 * 1024
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db[self.COLLECTION]
+
+    def ensure_collection(self):
+        if self.COLLECTION not in self.db.list_collection_names():
+            try:
+                self.db.create_collection(self.COLLECTION, capped=True, size=self.SIZE_BYTES)
+            except CollectionInvalid:
+                # Another process created it first
+                pass
+
+    def publish(self, event, *topics):
+        self.collection.insert_one({"event": event, "topics": list(topics)})
+
+    def relay(self, bus, stopping):
+        """Republish new events on bus until stopping is set"""
+        started = False
+        last_id = None
+        delay = RELAY_RETRY_INITIAL
+        while not stopping.is_set():
+            try:
+                if not started:
+                    # Only events published after the relay starts are forwarded
+                    self.ensure_collection()
+                    latest = self.collection.find_one(sort=[("$natural", -1)])
+                    last_id = latest["_id"] if latest else None
+                    started = True
+
+                query = {"_id": {"$gt": last_id}} if last_id else {}
+                cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT, max_await_time_ms=1000)
+                try:
+                    while cursor.alive and not stopping.is_set():
+                        for doc in cursor:
+                            last_id = doc["_id"]
+                            bus.publish(doc["event"], *doc["topics"])
+                finally:
+                    cursor.close()
+            except Exception as e:
+                logger.error(f"Error relaying job events, retrying in {delay}s: {e}")
+                stopping.wait(delay)
+                delay = min(delay * 2, RELAY_RETRY_MAX)
+                continue
+
+            delay = RELAY_RETRY_INITIAL
+            # A tailable cursor on an empty collection dies at once; don't spin
+            stopping.wait(1)
+
+    def start_relay(self, bus, stopping=None):
+        """Run relay() on a daemon thread"""
+        stopping = stopping or threading.Event()
+        thread = threading.Thread(target=self.relay, args=(bus, stopping), name="job-event-relay", daemon=True)
+        thread.start()
+        return stopping
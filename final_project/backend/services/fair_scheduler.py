@@ -0,0 +1,200 @@
+"""
+Weighted fair scheduling of jobs across users and priority classes.
+
+Jobs are queued per (priority class, user). Dispatch happens at two
+levels, each using virtual time as in weighted fair queuing:
+
+1. Priority classes. Each dispatch advances a class's virtual time by
+   1 / weight, so with the default weights interactive work gets 8 slots
+   for every bulk slot while both have a backlog. Bulk work is never
+   starved outright.
+2. Users within a class. Every user has equal weight. The user with the
+   lowest virtual time goes next, so one user's 50-video backfill is
+   interleaved with everyone else's jobs instead of running ahead of them.
+
+A queue that becomes active again starts at the current minimum virtual
+time of its peers. Idle time therefore cannot be banked as credit.
+Users already running JOB_USER_CONCURRENCY jobs in this process are
+skipped until one of their jobs finishes. The cap across processes is
+enforced when a job is claimed (services/job_queue.py).
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Priority class -> share of dispatches while several classes have a backlog
+PRIORITY_WEIGHTS = {
+    INTERACTIVE: float(os.getenv("JOB_INTERACTIVE_WEIGHT", 8)),
+    BULK: float(os.getenv("JOB_BULK_WEIGHT", 1))
+}
+PRIORITY_CLASSES = list(PRIORITY_WEIGHTS)
+
+JOB_USER_CONCURRENCY = int(os.getenv("JOB_USER_CONCURRENCY", 1))
+
+# Recent queue waits kept per class for the percentiles in stats()
+WAIT_SAMPLES = 500
+
+
+class ScheduledJob:
+    """A queued job id with what the scheduler needs to place it"""
+
+    def __init__(self, job_id, user_id, priority):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.wait_seconds = None
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+def wait_percentiles(waits):
+    """p50, p95, p99 and max of queue waits in seconds"""
+    return {
+        "p50": _percentile(waits, 0.5),
+        "p95": _percentile(waits, 0.95),
+        "p99": _percentile(waits, 0.99),
+        "max": round(max(waits), 3) if waits else None
+    }
+
+
+class _ClassQueue:
+    """The per-user queues of one priority class"""
+
+    def __init__(self, weight):
+        self.weight = weight
+        self.vtime = 0.0
+        self.users = {}  # user_id -> deque of ScheduledJob
+        self.user_vtime = {}
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.dispatched = 0
+
+    def __len__(self):
+        return sum(len(jobs) for jobs in self.users.values())
+
+    def push(self, entry):
+        jobs = self.users.get(entry.user_id)
+        if jobs is None:
+            # Re-entering users start level with the active ones
+            active = [self.user_vtime[user] for user in self.users]
+            floor = min(active) if active else 0.0
+            self.user_vtime[entry.user_id] = floor
+            jobs = self.users[entry.user_id] = deque()
+        jobs.append(entry)
+
+    def next_user(self, is_eligible):
+        candidates = [user for user in self.users if is_eligible(user)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda user: self.user_vtime[user])
+
+    def pop(self, user_id):
+        jobs = self.users[user_id]
+        entry = jobs.popleft()
+        self.user_vtime[user_id] += 1.0
+        if not jobs:
+            del self.users[user_id]
+            del self.user_vtime[user_id]
+        self.vtime += 1.0 / self.weight
+        self.dispatched += 1
+        return entry
+
+
+class FairScheduler:
+    """Thread-safe weighted fair queue of job ids"""
+
+    def __init__(self, weights=None, user_concurrency=JOB_USER_CONCURRENCY):
+        self.classes = {name: _ClassQueue(weight) for name, weight in (weights or PRIORITY_WEIGHTS).items()}
+        self.user_concurrency = user_concurrency
+        self.running = {}  # user_id -> jobs currently dispatched
+        self.condition = threading.Condition()
+
+    def put(self, job_id, user_id, priority=INTERACTIVE):
+        if priority not in self.classes:
+            raise ValueError(f"Unknown priority class: {priority}")
+        entry = ScheduledJob(job_id, user_id, priority)
+        with self.condition:
+            queue = self.classes[priority]
+            if not len(queue):
+                # An idle class re-enters level with the busy ones
+                busy = [other.vtime for other in self.classes.values() if len(other)]
+                queue.vtime = max(queue.vtime, min(busy)) if busy else queue.vtime
+            queue.push(entry)
+            self.condition.notify()
+        return entry
+
+    def _eligible(self, user_id):
+        return self.running.get(user_id, 0) < self.user_concurrency
+
+    def _pick(self):
+        choice = None
+        for queue in self.classes.values():
+            user_id = queue.next_user(self._eligible)
+            if user_id is None:
+                continue
+            if choice is None or queue.vtime < choice[0].vtime:
+                choice = (queue, user_id)
+        if choice is None:
+            return None
+
+        queue, user_id = choice
+        entry = queue.pop(user_id)
+        entry.wait_seconds = time.monotonic() - entry.enqueued_at
+        queue.waits.append(entry.wait_seconds)
+        self.running[user_id] = self.running.get(user_id, 0) + 1
+        return entry
+
+    def get(self, timeout=None):
+        """
+        Wait for the next job to dispatch
+
+        Returns:
+            ScheduledJob: The job, or None after the timeout. Call done()
+            with it when the job finishes.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                entry = self._pick()
+                if entry:
+                    return entry
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def done(self, entry):
+        """Release the user's concurrency slot held by a dispatched job"""
+        with self.condition:
+            count = self.running.get(entry.user_id, 0) - 1
+            if count > 0:
+                self.running[entry.user_id] = count
+            else:
+                self.running.pop(entry.user_id, None)
+            # A job of this user may have become eligible
+            self.condition.notify_all()
+
+    def stats(self):
+        """Queue depth, dispatch count and recent queue wait per priority class"""
+        with self.condition:
+            return {
+                name: {
+                    "weight": queue.weight,
+                    "queued": len(queue),
+                    "queued_users": len(queue.users),
+                    "dispatched": queue.dispatched,
+                    "wait_seconds": wait_percentiles(queue.waits)
+                }
+                for name, queue in self.classes.items()
+            }
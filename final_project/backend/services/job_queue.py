@@ -0,0 +1,518 @@
+"""
+Background job queue for long-running processing.
+
+Jobs are stored in the `jobs` collection and claimed with leases, so any
+number of processes can run workers against the same database: the API
+process itself (JOB_WORKERS threads) and standalone `python -m worker`
+nodes. Submitting a job returns immediately; clients read GET /jobs/{id}
+for state, stage, progress and timings, or follow GET /jobs/{id}/events
+for live updates.
+
+Each node polls for queued jobs and hands them to a per-user weighted
+fair scheduler (services/fair_scheduler.py). A worker thread claims a job
+with an atomic find_one_and_update that sets a lease token and expiry,
+then heartbeats the lease while the handler runs. A claim that would
+give a user more than JOB_USER_CONCURRENCY running jobs across all
+nodes is undone, and the job is offered again on a later poll. If a node dies, its
+lease expires and the job is queued again for another attempt. A node
+that has lost its lease can no longer write progress or results.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config.db import get_db
+from services.event_bus import event_bus, job_topic, user_topic
+from services.fair_scheduler import (
+    FairScheduler, INTERACTIVE, PRIORITY_CLASSES, PRIORITY_WEIGHTS, JOB_USER_CONCURRENCY, WAIT_SAMPLES, wait_percentiles
+)
+from services.pipeline_dag import digest
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Worker threads in the API process; set to 0 when standalone workers run the jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 60))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 2))
+# Queued jobs offered to the local scheduler per priority class and poll
+JOB_POLL_BATCH = 100
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+ACTIVE_STATES = [QUEUED, RUNNING]
+
+# Job type -> handler(db, job, context) returning a JSON-serializable result
+_handlers = {}
+
+# Where job events go; standalone workers replace this with the Mongo event log
+_event_publisher = event_bus.publish
+
+
+class LeaseLost(Exception):
+    """Raised in a handler whose job lease expired and was taken over"""
+
+
+def set_event_publisher(publisher):
+    """Send job events through publisher(event, *topics) instead of the in-process bus"""
+    global _event_publisher
+    _event_publisher = publisher
+
+
+def publish_job_event(job, event, **fields):
+    """Publish a job event to the job's and its owner's event streams"""
+    payload = {
+        "event": event,
+        "job_id": str(job["_id"]),
+        "type": job["type"],
+        "video_id": job.get("video_id"),
+        **fields
+    }
+    _event_publisher(payload, job_topic(job["_id"]), user_topic(job["user_id"]))
+
+
+def job_handler(job_type, stages=None):
+    """
+    Register a function as the handler for a job type
+
+    Args:
+        job_type (str): Name used when submitting the job
+        stages (list): (stage, weight) pairs used to compute overall progress
+    """
+    def decorator(fn):
+        fn.stages = stages or [(job_type, 1.0)]
+        _handlers[job_type] = fn
+        return fn
+    return decorator
+
+
+class JobContext:
+    """
+    Lets a running handler report its stage and progress.
+
+    Stages are given as (name, weight) pairs; progress within a stage is
+    scaled by its weight into the overall job progress. Updates are
+    conditional on the job's lease, so a handler whose lease was taken
+    over gets LeaseLost at its next report.
+    """
+
+    def __init__(self, db, job, stages):
+        self.db = db
+        self.job = job
+        self.job_id = job["_id"]
+        self.lease = {"_id": job["_id"], "lease_token": job.get("lease_token")}
+        self.stages = stages
+        self.stage = None
+        self.stage_started = None
+        self.completed_weight = 0.0
+        self.lease_lost = False
+
+    def _weight(self, stage):
+        return dict(self.stages).get(stage, 0.0)
+
+    def _update(self, fields):
+        if not self.lease_lost:
+            result = self.db.jobs.update_one(self.lease, {"$set": fields})
+            self.lease_lost = result.matched_count == 0
+        if self.lease_lost:
+            raise LeaseLost(f"Lease on job {self.job_id} was lost")
+
+    def start_stage(self, stage):
+        """Mark the previous stage finished and start a new one"""
+        now = datetime.now()
+        update = {"stage": stage, "stage_progress": 0.0, "updated_at": now}
+        if self.stage:
+            self.completed_weight += self._weight(self.stage)
+            update[f"timings.{self.stage}"] = round(time.monotonic() - self.stage_started, 3)
+            update["progress"] = round(self.completed_weight, 4)
+        self.stage = stage
+        self.stage_started = time.monotonic()
+        self._update(update)
+        publish_job_event(
+            self.job, "stage",
+            state=RUNNING,
+            stage=stage,
+            progress=round(self.completed_weight, 4),
+            stage_progress=0.0
+        )
+
+    def set_progress(self, fraction, **detail):
+        """
+        Report progress within the current stage, from 0 to 1
+
+        Extra keyword arguments, such as the ASR chunk number, are passed
+        through to the event stream.
+        """
+        fraction = max(0.0, min(1.0, fraction))
+        progress = self.completed_weight + self._weight(self.stage) * fraction
+        self._update({
+            "stage_progress": round(fraction, 4),
+            "progress": round(progress, 4),
+            "updated_at": datetime.now()
+        })
+        publish_job_event(
+            self.job, "progress",
+            state=RUNNING,
+            stage=self.stage,
+            progress=round(progress, 4),
+            stage_progress=round(fraction, 4),
+            **detail
+        )
+
+    def finish(self):
+        """Record the timing of the last stage"""
+        if self.stage:
+            return {f"timings.{self.stage}": round(time.monotonic() - self.stage_started, 3)}
+        return {}
+
+
+class JobQueue:
+    """
+    Claims and runs jobs from the `jobs` collection on worker threads
+
+    Args:
+        num_workers (int): Worker threads; 0 only submits jobs
+        worker_id (str): Name recorded on claimed jobs, host:pid by default
+    """
+
+    def __init__(self, num_workers=JOB_WORKERS, worker_id=None):
+        self.num_workers = num_workers
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.scheduler = FairScheduler()
+        # Jobs handed to the local scheduler and not yet finished
+        self.known = set()
+        self.known_lock = threading.Lock()
+        self.threads = []
+        self.stopping = threading.Event()
+
+    def submit(self, job_type, user_id, video_id=None, params=None, priority=INTERACTIVE):
+        """
+        Store a new job and hand it to the workers
+
+        If an identical job (same type, user, video and parameters) is
+        already queued or running, that job is returned instead, so the
+        caller follows the computation already in flight. The unique
+        active_key index (config/indexes.py) makes this atomic.
+
+        Args:
+            priority (str): "interactive" for work a user is waiting on,
+                "bulk" for backfills that may wait behind it
+
+        Returns:
+            dict: The job document
+        """
+        if job_type not in _handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        db = get_db()
+        job = {
+            "active_key": digest([job_type, user_id, video_id, params or {}]),
+            "type": job_type,
+            "user_id": user_id,
+            "video_id": video_id,
+            "params": params or {},
+            "priority": priority,
+            "state": QUEUED,
+            "stage": None,
+            "progress": 0.0,
+            "attempts": 0,
+            "timings": {},
+            "created_at": datetime.now(),
+            "updated_at": datetime.now()
+        }
+        try:
+            result = db.jobs.insert_one(job)
+        except DuplicateKeyError:
+            existing = db.jobs.find_one({"active_key": job["active_key"]})
+            if existing:
+                logger.info(f"Joined in-flight {job_type} job {existing['_id']} for user {user_id}")
+                return existing
+            # The identical job finished in between; submit a fresh one
+            job.pop("_id", None)
+            result = db.jobs.insert_one(job)
+        job["_id"] = result.inserted_id
+        # Local workers start on it right away; other nodes find it when they poll
+        if self.threads:
+            self._offer(job)
+        publish_job_event(job, "state", state=QUEUED, stage=None, progress=0.0)
+        logger.info(f"Queued {priority} {job_type} job {job['_id']} for user {user_id}")
+        return job
+
+    def _offer(self, job):
+        with self.known_lock:
+            if job["_id"] in self.known:
+                return
+            self.known.add(job["_id"])
+        self.scheduler.put(job["_id"], job["user_id"], job.get("priority", INTERACTIVE))
+
+    def _forget(self, job_id):
+        with self.known_lock:
+            self.known.discard(job_id)
+
+    def requeue_expired(self, db):
+        """Queue jobs again whose lease expired, or fail them after JOB_MAX_ATTEMPTS"""
+        now = datetime.now()
+        expired = db.jobs.find(
+            {"state": RUNNING, "lease_expires_at": {"$lt": now}},
+            {"type": 1, "user_id": 1, "video_id": 1, "attempts": 1, "lease_token": 1, "worker_id": 1}
+        )
+        for job in expired:
+            lease = {"_id": job["_id"], "state": RUNNING, "lease_token": job.get("lease_token")}
+            if job.get("attempts", 0) >= JOB_MAX_ATTEMPTS:
+                error = f"Lease expired on attempt {job.get('attempts')} (worker {job.get('worker_id')})"
+                result = db.jobs.update_one(lease, {
+                    "$set": {"state": FAILED, "error": error, "finished_at": now, "updated_at": now},
+                    "$unset": {"lease_token": "", "lease_expires_at": "", "active_key": ""}
+                })
+                if result.modified_count:
+                    logger.warning(f"Job {job['_id']} failed: {error}")
+                    publish_job_event(job, "state", state=FAILED, stage=None, error=error)
+            else:
+                result = db.jobs.update_one(lease, {
+                    "$set": {"state": QUEUED, "stage": None, "updated_at": now},
+                    "$unset": {"lease_token": "", "lease_expires_at": "", "worker_id": ""}
+                })
+                if result.modified_count:
+                    logger.warning(f"Lease on job {job['_id']} expired, queued for retry")
+                    publish_job_event(job, "state", state=QUEUED, stage=None, progress=0.0)
+
+    def poll(self):
+        """
+        Requeue expired leases and hand queued jobs to the local scheduler
+
+        Each priority class is polled separately, skipping jobs this
+        process already holds, so a large bulk backlog cannot fill the
+        batch and hide newer interactive jobs from the scheduler.
+        """
+        db = get_db()
+        self.requeue_expired(db)
+        with self.known_lock:
+            known = list(self.known)
+        for priority in PRIORITY_CLASSES:
+            jobs = db.jobs.find(
+                {"state": QUEUED, "priority": priority, "_id": {"$nin": known}},
+                {"_id": 1, "user_id": 1, "priority": 1}
+            ).sort("created_at", 1).limit(JOB_POLL_BATCH)
+            for job in jobs:
+                self._offer(job)
+
+    def _poller(self):
+        while not self.stopping.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error polling for jobs: {e}")
+            self.stopping.wait(JOB_POLL_SECONDS)
+
+    def start(self):
+        """Start the worker threads and the poller that feeds them"""
+        if self.num_workers <= 0:
+            logger.info("No job workers in this process; jobs run on standalone workers")
+            return
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        poller = threading.Thread(target=self._poller, name="job-poller", daemon=True)
+        poller.start()
+        self.threads.append(poller)
+        logger.info(f"Started {self.num_workers} job workers as {self.worker_id}")
+
+    def stop(self, timeout=5):
+        """Stop claiming jobs and wait for running ones to finish"""
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join(timeout=timeout)
+        self.threads = []
+
+    def _worker(self):
+        while not self.stopping.is_set():
+            entry = self.scheduler.get(timeout=1)
+            if entry is None:
+                continue
+            try:
+                self._run(entry.job_id, entry.user_id)
+            except Exception as e:
+                logger.error(f"Unexpected error running job {entry.job_id}: {e}")
+            finally:
+                self.scheduler.done(entry)
+                self._forget(entry.job_id)
+
+    def _claim(self, db, job_id, user_id):
+        """
+        Take a lease on a queued job
+
+        Returns None if another worker has the job, or if the user already
+        runs JOB_USER_CONCURRENCY jobs on any node.
+        """
+        if db.jobs.count_documents({"user_id": user_id, "state": RUNNING}) >= JOB_USER_CONCURRENCY:
+            return None
+        now = datetime.now()
+        job = db.jobs.find_one_and_update(
+            {"_id": job_id, "state": QUEUED},
+            {
+                "$set": {
+                    "state": RUNNING,
+                    "worker_id": self.worker_id,
+                    "lease_token": uuid.uuid4().hex,
+                    "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    "started_at": now,
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if not job:
+            return None
+
+        # Nodes claiming at the same time all passed the count; the earliest started keep their slots
+        allowed = db.jobs.find(
+            {"user_id": user_id, "state": RUNNING}, {"_id": 1}
+        ).sort([("started_at", 1), ("_id", 1)]).limit(JOB_USER_CONCURRENCY)
+        if job["_id"] not in {running["_id"] for running in allowed}:
+            db.jobs.update_one(
+                {"_id": job["_id"], "lease_token": job["lease_token"]},
+                {
+                    "$set": {"state": QUEUED, "updated_at": datetime.now()},
+                    "$unset": {"lease_token": "", "lease_expires_at": "", "worker_id": "", "started_at": ""},
+                    "$inc": {"attempts": -1}
+                }
+            )
+            return None
+        return job
+
+    def _heartbeat(self, db, context, done):
+        """Extend the lease until the job finishes or the lease is lost"""
+        while not done.wait(JOB_LEASE_SECONDS / 3):
+            result = db.jobs.update_one(
+                context.lease,
+                {"$set": {"lease_expires_at": datetime.now() + timedelta(seconds=JOB_LEASE_SECONDS)}}
+            )
+            if result.matched_count == 0:
+                logger.warning(f"Lost lease on job {context.job_id}")
+                context.lease_lost = True
+                return
+
+    def _complete(self, db, context, fields):
+        """Write the final state if the lease is still held"""
+        result = db.jobs.update_one(
+            context.lease,
+            {
+                "$set": {"finished_at": datetime.now(), "updated_at": datetime.now(), **fields, **context.finish()},
+                "$unset": {"lease_token": "", "lease_expires_at": "", "active_key": ""}
+            }
+        )
+        return result.matched_count > 0
+
+    def _run(self, job_id, user_id):
+        db = get_db()
+
+        job = self._claim(db, job_id, user_id)
+        if not job:
+            return
+
+        handler = _handlers.get(job["type"])
+        context = JobContext(db, job, handler.stages)
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(db, context, done), daemon=True)
+        heartbeat.start()
+
+        logger.info(f"Running {job['type']} job {job_id} (attempt {job['attempts']})")
+        publish_job_event(job, "state", state=RUNNING, stage=None, progress=0.0)
+        try:
+            result = handler(db, job, context)
+            done.set()
+            if self._complete(db, context, {"state": SUCCEEDED, "progress": 1.0, "result": result}):
+                logger.info(f"Job {job_id} succeeded")
+                publish_job_event(job, "state", state=SUCCEEDED, stage=context.stage, progress=1.0, result=result)
+            else:
+                logger.warning(f"Job {job_id} finished after its lease was lost; result discarded")
+        except LeaseLost:
+            done.set()
+            logger.warning(f"Job {job_id} stopped after its lease was lost")
+        except Exception as e:
+            done.set()
+            logger.error(f"Job {job_id} failed: {e}\n{traceback.format_exc()}")
+            if self._complete(db, context, {"state": FAILED, "error": str(e)}):
+                publish_job_event(job, "state", state=FAILED, stage=context.stage, error=str(e))
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Get the process-wide job queue"""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    return _job_queue
+
+
+def queue_stats(db):
+    """
+    Queue depth, running jobs and recent queue wait per priority class
+
+    Read from the jobs collection, so every node reports the whole queue,
+    including API nodes that run no workers.
+    """
+    stats = {}
+    for priority in PRIORITY_CLASSES:
+        started = db.jobs.find(
+            {"priority": priority, "started_at": {"$exists": True}},
+            {"created_at": 1, "started_at": 1}
+        ).sort("started_at", -1).limit(WAIT_SAMPLES)
+        waits = [(job["started_at"] - job["created_at"]).total_seconds() for job in started if job.get("created_at")]
+        stats[priority] = {
+            "weight": PRIORITY_WEIGHTS[priority],
+            "queued": db.jobs.count_documents({"state": QUEUED, "priority": priority}),
+            "queued_users": len(db.jobs.distinct("user_id", {"state": QUEUED, "priority": priority})),
+            "running": db.jobs.count_documents({"state": RUNNING, "priority": priority}),
+            "wait_seconds": wait_percentiles(waits)
+        }
+    return stats
+
+
+def serialize_job(job):
+    """Format a job document for API responses"""
+    created_at = job.get("created_at")
+    started_at = job.get("started_at")
+    finished_at = job.get("finished_at")
+    return {
+        "id": str(job["_id"]),
+        "type": job["type"],
+        "video_id": job.get("video_id"),
+        "params": job.get("params", {}),
+        "priority": job.get("priority", INTERACTIVE),
+        "state": job["state"],
+        "stage": job.get("stage"),
+        "progress": job.get("progress", 0.0),
+        "stage_progress": job.get("stage_progress"),
+        "attempts": job.get("attempts", 0),
+        "worker_id": job.get("worker_id"),
+        "timings": job.get("timings", {}),
+        "queue_seconds": round((started_at - created_at).total_seconds(), 3) if started_at and created_at else None,
+        "run_seconds": round((finished_at - started_at).total_seconds(), 3) if finished_at and started_at else None,
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "created_at": created_at,
+        "started_at": started_at,
+        "finished_at": finished_at
+    }
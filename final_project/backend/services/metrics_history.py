@@ -0,0 +1,129 @@
+"""
+Metric history for YouTube videos.
+
+Every poll of the YouTube monitor is appended to `video_metrics`, a
+time-series collection with one measurement per poll (views, likes,
+subscribers) and the video's youtube_id and user_id as metadata. Raw
+measurements expire after METRICS_RAW_RETENTION_DAYS. Subscribers are
+the channel's count; a poll whose channel statistics could not be
+fetched records no subscribers value rather than 0.
+
+Charts read from rollups instead of raw polls. `video_metrics_hourly`
+and `video_metrics_daily` hold one document per video and hour or day,
+updated as each poll is recorded, so a chart over months of history
+reads a bounded number of points:
+
+    python -m services.metrics_history --rebuild   # recompute rollups from raw polls
+"""
+
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METRICS_RAW_RETENTION_DAYS = int(os.getenv("METRICS_RAW_RETENTION_DAYS", 90))
+
+RAW_COLLECTION = "video_metrics"
+SERIES_FIELDS = ("views", "likes", "subscribers")
+
+# Resolution -> (rollup collection, default chart window)
+RESOLUTIONS = {
+    "hour": ("video_metrics_hourly", timedelta(days=7)),
+    "day": ("video_metrics_daily", timedelta(days=365))
+}
+
+
+def ensure_metrics_collection(db):
+    """Create the time-series collection for raw polls if it does not exist"""
+    if RAW_COLLECTION in db.list_collection_names():
+        return
+    db.create_collection(
+        RAW_COLLECTION,
+        timeseries={"timeField": "ts", "metaField": "meta", "granularity": "hours"},
+        expireAfterSeconds=METRICS_RAW_RETENTION_DAYS * 24 * 3600
+    )
+
+
+def bucket_start(ts, resolution):
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _rollup_update(values, user_id, ts):
+    # Counts only grow, so the latest value of a bucket is its maximum
+    return {
+        "$max": {**values, "last_ts": ts},
+        "$min": {f"first_{field}": value for field, value in values.items()},
+        "$inc": {"samples": 1},
+        "$setOnInsert": {"user_id": user_id}
+    }
+
+
+def record_poll(db, youtube_id, user_id, metrics, ts=None):
+    """Append one poll to the raw history and fold it into the hourly and daily rollups"""
+    ts = ts or datetime.utcnow()
+    values = {field: int(metrics[field]) for field in SERIES_FIELDS if metrics.get(field) is not None}
+
+    db[RAW_COLLECTION].insert_one({
+        "ts": ts,
+        "meta": {"youtube_id": youtube_id, "user_id": user_id},
+        **values
+    })
+    for resolution, (collection, _) in RESOLUTIONS.items():
+        db[collection].update_one(
+            {"youtube_id": youtube_id, "bucket": bucket_start(ts, resolution)},
+            _rollup_update(values, user_id, ts),
+            upsert=True
+        )
+
+
+def rebuild_rollups(db, since=None):
+    """Recompute the rollups from the raw polls still retained"""
+    match = {"ts": {"$gte": since}} if since else {}
+    for resolution, (collection, _) in RESOLUTIONS.items():
+        db[RAW_COLLECTION].aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "youtube_id": "$meta.youtube_id",
+                    "bucket": {"$dateTrunc": {"date": "$ts", "unit": resolution}}
+                },
+                "user_id": {"$first": "$meta.user_id"},
+                **{field: {"$max": f"${field}"} for field in SERIES_FIELDS},
+                **{f"first_{field}": {"$min": f"${field}"} for field in SERIES_FIELDS},
+                "last_ts": {"$max": "$ts"},
+                "samples": {"$sum": 1}
+            }},
+            {"$project": {
+                "_id": 0,
+                "youtube_id": "$_id.youtube_id",
+                "bucket": "$_id.bucket",
+                "user_id": 1,
+                **{field: 1 for field in SERIES_FIELDS},
+                **{f"first_{field}": 1 for field in SERIES_FIELDS},
+                "last_ts": 1,
+                "samples": 1
+            }},
+            {"$merge": {"into": collection, "on": ["youtube_id", "bucket"], "whenMatched": "replace"}}
+        ])
+
+
+def main(argv):
+    from config.db import initialize_db
+
+    db = initialize_db()
+    if db is None:
+        return 1
+    if "--rebuild" in argv:
+        rebuild_rollups(db)
+        logger.info("Rebuilt metric rollups from raw polls")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,184 @@
+"""
+Stage-cached pipeline execution.
+
+A pipeline is a DAG of stages. Every stage output is content-addressed:
+its cache key is a hash of the stage name and version, the parameters the
+stage uses, and the digests of its upstream outputs. Outputs are stored
+in the `artifacts` collection, so rerunning the pipeline with a changed
+parameter only recomputes the stages that depend on it.
+
+A stage with max_age is recomputed once its output is older than that,
+but under the same cache key, since the key does not include time.
+Callers that store results derived from an output must therefore tell
+generations apart by the output's created_at (PipelineRun.created_at),
+not by its key alone.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SOURCE = "source"
+
+
+def digest(value):
+    """Stable SHA-256 digest of a JSON-serializable value"""
+    encoded = json.dumps(value, sort_keys=True, default=str, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class Stage:
+    """
+    One step of a pipeline.
+
+    Args:
+        name (str): Stage name, also used as the job progress stage
+        compute (callable): compute(db, inputs, params, context) -> JSON-serializable value
+        depends_on (list): Names of upstream stages, or SOURCE for the pipeline input
+        params (list): Names of the pipeline parameters this stage uses
+        version (int): Bump to invalidate cached outputs when compute changes
+        max_age (int): Seconds a cached output stays valid, or None to keep it forever
+    """
+
+    def __init__(self, name, compute, depends_on=None, params=(), version=1, max_age=None):
+        self.name = name
+        self.compute = compute
+        self.depends_on = list(depends_on or [SOURCE])
+        self.params = tuple(params)
+        self.version = version
+        self.max_age = max_age
+
+
+class ArtifactCache:
+    """Stage outputs stored in the `artifacts` collection by cache key"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def get(self, key, max_age=None):
+        query = {"_id": key}
+        if max_age is not None:
+            query["created_at"] = {"$gte": datetime.utcnow() - timedelta(seconds=max_age)}
+        return self.db.artifacts.find_one(query)
+
+    def put(self, key, stage, value, input_digests, params):
+        """Store an output; returns its created_at"""
+        created_at = datetime.utcnow()
+        self.db.artifacts.replace_one(
+            {"_id": key},
+            {
+                "_id": key,
+                "stage": stage,
+                "value": value,
+                "digest": digest(value),
+                "inputs": input_digests,
+                "params": params,
+                "created_at": created_at
+            },
+            upsert=True
+        )
+        return created_at
+
+
+class PipelineRun:
+    """Outputs, cache keys, cache hits and output creation times of one pipeline execution"""
+
+    def __init__(self):
+        self.outputs = {}
+        self.digests = {}
+        self.keys = {}
+        self.cached = {}
+        self.created_at = {}
+
+
+class Pipeline:
+    """A DAG of stages executed in dependency order"""
+
+    def __init__(self, stages):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            for dependency in stage.depends_on:
+                if dependency != SOURCE and dependency not in self.stages:
+                    raise ValueError(f"Stage {stage.name} depends on unknown stage {dependency}")
+
+    def _plan(self, targets, seeded):
+        """Stages needed for the targets, upstream first, stopping at seeded outputs"""
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if name == SOURCE or name in seeded or name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a cycle at stage {name}")
+            visiting.add(name)
+            for dependency in self.stages[name].depends_on:
+                visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def run(self, db, source, source_digest, params, targets, seed=None, force=(), context=None):
+        """
+        Resolve the target stages, reusing cached outputs where possible.
+
+        Args:
+            db: Database instance
+            source: Input value passed to stages that depend on SOURCE
+            source_digest (str): Content digest identifying the source
+            params (dict): Pipeline parameters
+            targets (list): Stages whose outputs are needed
+            seed (dict): Known stage outputs to use instead of computing them
+            force (iterable): Stages to recompute even if cached
+            context: Optional job context for stage and progress reporting
+
+        Returns:
+            PipelineRun: Outputs, cache keys and cache hits per stage
+        """
+        cache = ArtifactCache(db)
+        run = PipelineRun()
+        run.outputs[SOURCE] = source
+        run.digests[SOURCE] = source_digest
+        for name, value in (seed or {}).items():
+            run.outputs[name] = value
+            run.digests[name] = digest(value)
+
+        for name in self._plan(targets, run.outputs):
+            stage = self.stages[name]
+            input_digests = {dependency: run.digests[dependency] for dependency in stage.depends_on}
+            stage_params = {param: params.get(param) for param in stage.params}
+            key = digest({
+                "stage": stage.name,
+                "version": stage.version,
+                "inputs": input_digests,
+                "params": stage_params
+            })
+
+            if context:
+                context.start_stage(name)
+
+            artifact = None if name in force else cache.get(key, stage.max_age)
+            if artifact:
+                value = artifact["value"]
+                created_at = artifact["created_at"]
+                logger.info(f"Reusing cached {name} output {key[:12]}")
+            else:
+                inputs = {dependency: run.outputs[dependency] for dependency in stage.depends_on}
+                value = stage.compute(db, inputs, stage_params, context)
+                created_at = cache.put(key, name, value, input_digests, stage_params)
+
+            run.outputs[name] = value
+            run.digests[name] = digest(value)
+            run.keys[name] = key
+            run.cached[name] = artifact is not None
+            run.created_at[name] = created_at
+
+        return run
@@ -0,0 +1,162 @@
+"""
+Ranking snapshots: one document per ranking lookup of a keyword set.
+
+A lookup used to store one `rankings` document per keyword, each
+repeating keyword_id, video_id, user_id and a timestamp. A snapshot
+stores the keyword set once, with parallel arrays, in a single insert
+(created_at is UTC):
+
+    {keyword_id, video_id, user_id, artifact_key, created_at,
+     keywords: [...], ranks: [...], search_volumes: [...], competitions: [...]}
+
+Readers that expect one row per keyword get them from `snapshot_rows`,
+or from the `ranking_rows` view, which unwinds the snapshots and also
+includes rows still stored in the old `rankings` collection. Those old
+rows are converted with:
+
+    python -m services.ranking_snapshots --migrate
+"""
+
+import logging
+import sys
+from datetime import timedelta
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLLECTION = "ranking_snapshots"
+VIEW = "ranking_rows"
+LEGACY_COLLECTION = "rankings"
+
+# Row field -> snapshot array
+ARRAY_FIELDS = {
+    "keyword": "keywords",
+    "rank": "ranks",
+    "search_volume": "search_volumes",
+    "competition": "competitions"
+}
+ROW_FIELDS = ("keyword_id", "video_id", "user_id", "artifact_key", "created_at")
+
+# Aggregation stages turning snapshots into one row per keyword
+ROWS_STAGES = [
+    {"$project": {
+        **{field: 1 for field in ROW_FIELDS},
+        "row": {"$zip": {"inputs": [f"${array}" for array in ARRAY_FIELDS.values()]}}
+    }},
+    {"$unwind": {"path": "$row", "includeArrayIndex": "position"}},
+    {"$project": {
+        "_id": {"$concat": [{"$toString": "$_id"}, "-", {"$toString": "$position"}]},
+        "snapshot_id": {"$toString": "$_id"},
+        **{field: 1 for field in ROW_FIELDS},
+        **{field: {"$arrayElemAt": ["$row", i]} for i, field in enumerate(ARRAY_FIELDS)}
+    }}
+]
+
+
+def snapshot_document(keyword_doc, user_id, rankings, artifact_key, created_at):
+    """A snapshot of ranking results ({keyword, rank, search_volume, competition} each)"""
+    return {
+        "keyword_id": str(keyword_doc["_id"]),
+        "video_id": keyword_doc["video_id"],
+        "user_id": user_id,
+        "artifact_key": artifact_key,
+        "created_at": created_at,
+        **{array: [ranking[field] for ranking in rankings] for field, array in ARRAY_FIELDS.items()}
+    }
+
+
+def snapshot_rows(snapshot):
+    """The per-keyword rows of a snapshot, in the shape of the old rankings documents"""
+    snapshot_id = str(snapshot["_id"]) if "_id" in snapshot else None
+    rows = []
+    for position, values in enumerate(zip(*(snapshot[array] for array in ARRAY_FIELDS.values()))):
+        row = {field: snapshot.get(field) for field in ROW_FIELDS}
+        row.update(zip(ARRAY_FIELDS, values))
+        if snapshot_id:
+            row["_id"] = f"{snapshot_id}-{position}"
+            row["snapshot_id"] = snapshot_id
+        rows.append(row)
+    return rows
+
+
+def latest_rows(db, keyword_id, session=None):
+    """Rows of the newest snapshot of a keyword set, or its old ranking rows newest first"""
+    snapshot = db[COLLECTION].find_one(
+        {"keyword_id": keyword_id}, sort=[("created_at", -1)], session=session
+    )
+    if snapshot:
+        return snapshot_rows(snapshot)
+    return list(db[LEGACY_COLLECTION].find({"keyword_id": keyword_id}, session=session).sort("created_at", -1))
+
+
+async def latest_rows_async(db, keyword_id):
+    """latest_rows through the async driver"""
+    snapshot = await db[COLLECTION].find_one({"keyword_id": keyword_id}, sort=[("created_at", -1)])
+    if snapshot:
+        return snapshot_rows(snapshot)
+    return await db[LEGACY_COLLECTION].find({"keyword_id": keyword_id}).sort("created_at", -1).to_list(None)
+
+
+def ensure_rankings_view(db):
+    """Create or update the ranking_rows view"""
+    pipeline = ROWS_STAGES + [
+        {"$unionWith": {
+            "coll": LEGACY_COLLECTION,
+            "pipeline": [{"$project": {**{field: 1 for field in ROW_FIELDS}, **{field: 1 for field in ARRAY_FIELDS}}}]
+        }}
+    ]
+    if VIEW in db.list_collection_names():
+        db.command("collMod", VIEW, viewOn=COLLECTION, pipeline=pipeline)
+    else:
+        db.create_collection(VIEW, viewOn=COLLECTION, pipeline=pipeline)
+
+
+def migrate(db):
+    """
+    Convert old per-keyword ranking rows into snapshots
+
+    Rows of one lookup share keyword_id and artifact_key and were written
+    within moments of each other, so rows a second or less apart are
+    taken as one snapshot.
+    """
+    converted = 0
+    for keyword_id in db[LEGACY_COLLECTION].distinct("keyword_id"):
+        rows = list(db[LEGACY_COLLECTION].find({"keyword_id": keyword_id}).sort([("created_at", 1), ("_id", 1)]))
+        groups = []
+        for row in rows:
+            group = groups[-1] if groups else None
+            if (
+                group
+                and group[0].get("artifact_key") == row.get("artifact_key")
+                and row["created_at"] - group[-1]["created_at"] <= timedelta(seconds=1)
+                and row["keyword"] not in {r["keyword"] for r in group}
+            ):
+                group.append(row)
+            else:
+                groups.append([row])
+
+        for group in groups:
+            first = group[0]
+            db[COLLECTION].insert_one({
+                **{field: first.get(field) for field in ROW_FIELDS},
+                **{array: [row.get(field) for row in group] for field, array in ARRAY_FIELDS.items()}
+            })
+            db[LEGACY_COLLECTION].delete_many({"_id": {"$in": [row["_id"] for row in group]}})
+            converted += len(group)
+    return converted
+
+
+def main(argv):
+    from config.db import initialize_db
+
+    db = initialize_db()
+    if db is None:
+        return 1
+    if "--migrate" in argv:
+        logger.info(f"Converted {migrate(db)} ranking rows into snapshots")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,424 @@
+"""
+Text extraction, keyword generation and ranking steps of the SEO pipeline.
+
+The steps form a stage-cached DAG (see services/pipeline_dag.py):
+
+    video content -> transcript -> keywords(top_n) -> rankings
+
+The functions below are shared by the HTTP routes and the background job
+workers. Each resolves its stage through the DAG, so unchanged upstream
+outputs are reused, and stores the result where the rest of the app
+reads it. Identical calls that overlap, such as a double-clicked button,
+are coalesced into one run (services/single_flight.py).
+"""
+
+import logging
+import os
+from datetime import datetime
+from bson import ObjectId
+
+from services.job_queue import job_handler, LeaseLost
+from services.pipeline_dag import Pipeline, Stage, digest
+from services.ranking_snapshots import snapshot_document, snapshot_rows
+from services.single_flight import SingleFlight
+from services.storage import open_video_file
+from services.transcript_store import TranscriptStore, video_text_fields
+from services.video_summaries import write_transaction, refresh_summary
+from utils.video_processor import extract_text_from_video, generate_keywords, get_keyword_rankings
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_TEXT = "This is a placeholder text for videos where text extraction failed. The system will still attempt to generate keywords based on common video SEO terms."
+
+DEFAULT_KEYWORDS = ["content", "video", "marketing", "strategy", "audience",
+                    "engagement", "optimization", "analytics", "performance", "reach"]
+
+# Search results change over time, so cached rankings expire
+RANKINGS_MAX_AGE = int(os.getenv("RANKINGS_MAX_AGE", 24 * 3600))  # seconds
+# GET /ranking serves the latest snapshot as fresh for RANKINGS_TTL seconds, then
+# as stale while a background job refreshes it for up to RANKINGS_STALE_TTL more
+RANKINGS_TTL = int(os.getenv("RANKINGS_TTL", RANKINGS_MAX_AGE))  # seconds
+RANKINGS_STALE_TTL = int(os.getenv("RANKINGS_STALE_TTL", 7 * 24 * 3600))  # seconds
+
+
+class PipelineError(Exception):
+    """Raised when a pipeline step cannot run on its input"""
+
+
+def _check_lease(context):
+    # A worker that lost its job must not overwrite the new owner's results
+    if context and context.lease_lost:
+        raise LeaseLost(f"Lease on job {context.job_id} was lost")
+
+
+def _chunk_progress(context):
+    if not context:
+        return None
+    return lambda done, total: context.set_progress(
+        done / total if total else 1.0, chunk=done, chunks_total=total
+    )
+
+
+def _compute_transcript(db, inputs, params, context):
+    with open_video_file(inputs["source"]) as video_path:
+        text = extract_text_from_video(video_path, progress_callback=_chunk_progress(context))
+    # Raise rather than return failures so they are never cached
+    if not text or text.startswith("Error"):
+        raise PipelineError(f"Text extraction failed: {text}")
+    return text
+
+
+def _compute_keywords(db, inputs, params, context):
+    text = inputs["transcript"] or ""
+    top_n = params["top_n"]
+    if len(text.strip()) == 0:
+        logger.warning("Empty extracted text, using relevant SEO keywords")
+        return DEFAULT_KEYWORDS[:top_n]
+
+    logger.info(f"Generating keywords for text: {text[:100]}...")
+    keywords = generate_keywords(text, top_n)
+
+    # Ensure we have valid keywords
+    if not keywords:
+        logger.warning("No keywords generated, using relevant SEO keywords")
+        keywords = DEFAULT_KEYWORDS[:top_n]
+    return keywords
+
+
+def _compute_rankings(db, inputs, params, context):
+    return get_keyword_rankings(inputs["keywords"])
+
+
+SEO_PIPELINE = Pipeline([
+    Stage("transcript", _compute_transcript),
+    Stage("keywords", _compute_keywords, depends_on=["transcript"], params=["top_n"]),
+    Stage("rankings", _compute_rankings, depends_on=["keywords"], max_age=RANKINGS_MAX_AGE)
+])
+
+
+def _video_source(video):
+    """The pipeline input for a video and its content digest"""
+    return video, video.get("blob_sha256") or digest({"video_id": str(video["_id"])})
+
+
+def _store_transcript(db, video_id, text, fields):
+    """Store a transcript and update the video and its summary in one transaction"""
+    store = TranscriptStore(db)
+    # GridFS cannot join the transaction, so a large transcript is uploaded before it
+    doc = store.prepare(ObjectId(video_id), text)
+    replaced = {}
+
+    def write(session):
+        replaced["gridfs_id"] = store.write(doc, session)
+        db.videos.update_one(
+            {"_id": ObjectId(video_id)},
+            {"$set": {**video_text_fields(text), **fields, "updated_at": datetime.now()}, "$unset": {"extracted_text": ""}},
+            session=session
+        )
+        refresh_summary(db, ObjectId(video_id), session)
+
+    try:
+        write_transaction(db, write)
+    except Exception:
+        store.delete_file(doc.get("gridfs_id"))
+        raise
+    store.delete_file(replaced.get("gridfs_id"))
+
+
+def _extract_video_text(db, video, context=None, force=False):
+    """
+    Extract text from a video and store it in the transcript store.
+
+    Extraction failures are stored as placeholder text so that the later
+    steps can still run.
+
+    Args:
+        db: Database instance
+        video (dict): Video document
+        context: Optional job context for stage and progress reporting
+        force (bool): Transcribe again even if a cached transcript exists
+
+    Returns:
+        dict: video_id, extracted_text and an optional note
+    """
+    video_id = str(video["_id"])
+
+    # Files probed at upload time without an audio stream have nothing to transcribe
+    if video.get("has_audio") is False:
+        raise PipelineError("Video has no audio track to extract text from")
+
+    try:
+        logger.info(f"Starting text extraction for video: {video_id}")
+        source, source_digest = _video_source(video)
+        run = SEO_PIPELINE.run(
+            db, source, source_digest, {}, ["transcript"],
+            force=["transcript"] if force else (), context=context
+        )
+        extracted_text = run.outputs["transcript"]
+
+        _store_transcript(
+            db, video_id, extracted_text,
+            {"processed": True, "artifacts.transcript": run.keys["transcript"]}
+        )
+        return {
+            "video_id": video_id,
+            "extracted_text": extracted_text
+        }
+    except Exception as e:
+        _check_lease(context)
+        logger.error(f"Error extracting text: {str(e)}")
+        # Don't fail completely, update with a placeholder
+        error = str(e)
+        _store_transcript(
+            db, video_id, PLACEHOLDER_TEXT,
+            {"processed": True, "extraction_error": error}
+        )
+        return {
+            "video_id": video_id,
+            "extracted_text": PLACEHOLDER_TEXT,
+            "note": "Text extraction failed, using placeholder"
+        }
+
+
+def extract_video_text(db, video, context=None, force=False):
+    """Extract text from a video, sharing the run with identical concurrent calls"""
+    return SingleFlight(db).run(
+        "extract", str(video["_id"]), {"force": force},
+        lambda: _extract_video_text(db, video, context, force),
+        reraise=(PipelineError,)
+    )
+
+
+def _store_keywords(db, video_id, user_id, keywords, artifact_key=None):
+    keyword_doc = {
+        "video_id": video_id,
+        "user_id": user_id,
+        "keywords": keywords,
+        "artifact_key": artifact_key,
+        "created_at": datetime.now()
+    }
+
+    def store(session):
+        result = db.keywords.insert_one(dict(keyword_doc), session=session)
+        db.videos.update_one(
+            {"_id": ObjectId(video_id)},
+            {"$set": {
+                "keywords_id": str(result.inserted_id),
+                "artifacts.keywords": artifact_key,
+                "updated_at": datetime.now()
+            }},
+            session=session
+        )
+        refresh_summary(db, ObjectId(video_id), session)
+        return str(result.inserted_id)
+    return write_transaction(db, store)
+
+
+def _generate_video_keywords(db, video, user_id, top_n=10, context=None):
+    """
+    Generate keywords from a video's extracted text and store them.
+
+    When the video's current keyword set came from the same cached output
+    it is returned as-is instead of being stored again.
+
+    Returns:
+        dict: keyword_id, video_id, keywords and an optional note
+    """
+    video_id = str(video["_id"])
+
+    transcript = TranscriptStore(db).load(video) if video.get("has_text", True) else None
+    if not transcript:
+        raise PipelineError("Text has not been extracted from this video yet")
+
+    try:
+        source, source_digest = _video_source(video)
+        run = SEO_PIPELINE.run(
+            db, source, source_digest, {"top_n": top_n}, ["keywords"],
+            seed={"transcript": transcript}, context=context
+        )
+        keywords = run.outputs["keywords"]
+        artifact_key = run.keys["keywords"]
+        logger.info(f"Generated keywords: {keywords}")
+
+        if video.get("keywords_id") and video.get("artifacts", {}).get("keywords") == artifact_key:
+            keyword_id = video["keywords_id"]
+        else:
+            keyword_id = _store_keywords(db, video_id, user_id, keywords, artifact_key)
+        return {
+            "keyword_id": keyword_id,
+            "video_id": video_id,
+            "keywords": keywords
+        }
+    except Exception as e:
+        _check_lease(context)
+        logger.error(f"Error generating keywords: {str(e)}")
+        # Don't fail completely, provide relevant SEO keywords
+        keywords = DEFAULT_KEYWORDS[:top_n]
+        keyword_id = _store_keywords(db, video_id, user_id, keywords)
+        return {
+            "keyword_id": keyword_id,
+            "video_id": video_id,
+            "keywords": keywords,
+            "note": "Default keywords used due to extraction error"
+        }
+
+
+def generate_video_keywords(db, video, user_id, top_n=10, context=None):
+    """Generate keywords for a video, sharing the run with identical concurrent calls"""
+    return SingleFlight(db).run(
+        "keywords", str(video["_id"]), {"top_n": top_n},
+        lambda: _generate_video_keywords(db, video, user_id, top_n, context),
+        reraise=(PipelineError,)
+    )
+
+
+def _store_rankings(db, keyword_doc, user_id, rankings, artifact_key=None):
+    """Store ranking results as one snapshot and return its per-keyword rows"""
+    def store(session):
+        snapshot = snapshot_document(keyword_doc, user_id, rankings, artifact_key, datetime.utcnow())
+        db.ranking_snapshots.insert_one(snapshot, session=session)
+        refresh_summary(db, ObjectId(keyword_doc["video_id"]), session)
+        return snapshot_rows(snapshot)
+    return write_transaction(db, store)
+
+
+def _rank_keywords(db, keyword_doc, user_id, context=None, force=False):
+    """
+    Look up rankings for a keyword set and store them.
+
+    When the rankings stage output comes from the cache, the snapshot
+    already stored from that output is returned instead of storing it
+    again. Freshly computed rankings always get a new snapshot; force
+    skips the cache, so a refresh always stores one.
+
+    Returns:
+        dict: video_id, keyword_id, rankings, keywords and an optional note
+    """
+    keyword_id = str(keyword_doc["_id"])
+    try:
+        # Rankings depend only on the keywords, so no source is needed
+        run = SEO_PIPELINE.run(
+            db, None, None, {}, ["rankings"],
+            seed={"keywords": keyword_doc["keywords"]}, context=context,
+            force=("rankings",) if force else ()
+        )
+        artifact_key = run.keys["rankings"]
+
+        snapshot = None
+        if run.cached["rankings"]:
+            # An expired output is recomputed under the same key, so only a snapshot
+            # stored from this generation of the output counts
+            snapshot = db.ranking_snapshots.find_one({
+                "keyword_id": keyword_id,
+                "artifact_key": artifact_key,
+                "created_at": {"$gte": run.created_at["rankings"]}
+            })
+        if snapshot:
+            ranking_docs = snapshot_rows(snapshot)
+        else:
+            ranking_docs = _store_rankings(db, keyword_doc, user_id, run.outputs["rankings"], artifact_key)
+
+        return {
+            "video_id": keyword_doc["video_id"],
+            "keyword_id": keyword_id,
+            "rankings": ranking_docs,
+            "keywords": keyword_doc["keywords"]
+        }
+    except Exception as e:
+        _check_lease(context)
+        logger.error(f"Error getting rankings: {str(e)}")
+        # Return mock rankings as fallback
+        fallback = [
+            {
+                "keyword": keyword,
+                "rank": 5.0,
+                "search_volume": 1000,
+                "competition": 0.5
+            } for keyword in keyword_doc["keywords"]
+        ]
+        return {
+            "video_id": keyword_doc["video_id"],
+            "keyword_id": keyword_id,
+            "rankings": _store_rankings(db, keyword_doc, user_id, fallback),
+            "keywords": keyword_doc["keywords"],
+            "note": "Mock rankings used due to API error"
+        }
+
+
+def rank_keywords(db, keyword_doc, user_id, context=None, force=False):
+    """Rank a keyword set, sharing the run with identical concurrent calls"""
+    return SingleFlight(db).run(
+        "rankings", keyword_doc["video_id"], {"keyword_id": str(keyword_doc["_id"]), "force": force},
+        lambda: _rank_keywords(db, keyword_doc, user_id, context, force)
+    )
+
+
+def _find_job_video(db, job):
+    video = db.videos.find_one({"_id": ObjectId(job["video_id"]), "user_id": job["user_id"]})
+    if not video:
+        raise PipelineError("Video not found")
+    return video
+
+
+@job_handler("extract", stages=[("transcript", 1.0)])
+def run_extract_job(db, job, context):
+    """Job: extract text from a video"""
+    video = _find_job_video(db, job)
+    result = extract_video_text(db, video, context=context, force=job["params"].get("force", False))
+    return {
+        "video_id": result["video_id"],
+        "text_length": len(result["extracted_text"]),
+        "note": result.get("note")
+    }
+
+
+@job_handler("rankings", stages=[("rankings", 1.0)])
+def run_rankings_job(db, job, context):
+    """Job: refresh the rankings of a keyword set in the background"""
+    keyword_doc = db.keywords.find_one({"_id": ObjectId(job["params"]["keyword_id"]), "user_id": job["user_id"]})
+    if not keyword_doc:
+        raise PipelineError("Keywords not found")
+    # Bypass the cached stage output so the refresh always stores a new snapshot
+    rankings = rank_keywords(db, keyword_doc, job["user_id"], context=context, force=True)
+    return {
+        "video_id": rankings["video_id"],
+        "keyword_id": rankings["keyword_id"],
+        "rankings": len(rankings["rankings"]),
+        "note": rankings.get("note")
+    }
+
+
+@job_handler("pipeline", stages=[("transcript", 0.8), ("keywords", 0.1), ("rankings", 0.1)])
+def run_pipeline_job(db, job, context):
+    """
+    Job: extract text, generate keywords and look up their rankings
+
+    Stages whose inputs and parameters are unchanged reuse their cached
+    output, so rerunning with a different top_n skips transcription.
+    """
+    video = _find_job_video(db, job)
+    top_n = job["params"].get("top_n", 10)
+
+    extract_video_text(db, video, context=context)
+
+    video = _find_job_video(db, job)
+    keywords = generate_video_keywords(db, video, job["user_id"], top_n, context=context)
+
+    keyword_doc = db.keywords.find_one({"_id": ObjectId(keywords["keyword_id"])})
+    rankings = rank_keywords(db, keyword_doc, job["user_id"], context=context)
+
+    return {
+        "video_id": str(video["_id"]),
+        "keyword_id": keywords["keyword_id"],
+        "keywords": keywords["keywords"],
+        "rankings": [
+            {
+                "keyword": r["keyword"],
+                "rank": r["rank"],
+                "search_volume": r["search_volume"],
+                "competition": r["competition"]
+            } for r in rankings["rankings"]
+        ]
+    }
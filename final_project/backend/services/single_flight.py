@@ -0,0 +1,150 @@
+"""
+Single-flight coalescing of identical concurrent computations.
+
+A computation is identified by (operation, video_id, parameters). The
+first caller takes a lock document in the `locks` collection and runs it.
+Callers that arrive while it runs, in any process, wait for the lock
+document to hold the result and return that instead of running the
+computation again. The lock is a lease renewed while the owner works, so
+if the owner dies a waiter takes over once it expires.
+
+Finished results stay readable for SINGLE_FLIGHT_RESULT_TTL seconds,
+just long enough for waiters that were already polling to pick them up.
+The key does not cover the inputs the computation reads, so a call made
+after that runs again rather than returning a result computed from data
+that may have changed since. The TTL index on purge_at removes the
+document (config/indexes.py).
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+
+from services.pipeline_dag import digest
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_LEASE_SECONDS = int(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", 60))
+SINGLE_FLIGHT_RESULT_TTL = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL", 5))
+SINGLE_FLIGHT_WAIT_SECONDS = int(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", 1800))
+POLL_INTERVAL = 0.5
+
+RUNNING = "running"
+DONE = "done"
+
+
+class SingleFlightTimeout(Exception):
+    """Raised when a waiter gives up on an in-flight computation"""
+
+
+class SingleFlight:
+    """Runs each distinct computation once at a time across all processes"""
+
+    def __init__(self, db):
+        self.db = db
+        self.locks = db.locks
+
+    @staticmethod
+    def key(operation, video_id, params=None):
+        return f"{operation}:{video_id}:{digest(params or {})[:16]}"
+
+    def _acquire(self, key, token):
+        """Take the lock, or take over an expired one; True if this caller now owns it"""
+        now = datetime.now()
+        lock = {
+            "owner": token,
+            "state": RUNNING,
+            "expires_at": now + timedelta(seconds=SINGLE_FLIGHT_LEASE_SECONDS),
+            "purge_at": now + timedelta(seconds=SINGLE_FLIGHT_LEASE_SECONDS + SINGLE_FLIGHT_RESULT_TTL),
+            "created_at": now
+        }
+        try:
+            self.locks.insert_one({"_id": key, **lock})
+            return True
+        except DuplicateKeyError:
+            pass
+        result = self.locks.update_one(
+            {"_id": key, "expires_at": {"$lt": now}},
+            {"$set": lock, "$unset": {"result": "", "error": "", "error_type": ""}}
+        )
+        return result.modified_count == 1
+
+    def _renew(self, key, token, done):
+        while not done.wait(SINGLE_FLIGHT_LEASE_SECONDS / 3):
+            now = datetime.now()
+            self.locks.update_one(
+                {"_id": key, "owner": token, "state": RUNNING},
+                {"$set": {
+                    "expires_at": now + timedelta(seconds=SINGLE_FLIGHT_LEASE_SECONDS),
+                    "purge_at": now + timedelta(seconds=SINGLE_FLIGHT_LEASE_SECONDS + SINGLE_FLIGHT_RESULT_TTL)
+                }}
+            )
+
+    def _finish(self, key, token, fields):
+        now = datetime.now()
+        self.locks.update_one(
+            {"_id": key, "owner": token},
+            {"$set": {
+                "state": DONE,
+                # Only waiters already polling get the result; later calls run again
+                "expires_at": now + timedelta(seconds=SINGLE_FLIGHT_RESULT_TTL),
+                "purge_at": now + timedelta(seconds=SINGLE_FLIGHT_RESULT_TTL),
+                **fields
+            }}
+        )
+
+    def _own(self, key, token, fn):
+        done = threading.Event()
+        threading.Thread(target=self._renew, args=(key, token, done), daemon=True).start()
+        try:
+            result = fn()
+        except Exception as e:
+            done.set()
+            self._finish(key, token, {"error": str(e), "error_type": type(e).__name__})
+            raise
+        done.set()
+        self._finish(key, token, {"result": result})
+        return result
+
+    def run(self, operation, video_id, params, fn, reraise=()):
+        """
+        Run fn() unless an identical call is in flight, and return its result
+
+        Args:
+            operation (str): Name of the computation
+            video_id (str): Video the computation is about
+            params (dict): Parameters that change the result
+            fn (callable): The computation; its result must be storable in Mongo
+            reraise (tuple): Exception types re-raised as themselves in waiters;
+                other errors of the owner reach waiters as RuntimeError
+        """
+        key = self.key(operation, video_id, params)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + SINGLE_FLIGHT_WAIT_SECONDS
+        waited = False
+
+        while True:
+            if self._acquire(key, token):
+                return self._own(key, token, fn)
+
+            lock = self.locks.find_one({"_id": key})
+            if lock and lock["state"] == DONE:
+                if waited:
+                    logger.info(f"Joined in-flight {operation} for video {video_id}")
+                if "error" in lock:
+                    for error_type in reraise:
+                        if error_type.__name__ == lock.get("error_type"):
+                            raise error_type(lock["error"])
+                    raise RuntimeError(lock["error"])
+                return lock.get("result")
+
+            if time.monotonic() > deadline:
+                raise SingleFlightTimeout(f"Timed out waiting for in-flight {operation} on video {video_id}")
+            waited = True
+            time.sleep(POLL_INTERVAL)
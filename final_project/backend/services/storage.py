@@ -0,0 +1,373 @@
+"""
+Media storage backends.
+
+Uploaded media is addressed by a storage key (for example
+`blobs/ab/cd/<sha256>`) instead of a path on the API host, so any node can
+read it. The local driver keeps files under UPLOAD_DIR; the S3 driver works
+with AWS S3 or any S3-compatible server such as MinIO.
+
+Reads go through local_path (for tools that need a file), a presigned
+URL (for clients and ffmpeg) or read_range, which reads one byte range
+(a ranged GET on S3) without fetching the whole object. Browser range
+requests are served from the local file with sendfile, or by S3 itself
+after a redirect. Uploads are hashed into a temporary file before their
+key is known and then moved in with put_file.
+open_writer streams output whose key is known up front, such as
+retention archives.
+"""
+
+import hashlib
+import hmac
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlencode, quote
+from dotenv import load_dotenv
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+
+# Load environment variables
+load_dotenv()
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.getcwd(), "uploads"))
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "http://localhost:8000/media")
+MEDIA_URL_SECRET = os.getenv("MEDIA_URL_SECRET", os.getenv("JWT_SECRET_KEY", "default_secret_key"))
+
+S3_BUCKET = os.getenv("S3_BUCKET", "video-seo-media")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # e.g. http://localhost:9000 for MinIO
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+
+MULTIPART_CHUNK_SIZE = int(os.getenv("STORAGE_MULTIPART_CHUNK_SIZE", 8 * 1024 * 1024))  # 8MB
+READ_BLOCK_SIZE = 1024 * 1024  # 1MB
+
+
+class StorageError(Exception):
+    """Raised when a storage key cannot be read or written"""
+
+
+def sign_media_key(key, expires):
+    """Sign a storage key and expiry time for a local media URL"""
+    message = f"{key}:{expires}".encode("utf-8")
+    return hmac.new(MEDIA_URL_SECRET.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def verify_media_signature(key, expires, signature):
+    """Check a local media URL signature and that it has not expired"""
+    try:
+        if int(expires) < time.time():
+            return False
+    except (TypeError, ValueError):
+        return False
+    return hmac.compare_digest(sign_media_key(key, expires), signature or "")
+
+
+class LocalStorage:
+    """Stores media as files under a root directory"""
+
+    name = "local"
+
+    def __init__(self, root=UPLOAD_DIR):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key):
+        """Get the file path for a key, refusing keys that escape the root"""
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise StorageError(f"Invalid storage key: {key}")
+        return path
+
+    def uri(self, key):
+        return self.path(key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def size(self, key):
+        return os.path.getsize(self.path(key))
+
+    def put_file(self, key, local_path):
+        """Move a local file into the store"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(local_path, path)
+
+    @contextmanager
+    def open_writer(self, key):
+        """Write a key as a stream; the file appears only once it is complete"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                yield f
+            os.replace(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    def read_range(self, key, start=0, end=None):
+        """Yield the bytes from start to end (inclusive) of a key"""
+        with open(self.path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                block = f.read(READ_BLOCK_SIZE if remaining is None else min(READ_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                if remaining is not None:
+                    remaining -= len(block)
+                yield block
+
+    @contextmanager
+    def local_path(self, key):
+        """Yield a local file path for tools such as ffmpeg"""
+        yield self.path(key)
+
+    def media_source(self, key):
+        """Get a path or URL that ffmpeg tools can read directly"""
+        return self.path(key)
+
+    def presigned_url(self, key, expires_in=3600):
+        """Get a signed, expiring URL served by the /media route"""
+        expires = int(time.time()) + expires_in
+        query = urlencode({"expires": expires, "signature": sign_media_key(key, expires)})
+        return f"{MEDIA_BASE_URL}/{quote(key)}?{query}"
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3MultipartWriter:
+    """File-like writer that sends a key to S3 as a multipart upload"""
+
+    def __init__(self, client, bucket, key, part_size=MULTIPART_CHUNK_SIZE):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.parts = []
+        self.upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+
+    def write(self, data):
+        self.buffer.extend(data)
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+        return len(data)
+
+    def _upload_part(self, body):
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    def complete(self):
+        # The last part may be smaller than the minimum part size
+        if self.buffer or not self.parts:
+            self._upload_part(bytes(self.buffer))
+            self.buffer.clear()
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts}
+        )
+
+    def abort(self):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+class S3Storage:
+    """Stores media in an S3-compatible bucket"""
+
+    name = "s3"
+
+    def __init__(self, bucket=S3_BUCKET, endpoint_url=S3_ENDPOINT_URL, region=S3_REGION):
+        if not BOTO3_AVAILABLE:
+            raise StorageError("boto3 is not installed, cannot use the S3 storage backend")
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=os.getenv("S3_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("S3_SECRET_ACCESS_KEY")
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=MULTIPART_CHUNK_SIZE
+        )
+
+    def uri(self, key):
+        return f"s3://{self.bucket}/{key}"
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+    def size(self, key):
+        return self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+
+    def put_file(self, key, local_path):
+        """Upload a local file in multipart chunks, then remove it"""
+        self.client.upload_file(local_path, self.bucket, key, Config=self.transfer_config)
+        os.remove(local_path)
+
+    @contextmanager
+    def open_writer(self, key):
+        writer = S3MultipartWriter(self.client, self.bucket, key)
+        try:
+            yield writer
+            writer.complete()
+        except Exception:
+            writer.abort()
+            raise
+
+    def read_range(self, key, start=0, end=None):
+        """Yield the bytes from start to end (inclusive) of a key with one ranged GET"""
+        byte_range = f"bytes={start}-" if end is None else f"bytes={start}-{end}"
+        body = self.client.get_object(Bucket=self.bucket, Key=key, Range=byte_range)["Body"]
+        try:
+            for block in body.iter_chunks(READ_BLOCK_SIZE):
+                yield block
+        finally:
+            body.close()
+
+    @contextmanager
+    def local_path(self, key):
+        """Download a key to a temporary file for tools that need a path"""
+        suffix = os.path.splitext(key)[1]
+        fd, temp_path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, key, temp_path, Config=self.transfer_config)
+            yield temp_path
+        finally:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+
+    def media_source(self, key):
+        """Get a short-lived URL so ffmpeg tools read only the bytes they need"""
+        return self.presigned_url(key, expires_in=300)
+
+    def presigned_url(self, key, expires_in=3600):
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expires_in
+        )
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+class StorageReader(io.RawIOBase):
+    """Seekable read-only file over a key; each read is one read_range call"""
+
+    def __init__(self, storage, key):
+        self.storage = storage
+        self.key = key
+        self.length = storage.size(key)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self.position = max(offset, 0)
+        return self.position
+
+    def readinto(self, buffer):
+        end = min(self.position + len(buffer), self.length) - 1
+        if end < self.position:
+            return 0
+        count = 0
+        for block in self.storage.read_range(self.key, self.position, end):
+            buffer[count:count + len(block)] = block
+            count += len(block)
+        self.position += count
+        return count
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Get the configured storage backend"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                if STORAGE_BACKEND == "s3":
+                    _storage = S3Storage()
+                else:
+                    _storage = LocalStorage()
+                logger.info(f"Using {_storage.name} media storage")
+    return _storage
+
+
+@contextmanager
+def open_video_file(video):
+    """
+    Yield a local path to a video's media file.
+
+    Videos stored before the storage backend existed only have an
+    absolute `file_path`, which is used as-is.
+    """
+    if video.get("storage_key"):
+        with get_storage().local_path(video["storage_key"]) as path:
+            yield path
+    else:
+        yield video["file_path"]
+
+
+def open_video_reader(video):
+    """
+    Open a video's media file for reading without downloading it first.
+
+    Reads are served by read_range, so a caller that reads the file in
+    chunks fetches one chunk at a time from S3.
+    """
+    if video.get("storage_key"):
+        return io.BufferedReader(StorageReader(get_storage(), video["storage_key"]), READ_BLOCK_SIZE)
+    return open(video["file_path"], "rb")
@@ -0,0 +1,198 @@
+"""
+Compressed transcript storage outside the video documents.
+
+Transcripts can run to hundreds of kilobytes. Kept inline on `videos`,
+every query without a projection pulls them over the wire and they fill
+the cache with text that is rarely read. They are stored here instead,
+keyed by video _id, and loaded only when a caller asks for the text:
+
+- `transcripts` documents hold the compressed text (zstd when the
+  zstandard package is installed, zlib otherwise)
+- transcripts still larger than TRANSCRIPT_INLINE_MAX_BYTES after
+  compression go to the `transcripts` GridFS bucket, and the document
+  keeps the file ID
+
+GridFS cannot take part in multi-document transactions. A transcript
+written inside one is prepared first, which uploads any GridFS file
+outside the transaction. The transaction then only writes the document.
+Once it commits, the file it replaced is deleted, and if it aborts, the
+new file is.
+
+The video document only keeps has_text and text_length. Videos written
+before this change may still carry extracted_text inline; loaders fall
+back to it, and `python -m services.transcript_store --migrate` moves
+them over.
+"""
+
+import logging
+import os
+import sys
+import zlib
+from datetime import datetime
+from bson import Binary
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_INLINE_MAX_BYTES = int(os.getenv("TRANSCRIPT_INLINE_MAX_BYTES", 4 * 1024 * 1024))
+TRANSCRIPT_COMPRESSION_LEVEL = int(os.getenv("TRANSCRIPT_COMPRESSION_LEVEL", 6))
+BUCKET_NAME = "transcripts"
+
+
+def compress(text):
+    """Compress text with the best available codec; returns (codec, data)"""
+    data = text.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=TRANSCRIPT_COMPRESSION_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, TRANSCRIPT_COMPRESSION_LEVEL)
+
+
+def decompress(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Transcript is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    if codec == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown transcript codec: {codec}")
+
+
+def video_text_fields(text):
+    """Fields set on the video document when its transcript is stored"""
+    return {"has_text": bool(text), "text_length": len(text)}
+
+
+class TranscriptStore:
+    """Saves and loads compressed transcripts by video _id"""
+
+    def __init__(self, db):
+        self.db = db
+        self.bucket = GridFSBucket(db, bucket_name=BUCKET_NAME)
+
+    def prepare(self, video_id, text):
+        """Compress a transcript into its document, uploading it to GridFS if it is too large to keep inline"""
+        codec, data = compress(text)
+        doc = {
+            "_id": video_id,
+            "codec": codec,
+            "length": len(text),
+            "compressed_size": len(data),
+            "updated_at": datetime.now()
+        }
+        if len(data) > TRANSCRIPT_INLINE_MAX_BYTES:
+            doc["gridfs_id"] = self.bucket.upload_from_stream(str(video_id), data, metadata={"codec": codec})
+        else:
+            doc["data"] = Binary(data)
+        return doc
+
+    def write(self, doc, session=None):
+        """Store a prepared transcript; returns the ID of the GridFS file it replaced, if any"""
+        previous = self.db.transcripts.find_one({"_id": doc["_id"]}, {"gridfs_id": 1}, session=session)
+        self.db.transcripts.replace_one({"_id": doc["_id"]}, doc, upsert=True, session=session)
+        if previous and previous.get("gridfs_id") != doc.get("gridfs_id"):
+            return previous.get("gridfs_id")
+        return None
+
+    def delete_file(self, gridfs_id):
+        """Delete a GridFS file no transcript points at any more"""
+        if gridfs_id is None:
+            return
+        try:
+            self.bucket.delete(gridfs_id)
+        except NoFile:
+            pass
+
+    def save(self, video_id, text):
+        """Store a transcript outside any transaction"""
+        doc = self.prepare(video_id, text)
+        try:
+            replaced = self.write(doc)
+        except Exception:
+            self.delete_file(doc.get("gridfs_id"))
+            raise
+        self.delete_file(replaced)
+        return doc
+
+    def delete(self, video_id):
+        """Delete the transcript of a video, including its GridFS file"""
+        doc = self.db.transcripts.find_one_and_delete({"_id": video_id})
+        if doc and doc.get("gridfs_id"):
+            self.bucket.delete(doc["gridfs_id"])
+
+    def _decode(self, doc):
+        if doc.get("gridfs_id"):
+            data = self.bucket.open_download_stream(doc["gridfs_id"]).read()
+        else:
+            data = doc["data"]
+        return decompress(doc["codec"], data)
+
+    def load(self, video):
+        """The transcript of a video document, or None if it has none"""
+        doc = self.db.transcripts.find_one({"_id": video["_id"]})
+        if doc:
+            return self._decode(doc)
+        return video.get("extracted_text")
+
+    def migrate(self):
+        """Move transcripts still stored inline on videos into this store"""
+        moved = 0
+        for video in self.db.videos.find({"extracted_text": {"$exists": True}}, {"extracted_text": 1}):
+            text = video["extracted_text"] or ""
+            self.save(video["_id"], text)
+            self.db.videos.update_one(
+                {"_id": video["_id"]},
+                {"$set": video_text_fields(text), "$unset": {"extracted_text": ""}}
+            )
+            moved += 1
+        return moved
+
+
+async def load_transcripts(db, videos):
+    """
+    Transcripts of several video documents through the async driver
+
+    Returns:
+        dict: video _id -> transcript, for the videos that have one
+    """
+    from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+    docs = await db.transcripts.find({"_id": {"$in": [video["_id"] for video in videos]}}).to_list(None)
+    bucket = None
+    texts = {}
+    for doc in docs:
+        if doc.get("gridfs_id"):
+            bucket = bucket or AsyncIOMotorGridFSBucket(db, bucket_name=BUCKET_NAME)
+            stream = await bucket.open_download_stream(doc["gridfs_id"])
+            data = await stream.read()
+        else:
+            data = doc["data"]
+        texts[doc["_id"]] = decompress(doc["codec"], data)
+
+    # Videos written before transcripts moved out still carry the text inline
+    for video in videos:
+        if video["_id"] not in texts and video.get("extracted_text") is not None:
+            texts[video["_id"]] = video["extracted_text"]
+    return texts
+
+
+def main(argv):
+    from config.db import initialize_db
+
+    db = initialize_db()
+    if db is None:
+        return 1
+    if "--migrate" in argv:
+        logger.info(f"Moved {TranscriptStore(db).migrate()} inline transcripts to the transcript store")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,238 @@
+import logging
+import os
+import re
+from datetime import datetime
+from bson import ObjectId
+from fastapi.concurrency import run_in_threadpool
+
+from services.blob_store import BlobStore, PARTIAL_DIR, hash_file
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Clients are told to send chunks of this size; any size is accepted
+RECOMMENDED_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))  # 8MB
+
+# Received bytes are written to disk in blocks of this size, off the event loop
+WRITE_BLOCK_SIZE = 1024 * 1024  # 1MB
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+class UploadSessionError(Exception):
+    """Raised when a chunk or finalize call does not match the session state"""
+
+    def __init__(self, message, offset=None):
+        super().__init__(message)
+        self.offset = offset
+
+
+def parse_content_range(header):
+    """
+    Parse a Content-Range header of the form 'bytes start-end/total'
+
+    Returns:
+        tuple: (start, end, total) where end is inclusive and total may be None
+    """
+    match = CONTENT_RANGE_RE.match((header or "").strip())
+    if not match:
+        raise UploadSessionError(f"Invalid Content-Range header: {header}")
+
+    start, end, total = match.groups()
+    start, end = int(start), int(end)
+    total = None if total == "*" else int(total)
+    if end < start or (total is not None and end >= total):
+        raise UploadSessionError(f"Invalid Content-Range header: {header}")
+    return start, end, total
+
+
+def _write_at(fd, data, position):
+    """Write all of data at position; returns the position after it"""
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, position)
+        position += written
+        view = view[written:]
+    return position
+
+
+def _sync_and_close(fd):
+    try:
+        os.fdatasync(fd)
+    finally:
+        os.close(fd)
+
+
+class UploadSessionManager:
+    """
+    Resumable upload sessions stored in the `upload_sessions` collection.
+
+    Each session owns a preallocated partial file. Chunks are written in
+    place with positioned writes, and the committed offset is only advanced
+    after the bytes are on disk, so a dropped connection resumes from the
+    last committed byte. Finalizing hashes the partial file and renames it
+    into the blob store, so no reassembly copy is made.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        os.makedirs(PARTIAL_DIR, exist_ok=True)
+
+    def create_session(self, user_id, filename, title, size):
+        """Create a new upload session and preallocate its partial file"""
+        if size <= 0:
+            raise UploadSessionError("Upload size must be greater than zero")
+
+        session_id = ObjectId()
+        temp_path = os.path.join(PARTIAL_DIR, f"{session_id}.part")
+
+        # Size the file up front so chunks can be written at any offset
+        with open(temp_path, "wb") as f:
+            f.truncate(size)
+
+        session = {
+            "_id": session_id,
+            "user_id": user_id,
+            "filename": os.path.basename(filename),
+            "title": title,
+            "size": size,
+            "offset": 0,
+            "temp_path": temp_path,
+            "status": "active",
+            "created_at": datetime.now(),
+            "updated_at": datetime.now()
+        }
+        self.db.upload_sessions.insert_one(session)
+        logger.info(f"Created upload session {session_id} for {filename} ({size} bytes)")
+        return session
+
+    def get_session(self, session_id, user_id):
+        """Get an upload session owned by the given user"""
+        if not ObjectId.is_valid(session_id):
+            return None
+        return self.db.upload_sessions.find_one({"_id": ObjectId(session_id), "user_id": user_id})
+
+    async def write_chunk(self, session, start, end, total, stream):
+        """
+        Write one chunk from an async byte stream at its offset.
+
+        The chunk must start at the committed offset. Whatever part of it
+        arrives is committed, so an interrupted chunk still moves the
+        offset forward. Disk writes and the offset update run in the
+        thread pool, so other requests keep being served meanwhile.
+
+        Returns:
+            int: The new committed offset
+        """
+        if session["status"] != "active":
+            raise UploadSessionError("Upload session is not active", session["offset"])
+        if total is not None and total != session["size"]:
+            raise UploadSessionError("Content-Range total does not match upload size", session["offset"])
+        if start != session["offset"]:
+            raise UploadSessionError(
+                f"Chunk starts at {start} but committed offset is {session['offset']}",
+                session["offset"]
+            )
+
+        expected = end - start + 1
+        position = start
+        buffer = bytearray()
+        fd = await run_in_threadpool(os.open, session["temp_path"], os.O_WRONLY)
+        try:
+            async for data in stream:
+                if not data:
+                    continue
+                if position + len(buffer) + len(data) > end + 1:
+                    raise UploadSessionError("Chunk body is larger than its Content-Range", session["offset"])
+                buffer += data
+                if len(buffer) >= WRITE_BLOCK_SIZE:
+                    position = await run_in_threadpool(_write_at, fd, bytes(buffer), position)
+                    buffer.clear()
+        finally:
+            try:
+                if buffer:
+                    position = await run_in_threadpool(_write_at, fd, bytes(buffer), position)
+            finally:
+                await run_in_threadpool(_sync_and_close, fd)
+            # Only advance from the offset this chunk started at, so a
+            # concurrent request for the same range cannot move it twice
+            if position > start:
+                await run_in_threadpool(
+                    self.db.upload_sessions.update_one,
+                    {"_id": session["_id"], "offset": start},
+                    {"$set": {"offset": position, "updated_at": datetime.now()}}
+                )
+
+        if position - start != expected:
+            raise UploadSessionError(
+                f"Received {position - start} of {expected} bytes for chunk",
+                position
+            )
+        return position
+
+    def finalize(self, session):
+        """
+        Move a fully written upload into place and create its video document
+
+        Returns:
+            dict: The inserted video document
+        """
+        if session["status"] == "complete":
+            return self.db.videos.find_one({"_id": session["video_id"]})
+        if session["offset"] != session["size"]:
+            raise UploadSessionError(
+                f"Upload is incomplete: {session['offset']} of {session['size']} bytes received",
+                session["offset"]
+            )
+
+        # Claim the session so a repeated finalize call cannot move the file twice
+        claimed = self.db.upload_sessions.find_one_and_update(
+            {"_id": session["_id"], "status": "active"},
+            {"$set": {"status": "finalizing", "updated_at": datetime.now()}}
+        )
+        if not claimed:
+            raise UploadSessionError("Upload session is already being finalized", session["offset"])
+
+        blob_store = BlobStore(self.db)
+        try:
+            if claimed.get("blob_sha256"):
+                # An earlier attempt stored the file and failed after; the session holds its reference
+                blob = self.db.blobs.find_one({"_id": claimed["blob_sha256"]})
+            else:
+                sha256 = hash_file(session["temp_path"])
+                blob = blob_store.commit_file(session["temp_path"], sha256, session["size"], session["user_id"])
+                self.db.upload_sessions.update_one(
+                    {"_id": session["_id"]},
+                    {"$set": {"blob_sha256": sha256, "updated_at": datetime.now()}}
+                )
+
+            video = {
+                "user_id": session["user_id"],
+                "title": session["title"],
+                "filename": session["filename"],
+                **blob_store.video_fields(blob),
+                "processed": False,
+                "created_at": datetime.now(),
+                "updated_at": datetime.now()
+            }
+            result = self.db.videos.insert_one(video)
+            video["_id"] = result.inserted_id
+        except Exception:
+            # Let the client retry finalize instead of leaving the session stuck
+            self.db.upload_sessions.update_one(
+                {"_id": session["_id"]},
+                {"$set": {"status": "active", "updated_at": datetime.now()}}
+            )
+            raise
+
+        self.db.upload_sessions.update_one(
+            {"_id": session["_id"]},
+            {"$set": {
+                "status": "complete",
+                "video_id": result.inserted_id,
+                "updated_at": datetime.now()
+            }}
+        )
+        logger.info(f"Finalized upload session {session['_id']} as video {result.inserted_id}")
+        return video
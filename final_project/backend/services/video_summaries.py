@@ -0,0 +1,112 @@
+"""
+Per-video summary read model.
+
+The `video_summaries` collection holds one document per video, keyed by
+the video's _id, with everything the detail and dashboard views show:
+title, processing status, the latest keywords and the latest rankings.
+Reads become a single point lookup instead of a join across videos,
+keywords and rankings.
+
+The pipeline rebuilds a video's summary whenever extraction, keyword
+generation or ranking writes, in the same transaction as those writes
+(see write_transaction). Videos that have no summary yet, such as ones
+uploaded before this collection existed, are summarized on first read.
+"""
+
+from datetime import datetime
+from bson import ObjectId
+
+from services.ranking_snapshots import latest_rows
+
+UPLOADED = "uploaded"
+TEXT_EXTRACTED = "text_extracted"
+EXTRACTION_FAILED = "extraction_failed"
+KEYWORDS_READY = "keywords_ready"
+RANKED = "ranked"
+
+# Topologies that support multi-document transactions
+_TRANSACTIONAL_TOPOLOGIES = ("ReplicaSetWithPrimary", "Sharded", "LoadBalanced")
+
+
+def write_transaction(db, fn):
+    """
+    Run fn(session) in a transaction, so source writes and the summary
+    rebuild are applied together or not at all.
+
+    A standalone server has no transactions; there fn(None) runs the
+    writes one after another.
+    """
+    client = db.client
+    if client.topology_description.topology_type_name not in _TRANSACTIONAL_TOPOLOGIES:
+        return fn(None)
+    with client.start_session() as session:
+        return session.with_transaction(fn)
+
+
+def latest_rankings(rankings):
+    """The newest ranking per keyword from ranking rows sorted newest first"""
+    rows = {}
+    for ranking in rankings:
+        if ranking["keyword"] not in rows:
+            rows[ranking["keyword"]] = {
+                "keyword": ranking["keyword"],
+                "rank": ranking["rank"],
+                "search_volume": ranking.get("search_volume"),
+                "competition": ranking.get("competition")
+            }
+    return list(rows.values())
+
+
+def _has_text(video):
+    # Videos from before the transcript store keep their text inline
+    return video.get("has_text", bool(video.get("extracted_text")))
+
+
+def summary_document(video, keyword_doc=None, rankings=None):
+    """
+    Build a summary from a video, its current keyword set and that set's
+    ranking rows sorted newest first
+    """
+    if rankings:
+        status = RANKED
+    elif keyword_doc:
+        status = KEYWORDS_READY
+    elif video.get("extraction_error"):
+        status = EXTRACTION_FAILED
+    elif _has_text(video):
+        status = TEXT_EXTRACTED
+    else:
+        status = UPLOADED
+
+    return {
+        "_id": video["_id"],
+        "user_id": video["user_id"],
+        "title": video["title"],
+        "filename": video["filename"],
+        "processed": video.get("processed", False),
+        "has_text": _has_text(video),
+        "status": status,
+        "keywords_id": video.get("keywords_id", ""),
+        "keywords": keyword_doc["keywords"] if keyword_doc else [],
+        "rankings": latest_rankings(rankings or []),
+        "created_at": video["created_at"],
+        "updated_at": video.get("updated_at", video["created_at"]),
+        "summarized_at": datetime.now()
+    }
+
+
+def refresh_summary(db, video_id, session=None):
+    """Rebuild a video's summary from the source collections"""
+    video = db.videos.find_one({"_id": video_id}, {"artifacts": 0}, session=session)
+    if not video:
+        return None
+
+    keyword_doc = None
+    rankings = []
+    if video.get("keywords_id"):
+        keyword_doc = db.keywords.find_one({"_id": ObjectId(video["keywords_id"])}, session=session)
+        rankings = latest_rows(db, video["keywords_id"], session)
+
+    summary = summary_document(video, keyword_doc, rankings)
+    db.video_summaries.replace_one({"_id": video_id}, summary, upsert=True, session=session)
+    return summary
@@ -1,6 +1,7 @@
 import logging
 import requests
 from datetime import datetime
+from bson import ObjectId
 from twilio.rest import Client
 import sys
 import os
@@ -17,6 +18,7 @@ from twilio_config import (
     SHARES_MILESTONE_TEMPLATE
 )
 from youtube_config import YOUTUBE_API_KEY, YOUTUBE_API_BASE_URL
+from services.metrics_history import record_poll
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -48,8 +50,17 @@ class YouTubeMonitor:
         logger.info(f"Checking metrics for video {video_id} for user {user_id}")
         
         try:
+            # Get video metrics from YouTube API
+            metrics = self._get_video_metrics(video_id)
+            if not metrics:
+                logger.warning(f"Could not get metrics for video {video_id}")
+                return
+            
+            # Keep every poll so growth over time can be charted
+            record_poll(self.db, video_id, user_id, metrics)
+            
             # Get user notification preferences
-            user = self.db.users.find_one({"_id": user_id})
+            user = self.db.users.find_one({"_id": ObjectId(user_id) if ObjectId.is_valid(user_id) else user_id})
             if not user or not user.get("notification_preferences"):
                 logger.warning(f"User {user_id} not found or has no notification preferences")
                 return
@@ -63,14 +74,8 @@ class YouTubeMonitor:
             # Get notification preferences
             prefs = user.get("notification_preferences", {})
             
-            # Get video metrics from YouTube API
-            metrics = self._get_video_metrics(video_id)
-            if not metrics:
-                logger.warning(f"Could not get metrics for video {video_id}")
-                return
-            
-            # Get previous metrics from database
-            video_record = self.db.videos.find_one({"youtube_id": video_id})
+            # Get previous metrics from database; videos published from the app store the ID as youtube_video_id
+            video_record = self.db.videos.find_one({"$or": [{"youtube_id": video_id}, {"youtube_video_id": video_id}]})
             if not video_record:
                 logger.warning(f"Video {video_id} not found in database")
                 # Create a new record if it doesn't exist
@@ -89,7 +94,7 @@ class YouTubeMonitor:
             
             # Update metrics in database
             self.db.videos.update_one(
-                {"youtube_id": video_id},
+                {"_id": video_record["_id"]},
                 {
                     "$set": {
                         "metrics": metrics,
@@ -133,7 +138,7 @@ class YouTubeMonitor:
                 "title": snippet.get("title", "Unknown"),
                 "views": int(statistics.get("viewCount", 0)),
                 "likes": int(statistics.get("likeCount", 0)),
-                "subscribers": 0,  # Need channel stats for this
+                "subscribers": None,  # Channel-wide, filled in from the channel statistics below
                 "shares": 0  # YouTube API doesn't provide share count directly
             }
             
@@ -165,6 +170,7 @@ class YouTubeMonitor:
         previous_metrics = video_record.get("metrics", {})
         milestones_reached = video_record.get("milestones_reached", {})
         video_title = current_metrics.get("title", "your video")
+        youtube_id = video_record.get("youtube_id") or video_record.get("youtube_video_id")
         
         # Get thresholds from preferences
         thresholds = preferences.get("thresholds", {
@@ -181,8 +187,11 @@ class YouTubeMonitor:
             if not preferences.get(metric, True):
                 continue
             
-            current_value = current_metrics.get(metric, 0)
-            previous_value = previous_metrics.get(metric, 0)
+            current_value = current_metrics.get(metric)
+            # Not known for this poll, e.g. the channel statistics could not be fetched
+            if current_value is None:
+                continue
+            previous_value = previous_metrics.get(metric) or 0
             threshold = thresholds.get(metric, 100)
             
             # Calculate the milestone levels (multiples of threshold)
@@ -202,7 +211,7 @@ class YouTubeMonitor:
                         metric, 
                         milestone_value, 
                         video_title,
-                        video_record.get("youtube_id")
+                        youtube_id
                     )
                     
                     # Record that we've reached this milestone
@@ -210,14 +219,14 @@ class YouTubeMonitor:
                     
                     # Update the milestones_reached in the database
                     self.db.videos.update_one(
-                        {"youtube_id": video_record.get("youtube_id")},
+                        {"_id": video_record["_id"]},
                         {"$set": {"milestones_reached": milestones_reached}}
                     )
                     
                     # Create a notification record
                     self.db.notifications.insert_one({
                         "user_id": video_record.get("user_id"),
-                        "video_id": video_record.get("youtube_id"),
+                        "video_id": youtube_id,
                         "type": metric,
                         "milestone": milestone_value,
                         "message": self._get_milestone_message(metric, milestone_value, video_title),
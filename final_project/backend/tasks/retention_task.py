@@ -0,0 +1,301 @@
+"""
+Retention for rankings and notifications.
+
+Every ranking lookup stores a new ranking snapshot and the monitor keeps
+adding notifications, so both collections grow with traffic. Once a day
+this task bounds them:
+
+- ranking snapshots older than RANKINGS_COMPACT_AFTER_DAYS are folded
+  into `rankings_daily`, one document per keyword set, keyword and day,
+  then stamped with compacted_at. The TTL index on compacted_at deletes
+  them RANKINGS_COMPACTED_TTL_HOURS later. The newest snapshot of each
+  keyword set is never compacted, so summaries and history always have a
+  latest rank.
+- notifications are deleted by the TTL index on created_at after
+  NOTIFICATIONS_RETENTION_DAYS. Older notifications that only have
+  sent_at get created_at copied from it, so the TTL index and the
+  notification pages (sorted on created_at) cover them too.
+
+With RETENTION_ARCHIVE set, rows are exported as gzipped JSON lines to
+the storage backend under archive/ before anything deletes them. The
+TTL indexes are defined in config/indexes.py.
+
+    python -m tasks.retention_task --once   # run one pass and exit
+"""
+
+import gzip
+import json
+import logging
+import sys
+import os
+import threading
+import time
+import schedule
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.db import get_db
+from config.retention import (
+    RANKINGS_COMPACT_AFTER_DAYS, NOTIFICATIONS_RETENTION_DAYS,
+    RETENTION_ARCHIVE, RETENTION_INTERVAL_HOURS
+)
+from services.ranking_snapshots import ROWS_STAGES
+from services.single_flight import SingleFlight
+from services.storage import get_storage
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Notifications are archived this long before the TTL index removes them;
+# two intervals, so a pass that runs late still gets to them first
+NOTIFICATIONS_ARCHIVE_LEAD = timedelta(hours=RETENTION_INTERVAL_HOURS) * 2
+
+# Global variables
+stop_thread = False
+scheduler_thread = None
+
+
+def archive_rows(kind, rows):
+    """Export rows as gzipped JSON lines; returns the storage key, or None if there was nothing to write"""
+    if not RETENTION_ARCHIVE or not rows:
+        return None
+    key = f"archive/{kind}/{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}.jsonl.gz"
+    with get_storage().open_writer(key) as f:
+        with gzip.GzipFile(fileobj=f, mode="wb") as gz:
+            for row in rows:
+                gz.write((json.dumps(row, default=str) + "\n").encode("utf-8"))
+    return key
+
+
+def _compactable_ids(db, cutoff):
+    """IDs of uncompacted snapshots older than cutoff, except the newest snapshot of each keyword set"""
+    groups = db.ranking_snapshots.aggregate([
+        {"$match": {"created_at": {"$lt": cutoff}, "compacted_at": {"$exists": False}}},
+        {"$sort": {"created_at": -1}},
+        {"$group": {
+            "_id": "$keyword_id",
+            "ids": {"$push": "$_id"},
+            "newest_at": {"$first": "$created_at"}
+        }},
+        # The newest old snapshot stays unless a newer one of the same keyword set exists
+        {"$lookup": {
+            "from": "ranking_snapshots",
+            "let": {"keyword_id": "$_id", "newest_at": "$newest_at"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$keyword_id", "$$keyword_id"]},
+                    {"$gt": ["$created_at", "$$newest_at"]}
+                ]}}},
+                {"$limit": 1},
+                {"$project": {"_id": 1}}
+            ],
+            "as": "newer"
+        }},
+        {"$project": {"ids": {"$cond": [
+            {"$gt": [{"$size": "$newer"}, 0]},
+            "$ids",
+            {"$slice": ["$ids", 1, {"$max": [{"$size": "$ids"}, 1]}]}
+        ]}}}
+    ], allowDiskUse=True)
+    for group in groups:
+        yield from group["ids"]
+
+
+def _compact_batch(db, ids, now):
+    snapshots = list(db.ranking_snapshots.find({"_id": {"$in": ids}}))
+    archive_rows("rankings", snapshots)
+
+    # Sums and counts rather than averages, so later batches of the same day merge exactly
+    db.ranking_snapshots.aggregate([
+        {"$match": {"_id": {"$in": ids}}},
+        *ROWS_STAGES,
+        {"$group": {
+            "_id": {
+                "keyword_id": "$keyword_id",
+                "keyword": "$keyword",
+                "day": {"$dateTrunc": {"date": "$created_at", "unit": "day"}}
+            },
+            "video_id": {"$first": "$video_id"},
+            "user_id": {"$first": "$user_id"},
+            "samples": {"$sum": 1},
+            "rank_sum": {"$sum": "$rank"},
+            "rank_min": {"$min": "$rank"},
+            "rank_max": {"$max": "$rank"},
+            "search_volume_sum": {"$sum": "$search_volume"},
+            "competition_sum": {"$sum": "$competition"}
+        }},
+        {"$project": {
+            "_id": 0,
+            "keyword_id": "$_id.keyword_id",
+            "keyword": "$_id.keyword",
+            "day": "$_id.day",
+            "video_id": 1,
+            "user_id": 1,
+            "samples": 1,
+            "rank_sum": 1,
+            "rank_min": 1,
+            "rank_max": 1,
+            "search_volume_sum": 1,
+            "competition_sum": 1
+        }},
+        {"$merge": {
+            "into": "rankings_daily",
+            "on": ["keyword_id", "keyword", "day"],
+            "whenMatched": [{"$set": {
+                "samples": {"$add": ["$samples", "$$new.samples"]},
+                "rank_sum": {"$add": ["$rank_sum", "$$new.rank_sum"]},
+                "rank_min": {"$min": ["$rank_min", "$$new.rank_min"]},
+                "rank_max": {"$max": ["$rank_max", "$$new.rank_max"]},
+                "search_volume_sum": {"$add": ["$search_volume_sum", "$$new.search_volume_sum"]},
+                "competition_sum": {"$add": ["$competition_sum", "$$new.competition_sum"]}
+            }}],
+            "whenNotMatched": "insert"
+        }}
+    ])
+
+    # A pass interrupted between the merge and this update counts the batch twice in rankings_daily
+    db.ranking_snapshots.update_many({"_id": {"$in": ids}}, {"$set": {"compacted_at": now}})
+    return len(snapshots)
+
+
+def compact_rankings(db):
+    """Fold old ranking snapshots into rankings_daily; returns the number of snapshots compacted"""
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=RANKINGS_COMPACT_AFTER_DAYS)
+    compacted = 0
+    batch = []
+    for snapshot_id in _compactable_ids(db, cutoff):
+        batch.append(snapshot_id)
+        if len(batch) == BATCH_SIZE:
+            compacted += _compact_batch(db, batch, now)
+            batch = []
+    if batch:
+        compacted += _compact_batch(db, batch, now)
+    return compacted
+
+
+def backfill_notification_times(db):
+    """Set created_at on notifications stored with only sent_at; returns the number updated"""
+    updated = 0
+    batch = []
+    for notification in db.notifications.find({"created_at": {"$exists": False}}, {"sent_at": 1}):
+        # Notifications with neither field fall back to the time in their _id
+        created_at = notification.get("sent_at") or notification["_id"].generation_time.replace(tzinfo=None)
+        batch.append(UpdateOne({"_id": notification["_id"]}, {"$set": {"created_at": created_at}}))
+        if len(batch) == BATCH_SIZE:
+            updated += db.notifications.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += db.notifications.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+def archive_notifications(db):
+    """Export notifications that will expire before the next pass; returns the number exported"""
+    if not RETENTION_ARCHIVE:
+        return 0
+    state = db.retention_state.find_one({"_id": "notifications"}) or {}
+    until = datetime.utcnow() - timedelta(days=NOTIFICATIONS_RETENTION_DAYS) + NOTIFICATIONS_ARCHIVE_LEAD
+    query = {"created_at": {"$lt": until}}
+    if state.get("archived_until"):
+        query["created_at"]["$gte"] = state["archived_until"]
+
+    rows = list(db.notifications.find(query))
+    archive_rows("notifications", rows)
+    db.retention_state.update_one(
+        {"_id": "notifications"},
+        {"$set": {"archived_until": until, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    return len(rows)
+
+
+def run_retention(db=None):
+    """Run one retention pass; concurrent passes from other processes are joined, not repeated"""
+    db = db if db is not None else get_db()
+
+    def run():
+        return {
+            "rankings_compacted": compact_rankings(db),
+            "notifications_backfilled": backfill_notification_times(db),
+            "notifications_archived": archive_notifications(db)
+        }
+
+    try:
+        result = SingleFlight(db).run("retention", "all", {}, run)
+        logger.info(
+            f"Retention pass compacted {result['rankings_compacted']} ranking snapshots, "
+            f"backfilled created_at on {result['notifications_backfilled']} notifications "
+            f"and archived {result['notifications_archived']} notifications"
+        )
+        return result
+    except Exception as e:
+        logger.error(f"Error in retention pass: {e}")
+        return None
+
+
+def run_scheduler():
+    """Run the retention pass on a schedule in a separate thread"""
+    global stop_thread
+
+    logger.info("Starting retention scheduler")
+    scheduler = schedule.Scheduler()
+    scheduler.every(RETENTION_INTERVAL_HOURS).hours.do(run_retention)
+
+    # Run the pass immediately on startup
+    run_retention()
+
+    while not stop_thread:
+        scheduler.run_pending()
+        time.sleep(60)  # Check every minute
+
+    logger.info("Retention scheduler stopped")
+
+
+def start_retention_scheduler():
+    """Start the retention scheduler in a background thread"""
+    global scheduler_thread, stop_thread
+
+    stop_thread = False
+    scheduler_thread = threading.Thread(target=run_scheduler)
+    scheduler_thread.daemon = True
+    scheduler_thread.start()
+
+    logger.info("Retention scheduler thread started")
+    return scheduler_thread
+
+
+def stop_retention_scheduler():
+    """Stop the retention scheduler thread"""
+    global scheduler_thread, stop_thread
+
+    if scheduler_thread and scheduler_thread.is_alive():
+        stop_thread = True
+        scheduler_thread.join(timeout=5)
+        logger.info("Retention scheduler thread stopped")
+
+
+def main(argv):
+    from config.db import initialize_db
+
+    db = initialize_db()
+    if db is None:
+        return 1
+    if "--once" in argv:
+        return 0 if run_retention(db) is not None else 1
+
+    start_retention_scheduler()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop_retention_scheduler()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -34,17 +34,21 @@ def check_all_videos():
         if not monitor:
             monitor = YouTubeMonitor(db)
         
-        # Get all videos with YouTube IDs
-        videos = db.videos.find({"youtube_id": {"$exists": True}})
+        # Get all videos with YouTube IDs; videos published from the app store theirs as youtube_video_id
+        videos = db.videos.find(
+            {"$or": [{"youtube_id": {"$exists": True}}, {"youtube_video_id": {"$exists": True}}]},
+            {"youtube_id": 1, "youtube_video_id": 1, "user_id": 1}
+        )
         
         video_count = 0
         for video in videos:
+            youtube_id = video.get("youtube_id") or video.get("youtube_video_id")
             # Skip if no YouTube ID or user ID
-            if not video.get("youtube_id") or not video.get("user_id"):
+            if not youtube_id or not video.get("user_id"):
                 continue
             
             # Check metrics for this video
-            monitor.check_video_metrics(video["youtube_id"], video["user_id"])
+            monitor.check_video_metrics(youtube_id, video["user_id"])
             video_count += 1
         
         logger.info(f"Completed checking metrics for {video_count} videos")
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+# Tests import modules the way the app does, relative to the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db():
+    """An in-memory stand-in for the MongoDB database"""
+    return mongomock.MongoClient().db
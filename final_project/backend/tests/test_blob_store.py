@@ -0,0 +1,113 @@
+import hashlib
+import io
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import blob_store as blob_store_module
+from services.blob_store import BlobStore
+from services.storage import LocalStorage, StorageError
+
+DATA = b"video bytes" * 1000
+SHA256 = hashlib.sha256(DATA).hexdigest()
+OWNER = "user-1"
+
+
+@pytest.fixture
+def store(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store_module, "PARTIAL_DIR", str(tmp_path / "partial"))
+    monkeypatch.setattr(blob_store_module, "BLOB_WAIT_INTERVAL", 0.01)
+    store = BlobStore(db, storage=LocalStorage(root=str(tmp_path / "media")))
+    # ffprobe is not needed to test storage
+    store.probe = lambda blob: None
+    return store
+
+
+def _temp_file(tmp_path, name="upload.part"):
+    path = tmp_path / "partial" / name
+    path.write_bytes(DATA)
+    return str(path)
+
+
+def test_identical_uploads_share_one_file(store, db):
+    first = store.store_stream(io.BytesIO(DATA), OWNER)
+    second = store.store_stream(io.BytesIO(DATA), OWNER)
+
+    assert first["_id"] == second["_id"] == SHA256
+    assert "writing_since" not in first
+    assert db.blobs.find_one({"_id": SHA256})["ref_count"] == 2
+    assert store.storage.exists(store.blob_key(SHA256))
+
+
+def test_file_is_deleted_with_the_last_reference(store, db):
+    store.store_stream(io.BytesIO(DATA), OWNER)
+    store.acquire(SHA256, OWNER)
+
+    store.release(SHA256)
+    assert store.storage.exists(store.blob_key(SHA256))
+
+    store.release(SHA256)
+    assert db.blobs.find_one({"_id": SHA256}) is None
+    assert not store.storage.exists(store.blob_key(SHA256))
+
+    # Releasing again does nothing
+    store.release(SHA256)
+
+
+def test_only_uploaders_can_acquire_a_blob_by_hash(store, db):
+    store.store_stream(io.BytesIO(DATA), OWNER)
+
+    assert store.acquire(SHA256, "user-2") is None
+
+    # Uploading the same bytes makes the second user an owner too
+    store.store_stream(io.BytesIO(DATA), "user-2")
+    assert store.acquire(SHA256, "user-2")["ref_count"] == 3
+    assert db.blobs.find_one({"_id": SHA256})["owners"] == [OWNER, "user-2"]
+
+
+def test_blob_being_written_cannot_be_acquired(store, db):
+    db.blobs.insert_one({"_id": SHA256, "ref_count": 1, "owners": [OWNER], "writing_since": datetime.now()})
+    assert store.acquire(SHA256, OWNER) is None
+
+
+def test_commit_waits_for_a_release_in_progress(store, db, tmp_path):
+    store.store_stream(io.BytesIO(DATA), OWNER)
+    # A release has marked the blob and is deleting its file
+    db.blobs.update_one({"_id": SHA256}, {"$set": {"ref_count": 0, "deleting_since": datetime.now()}})
+
+    def finish_release():
+        time.sleep(0.1)
+        store.storage.delete(store.blob_key(SHA256))
+        db.blobs.delete_one({"_id": SHA256})
+
+    releaser = threading.Thread(target=finish_release)
+    releaser.start()
+    blob = store.commit_file(_temp_file(tmp_path), SHA256, len(DATA), OWNER)
+    releaser.join()
+
+    # The upload wrote the file again after the release removed it
+    assert blob["ref_count"] == 1
+    assert store.storage.exists(store.blob_key(SHA256))
+
+
+def test_commit_takes_over_an_abandoned_write(store, db, tmp_path):
+    stale = datetime.now() - timedelta(seconds=blob_store_module.BLOB_CLAIM_TIMEOUT + 1)
+    db.blobs.insert_one({"_id": SHA256, "key": store.blob_key(SHA256), "ref_count": 1, "writing_since": stale})
+
+    blob = store.commit_file(_temp_file(tmp_path), SHA256, len(DATA), OWNER)
+
+    assert blob["ref_count"] == 1
+    assert "writing_since" not in blob
+    assert store.storage.exists(store.blob_key(SHA256))
+
+
+def test_commit_gives_up_on_a_blob_that_stays_busy(store, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store_module, "BLOB_CLAIM_TIMEOUT", 0.05)
+    db.blobs.insert_one({"_id": SHA256, "ref_count": 1, "writing_since": datetime.now() + timedelta(seconds=60)})
+    temp_path = _temp_file(tmp_path)
+
+    with pytest.raises(StorageError):
+        store.commit_file(temp_path, SHA256, len(DATA), OWNER)
+    assert (tmp_path / "partial" / "upload.part").exists()
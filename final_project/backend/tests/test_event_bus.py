@@ -0,0 +1,68 @@
+import threading
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+from services import event_bus as event_bus_module
+from services.event_bus import MongoEventLog
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.alive = True
+
+    def __iter__(self):
+        docs, self.docs, self.alive = self.docs, [], False
+        return iter(docs)
+
+    def close(self):
+        pass
+
+
+class FakeEventsDb:
+    """A database that is unreachable for the first few calls"""
+
+    def __init__(self, failures, docs):
+        self.failures = failures
+        self.docs = docs
+
+    def __getitem__(self, name):
+        return self
+
+    def list_collection_names(self):
+        if self.failures:
+            self.failures -= 1
+            raise ServerSelectionTimeoutError("connection refused")
+        return [MongoEventLog.COLLECTION]
+
+    def find_one(self, sort=None):
+        return None
+
+    def find(self, query, **kwargs):
+        docs, self.docs = self.docs, []
+        return FakeCursor(docs)
+
+
+class RecordingBus:
+    def __init__(self, stopping):
+        self.stopping = stopping
+        self.events = []
+
+    def publish(self, event, *topics):
+        self.events.append((event, topics))
+        self.stopping.set()
+
+
+def test_relay_retries_until_mongo_is_reachable(monkeypatch):
+    monkeypatch.setattr(event_bus_module, "RELAY_RETRY_INITIAL", 0.01)
+    db = FakeEventsDb(failures=2, docs=[{"_id": 1, "event": {"state": "done"}, "topics": ["job:1"]}])
+    stopping = threading.Event()
+    bus = RecordingBus(stopping)
+
+    thread = threading.Thread(target=MongoEventLog(db).relay, args=(bus, stopping))
+    thread.start()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert db.failures == 0
+    assert bus.events == [({"state": "done"}, ("job:1",))]
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import job_queue as job_queue_module
+from services.fair_scheduler import INTERACTIVE, BULK
+from services.job_queue import JobQueue, QUEUED
+
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    monkeypatch.setattr(job_queue_module, "get_db", lambda: db)
+    return JobQueue(num_workers=0, worker_id="test")
+
+
+def _queued(db, user_id, priority, created_at):
+    return db.jobs.insert_one({
+        "type": "extract",
+        "user_id": user_id,
+        "priority": priority,
+        "state": QUEUED,
+        "created_at": created_at
+    }).inserted_id
+
+
+def test_bulk_backlog_does_not_hide_new_interactive_jobs(db, queue, monkeypatch):
+    monkeypatch.setattr(job_queue_module, "JOB_POLL_BATCH", 3)
+    start = datetime(2024, 1, 1)
+    for i in range(10):
+        _queued(db, "backfiller", BULK, start + timedelta(seconds=i))
+    interactive = _queued(db, "someone", INTERACTIVE, start + timedelta(minutes=1))
+
+    queue.poll()
+
+    assert interactive in queue.known
+    assert queue.scheduler.get(timeout=0).job_id == interactive
+
+
+def test_poll_offers_jobs_it_does_not_already_hold(db, queue, monkeypatch):
+    monkeypatch.setattr(job_queue_module, "JOB_POLL_BATCH", 3)
+    start = datetime(2024, 1, 1)
+    ids = [_queued(db, "backfiller", BULK, start + timedelta(seconds=i)) for i in range(5)]
+
+    queue.poll()
+    queue.poll()
+
+    assert queue.known == set(ids)
+
+
+def test_claim_respects_the_user_cap_across_nodes(db, monkeypatch):
+    monkeypatch.setattr(job_queue_module, "get_db", lambda: db)
+    monkeypatch.setattr(job_queue_module, "JOB_USER_CONCURRENCY", 1)
+    first, second = (JobQueue(num_workers=0, worker_id=name) for name in ("node-a", "node-b"))
+    start = datetime(2024, 1, 1)
+    a = _queued(db, "user", INTERACTIVE, start)
+    b = _queued(db, "user", INTERACTIVE, start + timedelta(seconds=1))
+    other = _queued(db, "other", INTERACTIVE, start + timedelta(seconds=2))
+
+    assert first._claim(db, a, "user")["worker_id"] == "node-a"
+    assert second._claim(db, b, "user") is None
+    assert db.jobs.find_one({"_id": b})["state"] == QUEUED
+    assert second._claim(db, other, "other")["worker_id"] == "node-b"
+
+
+def test_claim_undoes_a_race_past_the_cap(db, monkeypatch):
+    monkeypatch.setattr(job_queue_module, "JOB_USER_CONCURRENCY", 1)
+    queue = JobQueue(num_workers=0, worker_id="node-a")
+    start = datetime(2024, 1, 1)
+    # Another node claimed this user's job after the count was taken
+    db.jobs.insert_one({"user_id": "user", "state": job_queue_module.RUNNING, "started_at": start})
+    original_count = db.jobs.count_documents
+    monkeypatch.setattr(db.jobs, "count_documents", lambda *args, **kwargs: 0)
+    job_id = _queued(db, "user", INTERACTIVE, start)
+
+    assert queue._claim(db, job_id, "user") is None
+    job = db.jobs.find_one({"_id": job_id})
+    assert job["state"] == QUEUED
+    assert job["attempts"] == 0
+    assert "lease_token" not in job
+    assert original_count({"user_id": "user", "state": job_queue_module.RUNNING}) == 1
+
+
+def test_queue_stats_read_the_jobs_collection(db):
+    start = datetime(2024, 1, 1)
+    _queued(db, "a", BULK, start)
+    _queued(db, "b", BULK, start)
+    db.jobs.insert_one({
+        "user_id": "c", "priority": INTERACTIVE, "state": job_queue_module.RUNNING,
+        "created_at": start, "started_at": start + timedelta(seconds=4)
+    })
+
+    stats = job_queue_module.queue_stats(db)
+
+    assert stats[BULK]["queued"] == 2
+    assert stats[BULK]["queued_users"] == 2
+    assert stats[INTERACTIVE]["running"] == 1
+    assert stats[INTERACTIVE]["wait_seconds"]["max"] == 4.0
@@ -0,0 +1,22 @@
+from utils import video_processor
+
+
+def test_searches_keywords_as_written_and_caches_by_normalized_form(monkeypatch):
+    searched = []
+    stored = {}
+
+    def search_keywords(keywords, api_key):
+        searched.extend(keywords)
+        return {keyword: [] for keyword in keywords}
+
+    monkeypatch.setenv("YOUTUBE_API_KEY", "test-key")
+    monkeypatch.setattr(video_processor, "cached_searches", lambda keys: {})
+    monkeypatch.setattr(video_processor, "store_searches", stored.update)
+    monkeypatch.setattr(video_processor, "search_keywords", search_keywords)
+
+    rankings = video_processor.get_keyword_rankings(["Marketing  Videos", "marketing videos"])
+
+    # One search per normalized keyword, with the first spelling
+    assert searched == ["Marketing  Videos"]
+    assert list(stored) == [video_processor.normalize_keyword("marketing videos")]
+    assert [ranking["keyword"] for ranking in rankings] == ["Marketing  Videos", "marketing videos"]
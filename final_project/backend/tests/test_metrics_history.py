@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from services.metrics_history import record_poll
+
+
+def test_poll_without_subscribers_leaves_them_out(db):
+    ts = datetime(2024, 1, 1, 12, 30)
+    record_poll(db, "yt1", "user1", {"views": 10, "likes": 2, "subscribers": 50}, ts=ts)
+    record_poll(db, "yt1", "user1", {"views": 15, "likes": 3, "subscribers": None}, ts=ts.replace(minute=45))
+
+    raw = list(db.video_metrics.find({}, {"_id": 0, "subscribers": 1}).sort("ts", 1))
+    assert raw == [{"subscribers": 50}, {}]
+
+    hourly = db.video_metrics_hourly.find_one({"youtube_id": "yt1", "bucket": datetime(2024, 1, 1, 12)})
+    assert hourly["views"] == 15
+    assert hourly["first_views"] == 10
+    # An unknown count does not pull the bucket down to 0
+    assert hourly["subscribers"] == 50
+    assert hourly["first_subscribers"] == 50
+    assert hourly["samples"] == 2
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import services.seo_pipeline as seo_pipeline
+
+
+def _keyword_doc(db):
+    video_id = db.videos.insert_one({
+        "user_id": "user-1",
+        "title": "Video",
+        "filename": "video.mp4",
+        "created_at": datetime.now()
+    }).inserted_id
+    keyword_doc = {"video_id": str(video_id), "user_id": "user-1", "keywords": ["marketing", "video"]}
+    keyword_doc["_id"] = db.keywords.insert_one(keyword_doc).inserted_id
+    db.videos.update_one({"_id": video_id}, {"$set": {"keywords_id": str(keyword_doc["_id"])}})
+    return keyword_doc
+
+
+def _fake_rankings(monkeypatch):
+    calls = []
+
+    def get_keyword_rankings(keywords):
+        calls.append(keywords)
+        return [
+            {"keyword": keyword, "rank": float(len(calls)), "search_volume": 100, "competition": 0.5}
+            for keyword in keywords
+        ]
+
+    monkeypatch.setattr(seo_pipeline, "get_keyword_rankings", get_keyword_rankings)
+    return calls
+
+
+def test_cached_rankings_reuse_the_stored_snapshot(db, monkeypatch):
+    calls = _fake_rankings(monkeypatch)
+    keyword_doc = _keyword_doc(db)
+
+    first = seo_pipeline._rank_keywords(db, keyword_doc, "user-1")
+    second = seo_pipeline._rank_keywords(db, keyword_doc, "user-1")
+
+    assert len(calls) == 1
+    assert db.ranking_snapshots.count_documents({}) == 1
+    assert [ranking["_id"] for ranking in second["rankings"]] == [ranking["_id"] for ranking in first["rankings"]]
+
+
+def test_expired_rankings_store_a_new_snapshot(db, monkeypatch):
+    calls = _fake_rankings(monkeypatch)
+    keyword_doc = _keyword_doc(db)
+
+    seo_pipeline._rank_keywords(db, keyword_doc, "user-1")
+    expired = datetime.now() - timedelta(seconds=seo_pipeline.RANKINGS_MAX_AGE + 60)
+    db.artifacts.update_many({"stage": "rankings"}, {"$set": {"created_at": expired}})
+    db.ranking_snapshots.update_many({}, {"$set": {"created_at": expired}})
+
+    result = seo_pipeline._rank_keywords(db, keyword_doc, "user-1")
+
+    assert len(calls) == 2
+    assert db.ranking_snapshots.count_documents({}) == 2
+    assert [ranking["rank"] for ranking in result["rankings"]] == [2.0, 2.0]
+    latest = db.ranking_snapshots.find_one({}, sort=[("created_at", -1)])
+    assert latest["ranks"] == [2.0, 2.0]
+    summary = db.video_summaries.find_one({"_id": ObjectId(keyword_doc["video_id"])})
+    assert [ranking["rank"] for ranking in summary["rankings"]] == [2.0, 2.0]
+
+
+def test_forced_refresh_stores_a_new_snapshot_within_max_age(db, monkeypatch):
+    calls = _fake_rankings(monkeypatch)
+    keyword_doc = _keyword_doc(db)
+
+    seo_pipeline._rank_keywords(db, keyword_doc, "user-1")
+    result = seo_pipeline._rank_keywords(db, keyword_doc, "user-1", force=True)
+
+    assert len(calls) == 2
+    assert db.ranking_snapshots.count_documents({}) == 2
+    assert [ranking["rank"] for ranking in result["rankings"]] == [2.0, 2.0]
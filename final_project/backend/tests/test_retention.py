@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from tasks.retention_task import backfill_notification_times
+from utils.pagination import KEYSET_SORT, page_of
+
+
+def test_notifications_with_only_sent_at_get_created_at(db):
+    sent_at = datetime(2023, 5, 1, 12, 0)
+    old = db.notifications.insert_one({"user_id": "u", "metric_type": "views", "sent_at": sent_at}).inserted_id
+    bare = db.notifications.insert_one({"user_id": "u", "type": "likes"}).inserted_id
+    db.notifications.insert_one({"user_id": "u", "type": "likes", "created_at": datetime(2024, 1, 1)})
+
+    assert backfill_notification_times(db) == 2
+    assert db.notifications.find_one({"_id": old})["created_at"] == sent_at
+    assert db.notifications.find_one({"_id": bare})["created_at"] == ObjectId(bare).generation_time.replace(tzinfo=None)
+
+    # A page can now end on any notification
+    items, cursor = page_of(list(db.notifications.find({"user_id": "u"}).sort(KEYSET_SORT)), 2)
+    assert cursor is not None
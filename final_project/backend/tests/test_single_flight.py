@@ -0,0 +1,38 @@
+import threading
+import time
+
+from services import single_flight as single_flight_module
+from services.single_flight import SingleFlight
+
+
+def test_waiter_joins_the_run_in_flight(db, monkeypatch):
+    monkeypatch.setattr(single_flight_module, "POLL_INTERVAL", 0.01)
+    started = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "result"
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(SingleFlight(db).run("op", "v1", {}, slow)))
+    owner.start()
+    started.wait()
+    results.append(SingleFlight(db).run("op", "v1", {}, slow))
+    owner.join()
+
+    assert results == ["result", "result"]
+    assert len(calls) == 1
+
+
+def test_call_after_the_result_window_runs_again(db, monkeypatch):
+    monkeypatch.setattr(single_flight_module, "SINGLE_FLIGHT_RESULT_TTL", 0)
+    results = iter(["first", "second"])
+    flight = SingleFlight(db)
+
+    assert flight.run("op", "v1", {}, lambda: next(results)) == "first"
+    # Stored times have millisecond precision
+    time.sleep(0.01)
+    assert flight.run("op", "v1", {}, lambda: next(results)) == "second"
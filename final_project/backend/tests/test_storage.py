@@ -0,0 +1,140 @@
+import io
+import time
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from services import storage as storage_module
+from services.storage import (
+    LocalStorage, S3Storage, StorageError, StorageReader, sign_media_key, verify_media_signature, MULTIPART_CHUNK_SIZE
+)
+
+BUCKET = "test-media"
+
+
+@pytest.fixture
+def local_storage(tmp_path):
+    return LocalStorage(root=str(tmp_path / "media"))
+
+
+@pytest.fixture
+def s3_storage(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("S3_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("S3_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        yield S3Storage(bucket=BUCKET, endpoint_url=None, region="us-east-1")
+
+
+@pytest.fixture(params=["local", "s3"])
+def storage(request):
+    return request.getfixturevalue(f"{request.param}_storage")
+
+
+def _read(storage, key):
+    with storage.local_path(key) as path:
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def test_put_file_moves_the_file_in(storage, tmp_path):
+    source = tmp_path / "upload.part"
+    source.write_bytes(b"video bytes")
+
+    storage.put_file("blobs/ab/cd/abcd", str(source))
+
+    assert not source.exists()
+    assert storage.exists("blobs/ab/cd/abcd")
+    assert storage.size("blobs/ab/cd/abcd") == len(b"video bytes")
+    assert _read(storage, "blobs/ab/cd/abcd") == b"video bytes"
+
+
+def test_open_writer_streams_several_parts(storage):
+    # More than one multipart chunk, so S3 sees a multipart upload with a short last part
+    data = bytes(range(256)) * ((MULTIPART_CHUNK_SIZE + 1024 * 1024) // 256)
+
+    with storage.open_writer("archive/large.bin") as f:
+        for start in range(0, len(data), 1024 * 1024):
+            f.write(data[start:start + 1024 * 1024])
+
+    assert storage.size("archive/large.bin") == len(data)
+    assert _read(storage, "archive/large.bin") == data
+
+
+def test_open_writer_leaves_nothing_behind_on_error(storage):
+    with pytest.raises(RuntimeError):
+        with storage.open_writer("archive/broken.bin") as f:
+            f.write(b"partial")
+            raise RuntimeError("writer failed")
+
+    assert not storage.exists("archive/broken.bin")
+
+
+def test_read_range_returns_only_the_requested_bytes(storage):
+    data = bytes(range(256)) * 16
+    with storage.open_writer("blobs/range") as f:
+        f.write(data)
+
+    assert b"".join(storage.read_range("blobs/range", 100, 199)) == data[100:200]
+    assert b"".join(storage.read_range("blobs/range", 4000)) == data[4000:]
+
+
+def test_storage_reader_seeks_and_reads_in_ranges(storage):
+    data = bytes(range(256)) * 16
+    with storage.open_writer("blobs/reader") as f:
+        f.write(data)
+    reader = StorageReader(storage, "blobs/reader")
+
+    assert reader.seek(0, io.SEEK_END) == len(data)
+    reader.seek(1000)
+    assert reader.read(24) == data[1000:1024]
+    reader.seek(len(data) - 10)
+    assert reader.read(100) == data[-10:]
+    assert reader.read(100) == b""
+
+
+def test_delete_removes_the_key(storage, tmp_path):
+    source = tmp_path / "upload.part"
+    source.write_bytes(b"bytes")
+    storage.put_file("blobs/x", str(source))
+
+    storage.delete("blobs/x")
+
+    assert not storage.exists("blobs/x")
+
+
+def test_local_storage_refuses_keys_outside_its_root(local_storage):
+    with pytest.raises(StorageError):
+        local_storage.path("../outside")
+
+
+def test_local_presigned_url_verifies(local_storage, monkeypatch):
+    monkeypatch.setattr(storage_module, "MEDIA_BASE_URL", "http://media.test/media")
+
+    url = local_storage.presigned_url("blobs/ab/cd/abcd", expires_in=60)
+
+    query = dict(pair.split("=") for pair in url.split("?")[1].split("&"))
+    assert url.startswith("http://media.test/media/blobs/ab/cd/abcd?")
+    assert verify_media_signature("blobs/ab/cd/abcd", query["expires"], query["signature"])
+
+
+def test_s3_presigned_url_names_the_key(s3_storage):
+    url = s3_storage.presigned_url("blobs/ab/cd/abcd", expires_in=60)
+
+    assert BUCKET in url and "blobs/ab/cd/abcd" in url
+
+
+def test_media_signature_rejects_tampering_and_expiry():
+    expires = int(time.time()) + 60
+    signature = sign_media_key("blobs/a", expires)
+
+    assert verify_media_signature("blobs/a", expires, signature)
+    assert not verify_media_signature("blobs/b", expires, signature)
+    assert not verify_media_signature("blobs/a", expires + 1, signature)
+    assert not verify_media_signature("blobs/a", "not-a-number", signature)
+
+    expired = int(time.time()) - 1
+    assert not verify_media_signature("blobs/a", expired, sign_media_key("blobs/a", expired))
@@ -0,0 +1,90 @@
+import io
+
+import pytest
+from bson import ObjectId
+from gridfs.errors import NoFile
+
+from services import seo_pipeline
+from services import transcript_store as transcript_store_module
+from services.transcript_store import TranscriptStore
+
+# Files of the fake GridFS bucket, shared by every TranscriptStore in a test
+FILES = {}
+# Set while the stand-in transaction runs; mongomock does not take sessions
+IN_TRANSACTION = []
+
+
+class FakeBucket:
+    """GridFSBucket stand-in that, like pymongo, fails inside a transaction"""
+
+    def __init__(self, db, bucket_name):
+        pass
+
+    def _check(self):
+        if IN_TRANSACTION:
+            raise AssertionError("GridFS does not support multi-document transactions")
+
+    def upload_from_stream(self, filename, data, metadata=None, session=None):
+        self._check()
+        file_id = ObjectId()
+        FILES[file_id] = data
+        return file_id
+
+    def open_download_stream(self, file_id, session=None):
+        return io.BytesIO(FILES[file_id])
+
+    def delete(self, file_id, session=None):
+        self._check()
+        if FILES.pop(file_id, None) is None:
+            raise NoFile(file_id)
+
+
+def write_transaction(db, fn):
+    IN_TRANSACTION.append(True)
+    try:
+        return fn(None)
+    finally:
+        IN_TRANSACTION.clear()
+
+
+@pytest.fixture(autouse=True)
+def fake_gridfs(monkeypatch):
+    FILES.clear()
+    monkeypatch.setattr(transcript_store_module, "GridFSBucket", FakeBucket)
+    monkeypatch.setattr(transcript_store_module, "TRANSCRIPT_INLINE_MAX_BYTES", 0)
+    monkeypatch.setattr(seo_pipeline, "write_transaction", write_transaction)
+    monkeypatch.setattr(seo_pipeline, "refresh_summary", lambda db, video_id, session: None)
+
+
+def _files():
+    return list(FILES)
+
+
+def test_replaced_file_is_deleted_after_commit(db):
+    # The fake bucket fails if the upload or delete runs inside the transaction
+    video_id = ObjectId()
+    db.videos.insert_one({"_id": video_id})
+
+    seo_pipeline._store_transcript(db, str(video_id), "first transcript", {})
+    first = _files()
+    seo_pipeline._store_transcript(db, str(video_id), "second transcript", {})
+
+    files = _files()
+    assert len(files) == 1 and files != first
+    assert TranscriptStore(db).load({"_id": video_id}) == "second transcript"
+
+
+def test_new_file_is_deleted_when_the_transaction_aborts(db, monkeypatch):
+    video_id = ObjectId()
+    seo_pipeline._store_transcript(db, str(video_id), "first transcript", {})
+    first = _files()
+
+    def aborted(db, fn):
+        raise RuntimeError("transaction aborted")
+
+    monkeypatch.setattr(seo_pipeline, "write_transaction", aborted)
+    with pytest.raises(RuntimeError):
+        seo_pipeline._store_transcript(db, str(video_id), "second transcript", {})
+
+    assert _files() == first
+    assert TranscriptStore(db).load({"_id": video_id}) == "first transcript"
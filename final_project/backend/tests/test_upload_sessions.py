@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from services import blob_store as blob_store_module
+from services import upload_sessions as upload_sessions_module
+from services.blob_store import BlobStore
+from services.storage import LocalStorage
+from services.upload_sessions import UploadSessionManager
+
+DATA = b"0123456789" * 300
+
+
+@pytest.fixture
+def manager(db, tmp_path, monkeypatch):
+    partial = str(tmp_path / "partial")
+    storage = LocalStorage(root=str(tmp_path / "media"))
+    monkeypatch.setattr(blob_store_module, "PARTIAL_DIR", partial)
+    monkeypatch.setattr(upload_sessions_module, "PARTIAL_DIR", partial)
+    monkeypatch.setattr(upload_sessions_module, "WRITE_BLOCK_SIZE", 1000)
+    monkeypatch.setattr(blob_store_module, "get_storage", lambda: storage)
+    monkeypatch.setattr(BlobStore, "probe", lambda self, blob: None)
+    return UploadSessionManager(db)
+
+
+async def _stream(data, piece=256):
+    for i in range(0, len(data), piece):
+        yield data[i:i + piece]
+
+
+def _upload(manager, db):
+    session = manager.create_session("user", "clip.mp4", "Clip", len(DATA))
+    offset = asyncio.run(manager.write_chunk(session, 0, len(DATA) - 1, len(DATA), _stream(DATA)))
+    assert offset == len(DATA)
+    return db.upload_sessions.find_one({"_id": session["_id"]})
+
+
+def test_chunk_is_written_in_blocks_and_committed(manager, db):
+    session = _upload(manager, db)
+
+    assert session["offset"] == len(DATA)
+    with open(session["temp_path"], "rb") as f:
+        assert f.read() == DATA
+
+
+def test_failed_finalize_can_be_retried(manager, db, monkeypatch):
+    session = _upload(manager, db)
+    insert_one = db.videos.insert_one
+
+    def failing_insert(doc):
+        raise RuntimeError("primary stepped down")
+
+    monkeypatch.setattr(db.videos, "insert_one", failing_insert)
+    with pytest.raises(RuntimeError):
+        manager.finalize(session)
+    session = db.upload_sessions.find_one({"_id": session["_id"]})
+    assert session["status"] == "active"
+
+    # The file was already moved into the blob store; the retry reuses it
+    monkeypatch.setattr(db.videos, "insert_one", insert_one)
+    video = manager.finalize(session)
+
+    assert video["blob_sha256"] == session["blob_sha256"]
+    assert db.blobs.find_one({"_id": session["blob_sha256"]})["ref_count"] == 1
+    assert db.upload_sessions.find_one({"_id": session["_id"]})["status"] == "complete"
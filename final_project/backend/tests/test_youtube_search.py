@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import httpx
+
+from utils import youtube_search
+
+
+def test_overrunning_batch_is_cancelled_and_reported_per_keyword(monkeypatch):
+    cancelled = []
+
+    async def search_many(keywords, api_key):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    monkeypatch.setattr(youtube_search, "YOUTUBE_SEARCH_TIMEOUT", 0.05)
+    monkeypatch.setattr(youtube_search, "search_many", search_many)
+
+    results = youtube_search.search_keywords(["seo", "video"], "test-key")
+
+    assert set(results) == {"seo", "video"}
+    assert all(isinstance(error, TimeoutError) for error in results.values())
+    # The cancellation reaches the search loop shortly after
+    for _ in range(100):
+        if cancelled:
+            break
+        time.sleep(0.01)
+    assert cancelled
+
+
+def test_api_key_goes_in_a_header_and_stays_out_of_logs(monkeypatch, caplog):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(403, json={"error": "quota"})
+
+    async def run():
+        monkeypatch.setattr(youtube_search, "_semaphore", asyncio.Semaphore(1))
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await youtube_search._search(client, "seo", "SECRETKEY")
+
+    error = asyncio.run(run())
+
+    assert isinstance(error, httpx.HTTPStatusError)
+    assert requests[0].headers["X-Goog-Api-Key"] == "SECRETKEY"
+    assert "SECRETKEY" not in str(requests[0].url)
+    assert "SECRETKEY" not in caplog.text
+    assert youtube_search.describe_error(error) == "HTTP 403"
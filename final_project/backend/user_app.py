@@ -2,7 +2,6 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import logging
-from pymongo import MongoClient
 from bson.objectid import ObjectId
 import os
 from dotenv import load_dotenv
@@ -14,8 +13,9 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+from config.mongo import MONGO_URI, get_client
+
 # MongoDB connection settings
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "video_seo_db")
 
 # Global variables
@@ -26,7 +26,7 @@ def initialize_db():
     """Initialize the database connection"""
     global client, db
     try:
-        client = MongoClient(MONGO_URI)
+        client = get_client()
         db = client[DB_NAME]
         logger.info(f"Connected to MongoDB: {MONGO_URI}, Database: {DB_NAME}")
         return db
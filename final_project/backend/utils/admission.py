@@ -0,0 +1,125 @@
+"""
+Admission control for expensive endpoints.
+
+Each kind of heavy work (speech recognition, keyword embedding, YouTube
+search) has a pool with a fixed number of concurrent slots and a bounded
+wait queue. Requests beyond both are rejected straight away with
+429 Too Many Requests instead of piling up until the machine swaps.
+Retry-After is estimated from the queue length and the recent average
+service time.
+
+The blocking work itself runs in the thread pool so that waiting requests
+do not hold up the event loop:
+
+    async with admission_pool("asr").slot():
+        result = await run_in_threadpool(extract_video_text, db, video)
+"""
+
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, status
+
+from utils.metrics import registry
+
+# Weight of the newest sample in the moving average of service time
+SERVICE_TIME_ALPHA = 0.2
+
+admission_in_flight = registry.gauge("admission_in_flight", "Requests currently holding an admission slot")
+admission_queued = registry.gauge("admission_queued", "Requests waiting for an admission slot")
+admission_capacity = registry.gauge("admission_capacity", "Concurrent admission slots")
+admission_queue_capacity = registry.gauge("admission_queue_capacity", "Maximum requests waiting for a slot")
+admission_service_seconds = registry.gauge("admission_service_seconds", "Moving average of time spent holding a slot")
+admission_admitted_total = registry.counter("admission_admitted_total", "Requests admitted")
+admission_rejected_total = registry.counter("admission_rejected_total", "Requests rejected with 429")
+
+
+class AdmissionPool:
+    """
+    Concurrency slots plus a bounded queue for one kind of work
+
+    Args:
+        name (str): Pool name, used as the metrics label
+        max_concurrent (int): Requests allowed to run at once
+        max_queue (int): Requests allowed to wait for a slot
+        initial_service_seconds (float): Service time assumed before any request finished
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, initial_service_seconds=10.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.queued = 0
+        self.service_seconds = initial_service_seconds
+        # Created on first use so it belongs to the server's event loop
+        self._semaphore = None
+
+        admission_in_flight.set_function(lambda: self.in_flight, pool=name)
+        admission_queued.set_function(lambda: self.queued, pool=name)
+        admission_service_seconds.set_function(lambda: round(self.service_seconds, 3), pool=name)
+        admission_capacity.set(max_concurrent, pool=name)
+        admission_queue_capacity.set(max_queue, pool=name)
+
+    def retry_after(self):
+        """Seconds until a slot is likely to be free for a new request"""
+        rounds = (self.queued + 1) / self.max_concurrent
+        return max(1, math.ceil(rounds * self.service_seconds))
+
+    def _reject(self):
+        admission_rejected_total.inc(pool=self.name)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Server is busy with other {self.name} requests, please retry later",
+            headers={"Retry-After": str(self.retry_after())}
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a slot for the duration of the block, or raise a 429 HTTPException"""
+        # Counters are only touched on the event loop thread, so no lock is needed
+        if self.in_flight >= self.max_concurrent and self.queued >= self.max_queue:
+            self._reject()
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        admission_admitted_total.inc(pool=self.name)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            elapsed = time.monotonic() - started
+            self.service_seconds += SERVICE_TIME_ALPHA * (elapsed - self.service_seconds)
+
+
+def _pool_from_env(name, max_concurrent, max_queue, initial_service_seconds):
+    prefix = f"ADMISSION_{name.upper()}"
+    return AdmissionPool(
+        name,
+        int(os.getenv(f"{prefix}_CONCURRENCY", max_concurrent)),
+        int(os.getenv(f"{prefix}_QUEUE", max_queue)),
+        initial_service_seconds
+    )
+
+
+_pools = {
+    "asr": _pool_from_env("asr", 1, 4, 60.0),
+    "embedding": _pool_from_env("embedding", 2, 8, 5.0),
+    "search": _pool_from_env("search", 4, 16, 5.0)
+}
+
+
+def admission_pool(name):
+    """Get the admission pool for a kind of heavy work"""
+    return _pools[name]
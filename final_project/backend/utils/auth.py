@@ -5,7 +5,7 @@ from passlib.context import CryptContext
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from config.db import get_db
+from config.db import get_async_db
 
 # Load environment variables
 load_dotenv()
@@ -20,6 +20,7 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 def verify_password(plain_password, hashed_password):
     """Verify a password against a hash"""
@@ -40,13 +41,15 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get_async_db)):
     """Get the current user from the JWT token"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -56,10 +59,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         print(f"JWT Error: {str(e)}")
         raise credentials_exception
     
-    db = get_db()
     try:
         from bson import ObjectId
-        user = db.users.find_one({"_id": ObjectId(user_id)})
+        user = await db.users.find_one({"_id": ObjectId(user_id)})
         if user is None:
             print(f"User not found for ID: {user_id}")
             raise credentials_exception
@@ -67,3 +69,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except Exception as e:
         print(f"Database error: {str(e)}")
         raise credentials_exception
+
+async def get_current_user_from_header_or_query(
+    token: str = Depends(optional_oauth2_scheme),
+    access_token: str = None,
+    db = Depends(get_async_db)
+):
+    """
+    Get the current user from the Authorization header or an access_token
+    query parameter, for clients such as <video> and EventSource that
+    cannot set headers
+    """
+    return await get_current_user(token or access_token, db)
@@ -0,0 +1,182 @@
+"""
+Shared cache of YouTube search results per keyword.
+
+Search results for a keyword are the same for every user and video, so
+each keyword is searched at most once per KEYWORD_CACHE_TTL across the
+whole deployment:
+
+- keywords are normalized first (lowercase, single spaces, each word
+  lemmatized), so "Marketing  Videos" and "marketing video" share an entry.
+  The normalized form is only the cache key; searches use a keyword as
+  written. WordNet is downloaded once at import, and without it words are
+  not lemmatized
+- an in-process LRU of KEYWORD_CACHE_MEMORY_SIZE entries answers
+  repeated keywords without a round trip
+- the `keyword_search_cache` collection shares entries between
+  processes; a TTL index on expires_at removes them (config/indexes.py)
+
+Entries hold the IDs of the result videos and the metrics derived from
+them. Failed searches are not cached. Hits and misses per tier are
+exported at /metrics.
+"""
+
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from pymongo import ReplaceOne
+
+from utils.metrics import registry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+KEYWORD_CACHE_TTL = int(os.getenv("KEYWORD_CACHE_TTL", 6 * 3600))  # seconds
+KEYWORD_CACHE_MEMORY_SIZE = int(os.getenv("KEYWORD_CACHE_MEMORY_SIZE", 1024))
+COLLECTION = "keyword_search_cache"
+
+cache_lookups = registry.counter("keyword_cache_lookups_total", "Keyword search cache lookups by tier that answered")
+cache_hit_ratio = registry.gauge("keyword_cache_hit_ratio", "Share of keyword lookups answered from either cache tier")
+
+# Download the WordNet data at import, so no request waits on it
+try:
+    import nltk
+    try:
+        nltk.data.find("corpora/wordnet")
+    except LookupError:
+        nltk.download("wordnet", quiet=True)
+except Exception as e:
+    logger.warning(f"Could not download WordNet: {e}")
+
+_lemmatizer = None
+_lemmatizer_lock = threading.Lock()
+
+
+def _lemmatize(word):
+    global _lemmatizer
+    if _lemmatizer is None:
+        with _lemmatizer_lock:
+            if _lemmatizer is None:
+                try:
+                    from nltk.stem import WordNetLemmatizer
+                    lemmatizer = WordNetLemmatizer()
+                    lemmatizer.lemmatize("videos")
+                    _lemmatizer = lemmatizer.lemmatize
+                except Exception as e:
+                    logger.warning(f"WordNet lemmatizer unavailable, keywords are not lemmatized: {e}")
+                    _lemmatizer = lambda word: word
+    return _lemmatizer(word)
+
+
+def normalize_keyword(keyword):
+    """Cache key of a keyword: lowercase, single spaces, lemmatized words"""
+    words = re.sub(r"\s+", " ", keyword.strip().lower()).split(" ")
+    return " ".join(_lemmatize(word) for word in words if word)
+
+
+def _hit_ratio():
+    samples = dict(cache_lookups.samples())
+    total = sum(samples.values())
+    misses = samples.get((("tier", "miss"),), 0)
+    return round((total - misses) / total, 4) if total else 0
+
+
+cache_hit_ratio.set_function(_hit_ratio)
+
+
+class _MemoryTier:
+    """LRU of cache entries, each dropped once its expires_at has passed"""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires_at"] <= now:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, entry):
+        with self.lock:
+            self.entries[entry["_id"]] = entry
+            self.entries.move_to_end(entry["_id"])
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+_memory = _MemoryTier(KEYWORD_CACHE_MEMORY_SIZE)
+
+
+def _mongo():
+    from config.db import get_db
+    return get_db()
+
+
+def cached_searches(keys):
+    """
+    Cache entries for normalized keywords, from memory first, then Mongo
+
+    Returns:
+        dict: normalized keyword -> entry, for the keywords that are cached
+    """
+    now = datetime.utcnow()
+    found = {}
+    for key in keys:
+        entry = _memory.get(key, now)
+        if entry:
+            found[key] = entry
+            cache_lookups.inc(tier="memory")
+
+    remaining = [key for key in keys if key not in found]
+    if remaining:
+        try:
+            db = _mongo()
+            entries = db[COLLECTION].find({"_id": {"$in": remaining}, "expires_at": {"$gt": now}}) if db is not None else []
+            for entry in entries:
+                found[entry["_id"]] = entry
+                _memory.put(entry)
+                cache_lookups.inc(tier="mongo")
+        except Exception as e:
+            # The shared tier is an optimization; without it the keywords are searched
+            logger.warning(f"Could not read the keyword search cache: {e}")
+    cache_lookups.inc(len([key for key in keys if key not in found]), tier="miss")
+    return found
+
+
+def store_searches(results):
+    """
+    Cache fresh search results
+
+    Args:
+        results (dict): normalized keyword -> {"video_ids": [...], **metrics}
+    """
+    if not results:
+        return
+    now = datetime.utcnow()
+    entries = [
+        {"_id": key, **result, "fetched_at": now, "expires_at": now + timedelta(seconds=KEYWORD_CACHE_TTL)}
+        for key, result in results.items()
+    ]
+    for entry in entries:
+        _memory.put(entry)
+
+    db = _mongo()
+    if db is None:
+        return
+    try:
+        db[COLLECTION].bulk_write(
+            [ReplaceOne({"_id": entry["_id"]}, entry, upsert=True) for entry in entries], ordered=False
+        )
+    except Exception as e:
+        logger.warning(f"Could not cache search results: {e}")
@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FFPROBE_BIN = os.getenv("FFPROBE_BIN", "ffprobe")
+PROBE_TIMEOUT = int(os.getenv("FFPROBE_TIMEOUT", 15))  # seconds
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_media(source):
+    """
+    Read container and stream headers of a media file with ffprobe.
+
+    Only headers are read, so this takes milliseconds even for large
+    files. The source may be a local path or an http(s) URL.
+
+    Args:
+        source (str): Path or URL of the media file
+
+    Returns:
+        dict: Duration, bitrate, codecs and audio presence, or None if probing failed
+    """
+    command = [
+        FFPROBE_BIN,
+        "-v", "error",
+        "-show_format",
+        "-show_streams",
+        "-of", "json",
+        source
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=PROBE_TIMEOUT, check=True)
+        data = json.loads(result.stdout or b"{}")
+    except FileNotFoundError:
+        logger.warning("ffprobe is not installed, skipping media probe")
+        return None
+    except subprocess.TimeoutExpired:
+        logger.error(f"ffprobe timed out after {PROBE_TIMEOUT}s")
+        return None
+    except (subprocess.CalledProcessError, ValueError) as e:
+        logger.error(f"ffprobe could not read media: {e}")
+        return None
+
+    fmt = data.get("format", {})
+    streams = data.get("streams", [])
+    video_stream = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio_stream = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    return {
+        "duration": _to_float(fmt.get("duration")),
+        "bit_rate": _to_int(fmt.get("bit_rate")),
+        "format_name": fmt.get("format_name"),
+        "has_video": video_stream is not None,
+        "video_codec": video_stream.get("codec_name") if video_stream else None,
+        "width": _to_int(video_stream.get("width")) if video_stream else None,
+        "height": _to_int(video_stream.get("height")) if video_stream else None,
+        "has_audio": audio_stream is not None,
+        "audio_codec": audio_stream.get("codec_name") if audio_stream else None,
+        "audio_sample_rate": _to_int(audio_stream.get("sample_rate")) if audio_stream else None,
+        "audio_channels": _to_int(audio_stream.get("channels")) if audio_stream else None
+    }
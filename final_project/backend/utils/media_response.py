@@ -0,0 +1,149 @@
+"""
+HTTP Range support for serving media files.
+
+Bytes are never loaded into Python as a whole. When the ASGI server
+supports the `http.response.zerocopysend` extension the file descriptor is
+handed to the server, which uses sendfile(). Otherwise the requested range
+is read in fixed-size blocks with os.pread in a worker thread.
+"""
+
+import mimetypes
+import os
+import re
+from anyio import to_thread
+from starlette.responses import Response
+
+SEND_BLOCK_SIZE = 256 * 1024  # 256KB
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a Range header does not overlap the file"""
+
+
+def parse_range_header(header, size):
+    """
+    Parse a single-range Range header
+
+    Returns:
+        tuple: (start, end) inclusive, or None to serve the whole file
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: the whole file is a valid answer
+        return None
+
+    start, end = match.groups()
+    if start == "" and end == "":
+        return None
+    if start == "":
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+
+    start = int(start)
+    end = size - 1 if end == "" else min(int(end), size - 1)
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def make_etag(video, stat_result):
+    """Strong ETag from the content hash, or a weak one from size and mtime"""
+    if video.get("blob_sha256"):
+        return f'"{video["blob_sha256"]}"'
+    return f'W/"{stat_result.st_size:x}-{int(stat_result.st_mtime):x}"'
+
+
+def guess_media_type(filename):
+    media_type, _ = mimetypes.guess_type(filename or "")
+    return media_type or "video/mp4"
+
+
+class RangeFileResponse(Response):
+    """Serve a file, or one byte range of it, with ETag and If-Range handling"""
+
+    def __init__(self, path, request_headers, etag, media_type="application/octet-stream", stat_result=None):
+        self.path = path
+        stat_result = stat_result or os.stat(path)
+        size = stat_result.st_size
+        self.start, self.end = 0, size - 1
+        status_code = 200
+
+        headers = {
+            "Accept-Ranges": "bytes",
+            "ETag": etag,
+            "Cache-Control": "private, max-age=0, must-revalidate"
+        }
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            super().__init__(status_code=304, headers=headers)
+            self.send_file = False
+            return
+
+        # A Range is only honoured if If-Range (when present) still matches,
+        # so a client never stitches together bytes from two versions
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if if_range and (if_range.strip() != etag or etag.startswith("W/")):
+            range_header = None
+
+        try:
+            byte_range = parse_range_header(range_header, size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{size}"
+            super().__init__(status_code=416, headers=headers)
+            self.send_file = False
+            return
+
+        if byte_range:
+            self.start, self.end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {self.start}-{self.end}/{size}"
+
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.headers["content-length"] = str(self.end - self.start + 1)
+        self.send_file = size > 0
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers
+        })
+
+        if not self.send_file or scope.get("method") == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        count = self.end - self.start + 1
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": fd,
+                    "offset": self.start,
+                    "count": count
+                })
+                return
+
+            position = self.start
+            remaining = count
+            while remaining > 0:
+                block = await to_thread.run_sync(os.pread, fd, min(SEND_BLOCK_SIZE, remaining), position)
+                if not block:
+                    break
+                position += len(block)
+                remaining -= len(block)
+                await send({"type": "http.response.body", "body": block, "more_body": remaining > 0})
+            if remaining > 0:
+                # The file shrank underneath us; end the response cleanly
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            os.close(fd)
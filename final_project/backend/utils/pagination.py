@@ -0,0 +1,56 @@
+"""
+Keyset pagination on (created_at, _id), newest first.
+
+A page ends with an opaque cursor naming its last item. The next page
+asks for everything strictly older than that item, which an index on
+(..., created_at, _id) answers without skipping over earlier pages, so
+deep pages cost the same as the first one:
+
+    after = decode_cursor(cursor) if cursor else None
+    query = {"user_id": user_id, **keyset_filter(after)}
+    items = find(query).sort(KEYSET_SORT).limit(limit + 1)
+    items, next_cursor = page_of(items, limit)
+"""
+
+import base64
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def encode_cursor(item):
+    raw = f"{item['created_at'].isoformat()}|{item['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """The (created_at, _id) of a cursor, or a 400 HTTPException"""
+    try:
+        created_at, item_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), ObjectId(item_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def keyset_filter(after):
+    """Query conditions for the items after a decoded cursor"""
+    if not after:
+        return {}
+    created_at, item_id = after
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": item_id}}
+    ]}
+
+
+def page_of(items, limit):
+    """Trim items fetched with limit + 1 to a page and the cursor of the next one"""
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(items[-1])
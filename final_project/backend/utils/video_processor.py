@@ -1,4 +1,5 @@
 import os
+import tempfile
 try:
     import speech_recognition as sr
     SPEECH_RECOGNITION_AVAILABLE = True
@@ -14,12 +15,8 @@ except ImportError:
     MOVIEPY_AVAILABLE = False
 
 from utils.keyword_extractor import extract_keywords
-try:
-    from googleapiclient.discovery import build
-    GOOGLE_API_AVAILABLE = True
-except ImportError:
-    print("Google API client not installed. Keyword rankings will use mock data.")
-    GOOGLE_API_AVAILABLE = False
+from utils.youtube_search import search_keywords, describe_error, HTTPX_AVAILABLE
+from utils.keyword_cache import normalize_keyword, cached_searches, store_searches
 
 from dotenv import load_dotenv
 import re
@@ -74,12 +71,13 @@ def extract_audio_from_video(video_path, output_path):
         print(f"Error extracting audio from video: {e}")
         return None
 
-def transcribe_audio(audio_path):
+def transcribe_audio(audio_path, progress_callback=None):
     """
     Transcribe audio file to text, optimized for longer videos up to 15 minutes
     
     Args:
         audio_path (str): Path to audio file
+        progress_callback (callable): Called with (chunks_done, chunks_total) after each chunk
         
     Returns:
         str: Transcribed text
@@ -104,6 +102,7 @@ def transcribe_audio(audio_path):
             # Get audio duration
             duration = source.DURATION
             chunk_size = 30  # Process 30 seconds at a time
+            total_chunks = (int(duration) // chunk_size) + 1
             
             for i in range(0, int(duration), chunk_size):
                 # Process audio in 30-second chunks
@@ -114,25 +113,27 @@ def transcribe_audio(audio_path):
                     # Try using Google's speech recognition
                     chunk_text = recognizer.recognize_google(audio)
                     full_text.append(chunk_text)
-                    print(f"Processed chunk {i//chunk_size + 1}/{(int(duration)//chunk_size) + 1}")
+                    print(f"Processed chunk {i//chunk_size + 1}/{total_chunks}")
                 except sr.UnknownValueError:
                     print(f"Could not understand audio in chunk {i//chunk_size + 1}")
-                    continue
                 except sr.RequestError as e:
                     print(f"Error with speech recognition service in chunk {i//chunk_size + 1}: {e}")
-                    continue
+                
+                if progress_callback:
+                    progress_callback(i // chunk_size + 1, total_chunks)
         
         return " ".join(full_text)
     except Exception as e:
         print(f"Error transcribing audio: {e}")
         return None
 
-def extract_text_from_video(video_path):
+def extract_text_from_video(video_path, progress_callback=None):
     """
     Extract text from video file
     
     Args:
         video_path (str): Path to video file
+        progress_callback (callable): Called with (chunks_done, chunks_total) during transcription
         
     Returns:
         str: Extracted text
@@ -142,24 +143,24 @@ def extract_text_from_video(video_path):
         temp_dir = os.path.join(os.path.dirname(video_path), "temp")
         os.makedirs(temp_dir, exist_ok=True)
         
-        # Generate temp audio file path
-        audio_path = os.path.join(temp_dir, "temp_audio.wav")
-        
-        # Extract audio from video
-        audio_path = extract_audio_from_video(video_path, audio_path)
-        if not audio_path:
-            return None
-            
-        # Transcribe audio to text
-        text = transcribe_audio(audio_path)
+        # Use a unique temp audio file so concurrent extractions don't collide
+        fd, temp_audio_path = tempfile.mkstemp(prefix="audio_", suffix=".wav", dir=temp_dir)
+        os.close(fd)
         
-        # Clean up temp files
         try:
-            os.remove(audio_path)
-        except:
-            pass
-            
-        return text
+            # Extract audio from video
+            audio_path = extract_audio_from_video(video_path, temp_audio_path)
+            if not audio_path:
+                return None
+                
+            # Transcribe audio to text
+            return transcribe_audio(audio_path, progress_callback=progress_callback)
+        finally:
+            # Clean up temp files
+            try:
+                os.remove(temp_audio_path)
+            except OSError:
+                pass
     except Exception as e:
         print(f"Error extracting text from video: {e}")
         return None
@@ -208,10 +209,30 @@ def generate_keywords(text, num_keywords=10):
         print(f"Error generating keywords: {str(e)}")
         return ["content", "video", "marketing", "strategy", "audience"][:num_keywords]
 
+def search_metrics(items):
+    """Ranking metrics derived from the search results of a keyword"""
+    # Calculate a simple ranking score (1-10, where 1 is best)
+    # This is a simplified version - in a real app, you'd use more metrics
+    rank = 10 - (len(items) / 2) if items else 10
+    
+    # Mock data for search volume and competition
+    search_volume = len(items) * 100 if items else 100
+    competition = len(items) / 20 if items else 0.5
+    
+    return {
+        "video_ids": [item.get("id", {}).get("videoId") for item in items],
+        "rank": rank,
+        "search_volume": search_volume,
+        "competition": competition
+    }
+
 def get_keyword_rankings(keywords):
     """
     Get rankings for keywords using YouTube API
     
+    Keywords are looked up by their normalized form in the shared keyword
+    cache first; only keywords missing from it are searched.
+    
     Args:
         keywords (list): List of keywords
         
@@ -232,8 +253,8 @@ def get_keyword_rankings(keywords):
                 } for keyword in keywords
             ]
         
-        if not GOOGLE_API_AVAILABLE:
-            print("Google API client not installed. Using mock data for keyword rankings.")
+        if not HTTPX_AVAILABLE:
+            print("httpx not installed. Using mock data for keyword rankings.")
             return [
                 {
                     "keyword": keyword,
@@ -243,43 +264,47 @@ def get_keyword_rankings(keywords):
                 } for keyword in keywords
             ]
         
-        youtube = build("youtube", "v3", developerKey=youtube_api_key)
+        normalized = {keyword: normalize_keyword(keyword) for keyword in keywords}
+        # The normalized form is only the cache key; YouTube is searched with a keyword as written
+        originals = {}
+        for keyword in keywords:
+            originals.setdefault(normalized[keyword], keyword)
+        metrics = cached_searches(list(originals))
+        
+        # Search for the rest concurrently; a failed keyword does not fail the others
+        missing = [key for key in originals if key not in metrics]
+        print(f"Getting rankings for {len(keywords)} keywords, {len(missing)} not cached")
+        if missing:
+            fresh = {}
+            results = search_keywords([originals[key] for key in missing], youtube_api_key)
+            for key in missing:
+                items = results[originals[key]]
+                if isinstance(items, Exception):
+                    print(f"Error getting ranking for keyword '{originals[key]}': {describe_error(items)}")
+                    continue
+                fresh[key] = search_metrics(items)
+            store_searches(fresh)
+            metrics.update(fresh)
         
         rankings = []
         for keyword in keywords:
-            try:
-                print(f"Getting ranking for keyword: {keyword}")
-                # Search for videos with the keyword
-                search_response = youtube.search().list(
-                    q=keyword,
-                    part="id,snippet",
-                    maxResults=10
-                ).execute()
-                
-                # Calculate a simple ranking score (1-10, where 1 is best)
-                # This is a simplified version - in a real app, you'd use more metrics
-                items = search_response.get("items", [])
-                rank = 10 - (len(items) / 2) if items else 10
-                
-                # Mock data for search volume and competition
-                search_volume = len(items) * 100 if items else 100
-                competition = len(items) / 20 if items else 0.5
-                
-                rankings.append({
-                    "keyword": keyword,
-                    "rank": rank,
-                    "search_volume": search_volume,
-                    "competition": competition
-                })
-                print(f"Ranking for '{keyword}': {rank}")
-            except Exception as e:
-                print(f"Error getting ranking for keyword '{keyword}': {e}")
+            result = metrics.get(normalized[keyword])
+            if result is None:
                 rankings.append({
                     "keyword": keyword,
                     "rank": 10,
                     "search_volume": 100,
                     "competition": 0.5
                 })
+                continue
+            
+            rankings.append({
+                "keyword": keyword,
+                "rank": result["rank"],
+                "search_volume": result["search_volume"],
+                "competition": result["competition"]
+            })
+            print(f"Ranking for '{keyword}': {result['rank']}")
         
         return rankings
     except Exception as e:
@@ -0,0 +1,132 @@
+"""
+Concurrent YouTube search lookups over one pooled async HTTP client.
+
+Ranking a keyword set issues one search.list call per keyword. Issued
+one after another, ten keywords take ten round trips. Here they run
+concurrently, at most YOUTUBE_SEARCH_CONCURRENCY at a time, so a keyword
+set takes roughly one round trip.
+
+The httpx.AsyncClient and its connection pool live on a background
+event loop shared by every caller in the process. Synchronous callers,
+such as pipeline stages running in worker threads, submit work to that
+loop with search_keywords() and wait for the result. Each call has its
+own timeout, started once it gets past the concurrency limit, and a
+failed or timed-out keyword is reported as an error for that keyword
+only. If the whole batch still overruns, it is cancelled and every
+keyword is reported as timed out.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    print("httpx package not installed. Keyword rankings will use mock data.")
+    HTTPX_AVAILABLE = False
+
+from utils.metrics import registry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+YOUTUBE_SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
+YOUTUBE_SEARCH_CONCURRENCY = int(os.getenv("YOUTUBE_SEARCH_CONCURRENCY", 5))
+YOUTUBE_SEARCH_TIMEOUT = float(os.getenv("YOUTUBE_SEARCH_TIMEOUT", 5))  # seconds per call
+YOUTUBE_SEARCH_MAX_CONNECTIONS = int(os.getenv("YOUTUBE_SEARCH_MAX_CONNECTIONS", 20))
+
+search_requests = registry.counter("youtube_search_requests_total", "YouTube search.list calls by outcome")
+search_seconds = registry.counter("youtube_search_seconds_total", "Time spent in YouTube search.list calls")
+
+_loop = None
+_client = None
+_semaphore = None
+_lock = threading.Lock()
+
+
+def _start_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="youtube-search", daemon=True).start()
+    return _loop
+
+
+def _get_client():
+    # Only called on the search loop, so no lock is needed
+    global _client, _semaphore
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=YOUTUBE_SEARCH_TIMEOUT,
+            limits=httpx.Limits(max_connections=YOUTUBE_SEARCH_MAX_CONNECTIONS)
+        )
+        _semaphore = asyncio.Semaphore(YOUTUBE_SEARCH_CONCURRENCY)
+    return _client
+
+
+def describe_error(e):
+    """A loggable description of a failed search; never includes the request URL"""
+    if isinstance(e, httpx.HTTPStatusError):
+        return f"HTTP {e.response.status_code}"
+    return type(e).__name__
+
+
+async def _search(client, keyword, api_key):
+    params = {"q": keyword, "part": "id,snippet", "maxResults": 10}
+    # In a header rather than the query string, so it never appears in a logged URL
+    headers = {"X-Goog-Api-Key": api_key}
+    async with _semaphore:
+        started = time.monotonic()
+        try:
+            # The client timeout bounds each phase; this bounds the whole call
+            response = await asyncio.wait_for(
+                client.get(YOUTUBE_SEARCH_URL, params=params, headers=headers), YOUTUBE_SEARCH_TIMEOUT
+            )
+            response.raise_for_status()
+            search_requests.inc(outcome="ok")
+            return response.json().get("items", [])
+        except (httpx.TimeoutException, asyncio.TimeoutError) as e:
+            search_requests.inc(outcome="timeout")
+            logger.warning(f"YouTube search for '{keyword}' timed out")
+            return e
+        except Exception as e:
+            search_requests.inc(outcome="error")
+            logger.warning(f"YouTube search for '{keyword}' failed: {describe_error(e)}")
+            return e
+        finally:
+            search_seconds.inc(time.monotonic() - started)
+
+
+async def search_many(keywords, api_key):
+    """
+    Search for several keywords concurrently
+
+    Returns:
+        dict: keyword -> list of search result items, or the exception
+            that lookup failed with
+    """
+    client = _get_client()
+    results = await asyncio.gather(*(_search(client, keyword, api_key) for keyword in keywords))
+    return dict(zip(keywords, results))
+
+
+def search_keywords(keywords, api_key):
+    """search_many for synchronous callers; runs on the shared search loop"""
+    keywords = list(keywords)
+    future = asyncio.run_coroutine_threadsafe(search_many(keywords, api_key), _start_loop())
+    # Calls queue behind the concurrency limit, so allow one timeout per wave
+    waves = -(-len(keywords) // YOUTUBE_SEARCH_CONCURRENCY) or 1
+    try:
+        return future.result(timeout=YOUTUBE_SEARCH_TIMEOUT * (waves + 1))
+    except concurrent.futures.TimeoutError:
+        # Stop the searches still queued instead of leaving them to run unawaited
+        future.cancel()
+        logger.warning(f"YouTube search for {len(keywords)} keywords timed out")
+        return {keyword: TimeoutError("YouTube search timed out") for keyword in keywords}
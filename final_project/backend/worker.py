@@ -0,0 +1,62 @@
+"""
+Standalone job worker.
+
+Runs the background job handlers outside the API process so transcription
+capacity can be scaled separately from API replicas:
+
+    python -m worker
+
+Any number of workers can run against the same database. Jobs are claimed
+with leases (see services/job_queue.py), so none is processed twice, and a
+job whose worker dies is retried once its lease expires. Run the API with
+JOB_WORKERS=0 to leave all processing to the workers.
+"""
+
+import logging
+import os
+import signal
+import threading
+
+from config.db import initialize_db
+from services.event_bus import MongoEventLog
+from services.job_queue import JobQueue, set_event_publisher
+# Importing the pipeline registers its job handlers
+import services.seo_pipeline  # noqa: F401
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 2))
+# Seconds to let running jobs finish on shutdown before their leases are left to expire
+WORKER_SHUTDOWN_TIMEOUT = int(os.getenv("WORKER_SHUTDOWN_TIMEOUT", 30))
+
+
+def main():
+    db = initialize_db()
+    if db is None:
+        raise SystemExit("Could not connect to MongoDB")
+
+    # SSE clients are connected to the API, so events go through Mongo
+    event_log = MongoEventLog(db)
+    event_log.ensure_collection()
+    set_event_publisher(event_log.publish)
+
+    job_queue = JobQueue(num_workers=WORKER_CONCURRENCY)
+    stop = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    job_queue.start()
+    stop.wait()
+    job_queue.stop(timeout=WORKER_SHUTDOWN_TIMEOUT)
+    logger.info("Worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,15 @@ import React, { useState, useEffect } from 'react';
 import { Link, useNavigate, useLocation } from 'react-router-dom';
 import { FiUpload, FiVideo, FiClock, FiCheck, FiList, FiPlay, FiInfo, FiYoutube, FiExternalLink, FiAward, FiBookOpen, FiEye } from 'react-icons/fi';
 import { toast } from 'react-toastify';
-import { videoApi, authApi, youtubeApi } from '../utils/api';
+import { videoApi, authApi, youtubeApi, jobApi } from '../utils/api';
 import { useTheme } from '../context/ThemeContext';
 import { useTranslation } from '../context/TranslationContext';
 import { useTutorial } from '../context/TutorialContext';
 
 const Dashboard = () => {
   const [videos, setVideos] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [uploading, setUploading] = useState(false);
   const [videoTitle, setVideoTitle] = useState('');
@@ -99,6 +101,7 @@ const Dashboard = () => {
       
       if (response.data && response.data.history) {
         setVideos(response.data.history);
+        setNextCursor(response.data.next_cursor || null);
       } else {
         console.error('Invalid history response:', response.data);
         toast.error('Failed to load videos');
@@ -111,6 +114,21 @@ const Dashboard = () => {
     }
   };
 
+  const loadMoreVideos = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const response = await videoApi.getHistory({ cursor: nextCursor });
+      setVideos(prev => [...prev, ...response.data.history]);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (error) {
+      console.error('Error fetching more videos:', error);
+      toast.error('Failed to load videos');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const checkYoutubeStatus = async () => {
     try {
       setYoutubeLoading(true);
@@ -177,6 +195,13 @@ const Dashboard = () => {
     }
   };
 
+  // Map pipeline job stages to the processing steps shown in the UI
+  const JOB_STAGE_STEPS = {
+    transcript: 'extracting',
+    keywords: 'generating',
+    rankings: 'ranking',
+  };
+
   const processVideo = async (videoId) => {
     try {
       // Set processing state
@@ -185,44 +210,39 @@ const Dashboard = () => {
         step: 'extracting'
       });
       
-      console.log('Starting text extraction for video:', videoId);
-      
-      // Step 1: Extract text
-      const extractResponse = await videoApi.extractText(videoId);
-      console.log('Text extraction response:', extractResponse.data);
-      
-      if (!extractResponse.data || !extractResponse.data.video_id) {
-        throw new Error('Failed to extract text from video');
-      }
-      
-      // Update processing state
-      setProcessingVideo({
-        id: videoId,
-        step: 'generating'
-      });
-      
-      // Step 2: Generate keywords
-      console.log('Starting keyword generation for video:', videoId);
-      const keywordResponse = await videoApi.generateKeywords(videoId);
-      console.log('Keyword generation response:', keywordResponse.data);
+      console.log('Starting processing job for video:', videoId);
+      const jobResponse = await jobApi.submitPipeline(videoId);
+      const jobId = jobResponse.data.id;
       
-      if (!keywordResponse.data || !keywordResponse.data.keyword_id) {
-        throw new Error('Failed to generate keywords');
-      }
-      
-      const keywordId = keywordResponse.data.keyword_id;
-      
-      // Update processing state
-      setProcessingVideo({
-        id: videoId,
-        step: 'ranking'
+      // Follow the job over Server-Sent Events instead of waiting on long requests
+      await new Promise((resolve, reject) => {
+        const source = jobApi.subscribe(
+          jobId,
+          (event) => {
+            if (event.stage && JOB_STAGE_STEPS[event.stage]) {
+              setProcessingVideo({
+                id: videoId,
+                step: JOB_STAGE_STEPS[event.stage],
+                progress: event.progress
+              });
+            }
+            if (event.state === 'succeeded') {
+              source.close();
+              resolve(event.result);
+            } else if (event.state === 'failed') {
+              source.close();
+              reject(new Error(event.error || 'Failed to process video'));
+            }
+          },
+          () => {
+            // EventSource reconnects on its own; only give up once it is closed
+            if (source.readyState === EventSource.CLOSED) {
+              reject(new Error('Lost connection to processing updates'));
+            }
+          }
+        );
       });
       
-      // Step 3: Get rankings
-      console.log('Starting ranking retrieval for keywords:', keywordId);
-      const rankingResponse = await videoApi.getRankings(keywordId);
-      console.log('Ranking response:', rankingResponse.data);
-      
       // Reset processing state and refresh videos
       setProcessingVideo(null);
       fetchVideos();
@@ -586,7 +606,7 @@ const Dashboard = () => {
                               <span className="flex items-center text-green-500">
                                 <FiCheck className="mr-1" /> {t('analyzed')}
                               </span>
-                            ) : video.extracted_text ? (
+                            ) : video.has_text ? (
                               <span className="flex items-center text-blue-500">
                                 <FiInfo className="mr-1" /> {t('textExtracted')}
                               </span>
@@ -655,6 +675,20 @@ const Dashboard = () => {
                   ))}
                 </tbody>
               </table>
+              
+              {nextCursor && (
+                <div className="p-4 text-center">
+                  <button
+                    className={`px-4 py-2 rounded-lg ${darkMode 
+                      ? 'bg-gray-700 text-white hover:bg-gray-600' 
+                      : 'bg-gray-100 text-gray-800 hover:bg-gray-200'} transition-colors`}
+                    onClick={loadMoreVideos}
+                    disabled={loadingMore}
+                  >
+                    {loadingMore ? 'Loading...' : 'Load More'}
+                  </button>
+                </div>
+              )}
             </div>
           ) : (
             <div className="text-center py-8">
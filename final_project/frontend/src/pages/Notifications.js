@@ -8,25 +8,22 @@ const Notifications = () => {
   const { darkMode } = useTheme();
   const [notifications, setNotifications] = useState([]);
   const [loading, setLoading] = useState(true);
-  const [page, setPage] = useState(0);
-  const [hasMore, setHasMore] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
   const limit = 10;
 
   useEffect(() => {
     fetchNotifications();
   }, []);
 
-  const fetchNotifications = async () => {
+  const fetchNotifications = async (cursor = null) => {
     try {
       setLoading(true);
-      const response = await userApi.getNotifications(limit, page * limit);
+      const response = await userApi.getNotifications(limit, cursor);
       const newNotifications = response.data.notifications;
       
-      if (newNotifications.length < limit) {
-        setHasMore(false);
-      }
+      setNextCursor(response.data.next_cursor || null);
       
-      if (page === 0) {
+      if (!cursor) {
         setNotifications(newNotifications);
       } else {
         setNotifications(prev => [...prev, ...newNotifications]);
@@ -39,8 +36,7 @@ const Notifications = () => {
   };
 
   const loadMore = () => {
-    setPage(prev => prev + 1);
-    fetchNotifications();
+    fetchNotifications(nextCursor);
   };
 
   const formatDate = (dateString) => {
@@ -136,7 +132,7 @@ const Notifications = () => {
           </ul>
         )}
         
-        {hasMore && (
+        {nextCursor && (
           <div className="p-4 text-center">
             <button
               className={`px-4 py-2 rounded-lg ${darkMode 
@@ -51,7 +51,7 @@ const Results = () => {
         console.error('Error fetching video details, trying history:', videoError);
         
         // Fallback to getting from history
-        const historyResponse = await videoApi.getHistory();
+        const historyResponse = await videoApi.getHistory({ fields: 'keywords,rankings,extracted_text', limit: 200 });
         const history = historyResponse.data.history || [];
         
         // Find the video by ID
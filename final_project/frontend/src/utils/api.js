@@ -81,10 +81,9 @@ const videoApi = {
     });
   },
   
+  // Queues extraction and returns the job; follow it with jobApi
   extractText: (videoId) => {
-    return defaultInstance.post(`/extract/text/${videoId}`, {}, {
-      timeout: 60000 // 1 minute timeout
-    });
+    return defaultInstance.post(`/extract/text/${videoId}`);
   },
   
   generateKeywords: (videoId) => {
@@ -104,11 +103,13 @@ const videoApi = {
       return Promise.reject(new Error('No keyword ID provided'));
     }
     
-    return defaultInstance.post(`/ranking/${keywordId}`);
+    // Latest stored rankings; the server refreshes stale ones in the background
+    return defaultInstance.get(`/ranking/${keywordId}`);
   },
   
-  getHistory: () => {
-    return defaultInstance.get('/history');
+  // params: { limit, cursor, fields } where fields is e.g. 'keywords,rankings,extracted_text'
+  getHistory: (params = {}) => {
+    return defaultInstance.get('/history', { params });
   },
   
   getVideoDetails: (videoId) => {
@@ -116,6 +117,33 @@ const videoApi = {
   },
 };
 
+// Job API
+const JOB_EVENT_TYPES = ['snapshot', 'state', 'stage', 'progress'];
+
+const jobApi = {
+  submitPipeline: (videoId, topN = 10) => {
+    return defaultInstance.post(`/jobs/pipeline/${videoId}`, {}, { params: { top_n: topN } });
+  },
+
+  getJob: (jobId) => defaultInstance.get(`/jobs/${jobId}`),
+
+  // Follow a job's progress over Server-Sent Events. EventSource cannot set
+  // headers, so the token is passed as a query parameter.
+  subscribe: (jobId, onEvent, onError) => {
+    const token = localStorage.getItem('token') || '';
+    const source = new EventSource(
+      `${API_URL}/jobs/${jobId}/events?access_token=${encodeURIComponent(token)}`
+    );
+    JOB_EVENT_TYPES.forEach((type) => {
+      source.addEventListener(type, (event) => onEvent(JSON.parse(event.data)));
+    });
+    if (onError) {
+      source.onerror = onError;
+    }
+    return source;
+  },
+};
+
 const youtubeApi = {
   getAuthUrl: () => defaultInstance.get('/youtube/auth'),
   handleCallback: (code, state) => defaultInstance.get('/youtube/callback', { params: { code, state } }),
@@ -128,8 +156,8 @@ export const userApi = {
   getProfile: () => defaultInstance.get('/user/profile'),
   updateProfile: (data) => defaultInstance.put('/user/profile', data),
   updateNotificationPreferences: (data) => defaultInstance.put('/user/notification-preferences', data),
-  getNotifications: (limit = 10, skip = 0) => {
-    return defaultInstance.get(`/user/notifications?limit=${limit}&skip=${skip}`);
+  getNotifications: (limit = 10, cursor = null) => {
+    return defaultInstance.get('/user/notifications', { params: cursor ? { limit, cursor } : { limit } });
   },
   uploadProfileImage: (formData) => {
     return defaultInstance.post('/user/profile-image', formData, {
@@ -141,4 +169,4 @@ export const userApi = {
 };
 
 // Export all API functions
-export { authApi, videoApi, youtubeApi };
+export { authApi, videoApi, youtubeApi, jobApi };